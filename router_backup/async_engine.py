@@ -0,0 +1,256 @@
+"""
+asyncio collection engine built on asyncssh.
+
+An opt-in alternative to the netmiko thread pool (``engine: async``). One
+event loop drives every SSH session, so memory and thread count stay flat
+as concurrency grows. Each vendor module's DEVICE_TYPE and CONFIG_COMMAND
+are reused, so both engines pull the same configuration and write it under
+the same hostname; so are the optional PROBE_COMMAND and parse_probe() change
+probes.
+"""
+
+import asyncio
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from router_backup.storage import (
+    change_probes_enabled,
+    get_change_stamp,
+    record_unchanged,
+    write_backup,
+)
+
+# FortiOS has no per-session paging command: like netmiko, switch the console
+# output mode to standard. With VDOMs enabled that setting is global.
+FORTIOS_OUTPUT_STANDARD = ["config system console", "set output standard", "end"]
+FORTIOS_VDOM_COMMAND = "get system status | grep Virtual"
+FORTIOS_VDOM_PATTERN = re.compile(r"Virtual domain configuration:\s*(multiple|enable)")
+
+# Per device type: command that disables paging, configuration commands that
+# do so where there is none (wrapped in "config global" when the device
+# reports VDOMs), whether to enter enable mode, and a suffix netmiko also
+# appends to the username (RouterOS "+cte" turns off colours and terminal
+# detection).
+ASYNC_PROFILES = {
+    "cisco_ios": {"paging": "terminal length 0", "enable": True},
+    "cisco_asa": {"paging": "terminal pager 0", "enable": True},
+    "dell_os6": {"paging": "terminal length 0", "enable": True},
+    "juniper": {"paging": "set cli screen-length 0"},
+    "vyos": {"paging": "set terminal length 0"},
+    "huawei": {"paging": "screen-length 0 temporary"},
+    "fortinet": {"pre_commands": FORTIOS_OUTPUT_STANDARD, "vdoms": True},
+    "mikrotik_routeros": {"username_suffix": "+cte"},
+}
+
+# Matches the prompt at the end of the output of every supported platform
+PROMPT_PATTERN = re.compile(r"[\w.@:/()\[\]<~-]+\s?[>#$%\]]\s*$")
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+CONNECT_TIMEOUT = 20
+COMMAND_TIMEOUT = 120
+
+
+class AsyncSession:
+    """A minimal interactive CLI session over asyncssh."""
+
+    def __init__(self, host: str, username: str, password: str, device_type: str):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.device_type = device_type
+        self.profile = ASYNC_PROFILES.get(device_type, {})
+        self.prompt = ""
+        self._conn = None
+        self._process = None
+
+    async def connect(self):
+        """Open the SSH connection and an interactive shell."""
+        import asyncssh
+
+        username = self.username + self.profile.get("username_suffix", "")
+        self._conn = await asyncio.wait_for(
+            asyncssh.connect(
+                self.host,
+                username=username,
+                password=self.password,
+                known_hosts=None,
+            ),
+            CONNECT_TIMEOUT,
+        )
+        self._process = await self._conn.create_process(
+            term_type="vt100", term_size=(511, 24), encoding="utf-8", errors="replace"
+        )
+        self.prompt = await self.find_prompt()
+
+    async def _read_until(self, done, timeout: float = COMMAND_TIMEOUT) -> str:
+        """Read shell output until done(buffer) is true."""
+        buffer = ""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not done(buffer):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"Timed out waiting for {self.host}")
+            chunk = await asyncio.wait_for(self._process.stdout.read(65536), remaining)
+            if not chunk:
+                raise ConnectionError(f"Session to {self.host} closed")
+            buffer += ANSI_ESCAPE.sub("", chunk).replace("\r", "")
+        return buffer
+
+    async def find_prompt(self) -> str:
+        """Send a newline and return the prompt the device answers with."""
+        self._process.stdin.write("\n")
+        output = await self._read_until(lambda buf: PROMPT_PATTERN.search(buf), CONNECT_TIMEOUT)
+        return output.rstrip().splitlines()[-1].strip()
+
+    async def send_command(self, command: str) -> str:
+        """Run a command and return its output without echo and prompt."""
+        self._process.stdin.write(command + "\n")
+        prompt = self.prompt
+        output = await self._read_until(lambda buf: buf.rstrip().endswith(prompt))
+        lines = output.rstrip().splitlines()
+        # Drop the echoed command and the trailing prompt
+        if lines and command in lines[0]:
+            lines = lines[1:]
+        if lines and lines[-1].strip() == prompt:
+            lines = lines[:-1]
+        return "\n".join(lines)
+
+    async def send_config_command(self, command: str) -> str:
+        """Run a configuration command, whose prompt differs from the device prompt."""
+        self._process.stdin.write(command + "\n")
+        return await self._read_until(lambda buf: PROMPT_PATTERN.search(buf))
+
+    async def prepare(self):
+        """Turn off paging as the device type's profile says."""
+        if self.profile.get("paging"):
+            await self.send_command(self.profile["paging"])
+        commands = list(self.profile.get("pre_commands", []))
+        if commands and self.profile.get("vdoms"):
+            if FORTIOS_VDOM_PATTERN.search(await self.send_command(FORTIOS_VDOM_COMMAND)):
+                commands = ["config global"] + commands + ["end"]
+        for command in commands:
+            await self.send_config_command(command)
+
+    async def enable(self, secret: Optional[str]):
+        """Enter privileged mode when the prompt is not already '#'."""
+        if self.prompt.endswith("#"):
+            return
+        self._process.stdin.write("enable\n")
+        output = await self._read_until(
+            lambda buf: "assword" in buf or PROMPT_PATTERN.search(buf), CONNECT_TIMEOUT
+        )
+        if "assword" in output:
+            self._process.stdin.write((secret or "") + "\n")
+            await self._read_until(lambda buf: PROMPT_PATTERN.search(buf), CONNECT_TIMEOUT)
+        self.prompt = await self.find_prompt()
+
+    async def close(self):
+        """Close the session."""
+        if self._conn is not None:
+            self._conn.close()
+            await self._conn.wait_closed()
+
+
+async def _probe_change(session: AsyncSession, vendor_module, hostname: str) -> Optional[str]:
+    """Run the vendor module's change probe, if it has one; None means fetch."""
+    command = getattr(vendor_module, "PROBE_COMMAND", None)
+    if command is None or not change_probes_enabled():
+        return None
+    try:
+        return vendor_module.parse_probe(await session.send_command(command))
+    except Exception as e:
+        logger.warning(f"Change probe of {hostname} failed, pulling the full config: {e!r}")
+        return None
+
+
+async def _backup_device(
+    device: dict, vendor_module, needs_secret: bool, semaphore: asyncio.Semaphore
+) -> str:
+    """Collect one device's configuration and hand it to storage."""
+    ip = device["ip"]
+    async with semaphore:
+        session = AsyncSession(ip, device["username"], device["password"], vendor_module.DEVICE_TYPE)
+        try:
+            logger.info(f"Backing up {ip} ({vendor_module.DEVICE_TYPE}, async)")
+            await session.connect()
+            if session.profile.get("enable"):
+                await session.enable(device["secret"] if needs_secret else None)
+            await session.prepare()
+
+            # Same hostname rule as the netmiko vendor modules
+            hostname = session.prompt.replace("#", "").replace(">", "") or ip
+
+            # Storage calls block, keep them off the event loop
+            loop = asyncio.get_running_loop()
+            stamp = await _probe_change(session, vendor_module, hostname)
+            if stamp is not None and stamp == await loop.run_in_executor(
+                None, get_change_stamp, hostname
+            ):
+                await loop.run_in_executor(None, record_unchanged, hostname, ip)
+                logger.success(f"Configuration of {ip} unchanged since {stamp}")
+                return "success"
+
+            output = await session.send_command(vendor_module.CONFIG_COMMAND)
+            await loop.run_in_executor(None, write_backup, hostname, output, ip, stamp)
+
+            logger.success(f"Successfully backed up {ip}")
+            return "success"
+        except Exception as e:
+            logger.error(f"Failed to backup {ip}: {e!r}")
+            return "failed"
+        finally:
+            try:
+                await session.close()
+            except Exception:
+                pass
+
+
+async def _run_backups(jobs, concurrency, on_result=None):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def backup(device, vendor_module, needs_secret):
+        outcome = await _backup_device(device, vendor_module, needs_secret, semaphore)
+        if on_result is not None:
+            on_result(device["ip"], outcome)
+        return outcome
+
+    outcomes = await asyncio.gather(
+        *(
+            backup(device, vendor_module, needs_secret)
+            for device, vendor_module, needs_secret in jobs
+        )
+    )
+    return {device["ip"]: outcome for (device, _, _), outcome in zip(jobs, outcomes)}
+
+
+def run_backups(
+    jobs: List[Tuple[dict, object, bool]],
+    concurrency: int = 100,
+    on_result: Optional[Callable[[str, str], None]] = None,
+) -> Dict[str, str]:
+    """
+    Back up devices concurrently on a single event loop.
+
+    Args:
+        jobs: List of (device dict, vendor module, needs_secret) tuples
+        concurrency: Maximum number of SSH sessions open at once
+        on_result: Called on the event loop with (ip, outcome) as each
+            device finishes
+
+    Returns:
+        dict mapping device IP to outcome ('success' or 'failed')
+
+    Raises:
+        ImportError: If asyncssh is not installed
+    """
+    try:
+        import asyncssh  # noqa: F401
+    except ImportError:
+        raise ImportError("The async engine requires asyncssh: pip install asyncssh")
+
+    if not jobs:
+        return {}
+    return asyncio.run(_run_backups(jobs, max(1, concurrency), on_result))
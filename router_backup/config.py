@@ -1,11 +1,40 @@
 """Configuration management for router-backup."""
 
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
 
 import yaml
 
+TRUE_VALUES = ("true", "yes", "on", "1")
+FALSE_VALUES = ("false", "no", "off", "0")
+
+
+def _parse_bool(data: Dict[str, Any], name: str, default: bool) -> bool:
+    """
+    Read a boolean setting, spelled out explicitly.
+
+    YAML booleans pass through; strings (quoted YAML values, environment
+    overrides) must be one of TRUE_VALUES or FALSE_VALUES, so "false" is
+    not read as a truthy non-empty string.
+
+    Raises:
+        ValueError: If the value is not a recognisable boolean
+    """
+    value = data.get(name, default)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+    raise ValueError(f"{name}: expected true or false, got {value!r}")
+
+
 @dataclass
 class Config:
     """Configuration class for router-backup."""
@@ -13,8 +42,31 @@ class Config:
     device_file: str = "/etc/router-backup/devices.csv"
     storage: str = "/var/lib/router-backup"
     storage_model: str = "txt"  # txt, git, or pygit
+    commit_mode: str = "run"  # run (one commit per run) or device (one per device)
+    pygit_bare: bool = False  # pygit: bare repository, trees built in memory
+    git_fast_import: bool = False  # git: write commits through git fast-import
+    skip_unchanged: bool = True  # skip writes whose content hash is unchanged
+    change_probes: bool = False  # skip pulling configs whose vendor change stamp is unchanged
+    snmp_prepass: bool = False  # poll config-change OIDs over SNMP, collect only changed devices
+    snmp_community: str = "public"  # SNMPv2c community of the pre-pass
+    snmp_port: int = 161
+    txt_compression: str = "none"  # txt: none, gzip, or zstd
+    txt_dedup: bool = False  # txt: store each unique config once, link snapshots to it
+    retention: Optional[Dict[str, Any]] = None  # e.g. {"daily": 30, "monthly": "forever"}
+    prune_on_run: bool = False  # apply retention at the end of every backup run
+    layout: str = ""  # directory template, e.g. "{vendor}/{site}" or "{year}/{month}/{day}"
+    lock_timeout: float = 60  # seconds to wait for another run before spooling to it
     log_level: str = "INFO"
     log_file: Optional[str] = None
+    concurrency: int = 1  # number of devices backed up in parallel
+    engine: str = "netmiko"  # netmiko (threads) or async (asyncssh)
+    async_concurrency: int = 100  # SSH sessions open at once with the async engine
+    processes: int = 1  # worker processes the inventory is sharded across
+    write_queue_size: int = 64  # configs buffered for the storage writer thread
+    reachability: str = "icmp"  # icmp, tcp, or none
+    reachability_port: int = 22  # port for tcp reachability checks
+    schedules: Optional[List[Dict[str, Any]]] = None  # cron schedules of `router-backup daemon`
+    daemon_socket: Optional[str] = None  # daemon status socket (default: in the storage state dir)
 
     @classmethod
     def from_file(cls, config_path: str) -> "Config":
@@ -31,8 +83,31 @@ class Config:
             device_file=data.get("device_file", cls.device_file),
             storage=data.get("storage", cls.storage),
             storage_model=data.get("storage_model", cls.storage_model),
+            commit_mode=data.get("commit_mode", cls.commit_mode),
+            pygit_bare=_parse_bool(data, "pygit_bare", cls.pygit_bare),
+            git_fast_import=_parse_bool(data, "git_fast_import", cls.git_fast_import),
+            skip_unchanged=_parse_bool(data, "skip_unchanged", cls.skip_unchanged),
+            change_probes=_parse_bool(data, "change_probes", cls.change_probes),
+            snmp_prepass=_parse_bool(data, "snmp_prepass", cls.snmp_prepass),
+            snmp_community=str(data.get("snmp_community", cls.snmp_community)),
+            snmp_port=int(data.get("snmp_port", cls.snmp_port)),
+            txt_compression=data.get("txt_compression", cls.txt_compression),
+            txt_dedup=_parse_bool(data, "txt_dedup", cls.txt_dedup),
+            retention=data.get("retention", cls.retention),
+            prune_on_run=_parse_bool(data, "prune_on_run", cls.prune_on_run),
+            layout=data.get("layout") or cls.layout,
+            lock_timeout=float(data.get("lock_timeout", cls.lock_timeout)),
             log_level=data.get("log_level", cls.log_level),
             log_file=data.get("log_file", cls.log_file),
+            concurrency=int(data.get("concurrency", cls.concurrency)),
+            engine=data.get("engine", cls.engine),
+            async_concurrency=int(data.get("async_concurrency", cls.async_concurrency)),
+            processes=int(data.get("processes", cls.processes)),
+            write_queue_size=int(data.get("write_queue_size", cls.write_queue_size)),
+            reachability=data.get("reachability", cls.reachability),
+            reachability_port=int(data.get("reachability_port", cls.reachability_port)),
+            schedules=data.get("schedules", cls.schedules),
+            daemon_socket=data.get("daemon_socket", cls.daemon_socket),
         )
 
     @classmethod
@@ -42,8 +117,31 @@ class Config:
             device_file=data.get("device_file", cls.device_file),
             storage=data.get("storage", cls.storage),
             storage_model=data.get("storage_model", cls.storage_model),
+            commit_mode=data.get("commit_mode", cls.commit_mode),
+            pygit_bare=_parse_bool(data, "pygit_bare", cls.pygit_bare),
+            git_fast_import=_parse_bool(data, "git_fast_import", cls.git_fast_import),
+            skip_unchanged=_parse_bool(data, "skip_unchanged", cls.skip_unchanged),
+            change_probes=_parse_bool(data, "change_probes", cls.change_probes),
+            snmp_prepass=_parse_bool(data, "snmp_prepass", cls.snmp_prepass),
+            snmp_community=str(data.get("snmp_community", cls.snmp_community)),
+            snmp_port=int(data.get("snmp_port", cls.snmp_port)),
+            txt_compression=data.get("txt_compression", cls.txt_compression),
+            txt_dedup=_parse_bool(data, "txt_dedup", cls.txt_dedup),
+            retention=data.get("retention", cls.retention),
+            prune_on_run=_parse_bool(data, "prune_on_run", cls.prune_on_run),
+            layout=data.get("layout") or cls.layout,
+            lock_timeout=float(data.get("lock_timeout", cls.lock_timeout)),
             log_level=data.get("log_level", cls.log_level),
             log_file=data.get("log_file", cls.log_file),
+            concurrency=int(data.get("concurrency", cls.concurrency)),
+            engine=data.get("engine", cls.engine),
+            async_concurrency=int(data.get("async_concurrency", cls.async_concurrency)),
+            processes=int(data.get("processes", cls.processes)),
+            write_queue_size=int(data.get("write_queue_size", cls.write_queue_size)),
+            reachability=data.get("reachability", cls.reachability),
+            reachability_port=int(data.get("reachability_port", cls.reachability_port)),
+            schedules=data.get("schedules", cls.schedules),
+            daemon_socket=data.get("daemon_socket", cls.daemon_socket),
         )
 
     def to_dict(self) -> Dict[str, Any]:
@@ -52,8 +150,31 @@ class Config:
             "device_file": self.device_file,
             "storage": self.storage,
             "storage_model": self.storage_model,
+            "commit_mode": self.commit_mode,
+            "pygit_bare": self.pygit_bare,
+            "git_fast_import": self.git_fast_import,
+            "skip_unchanged": self.skip_unchanged,
+            "change_probes": self.change_probes,
+            "snmp_prepass": self.snmp_prepass,
+            "snmp_community": self.snmp_community,
+            "snmp_port": self.snmp_port,
+            "txt_compression": self.txt_compression,
+            "txt_dedup": self.txt_dedup,
+            "retention": self.retention,
+            "prune_on_run": self.prune_on_run,
+            "layout": self.layout,
+            "lock_timeout": self.lock_timeout,
             "log_level": self.log_level,
             "log_file": self.log_file,
+            "concurrency": self.concurrency,
+            "engine": self.engine,
+            "async_concurrency": self.async_concurrency,
+            "processes": self.processes,
+            "write_queue_size": self.write_queue_size,
+            "reachability": self.reachability,
+            "reachability_port": self.reachability_port,
+            "schedules": self.schedules,
+            "daemon_socket": self.daemon_socket,
         }
 
     def ensure_directories(self):
@@ -0,0 +1,113 @@
+"""
+history_index.py - Per-file commit history index for the git backends.
+
+Answers "which commits touched this file" without walking the repository.
+The index is an append-only JSON-lines file inside the git directory; each
+line describes one commit and the blobs of the files it changed:
+
+    {"commit": "<sha>", "parent": "<sha>", "time": 1700000000,
+     "date": "...", "message": "...", "files": {"router1.txt": "<blob sha>"}}
+
+Backends append a line when they commit and catch up from history (or
+rebuild) when HEAD moved without them, e.g. after a commit made by another
+tool or a history rewrite.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class HistoryIndex:
+    """Sidecar index mapping file path to the commits that changed it."""
+
+    def __init__(self, path: Path):
+        """Load the index stored at path (created on first append)."""
+        self.path = Path(path)
+        self.head: Optional[str] = None
+        self._by_path: Dict[str, List[dict]] = {}
+        self._offset = 0
+        # Identity of the file read so far; a rebuild replaces the file
+        self._file_id: Optional[Tuple[int, int]] = None
+        self.refresh()
+
+    def _reset(self):
+        """Forget everything read so far."""
+        self.head = None
+        self._by_path = {}
+        self._offset = 0
+        self._file_id = None
+
+    def _apply(self, entry: dict):
+        """Add one commit entry to the in-memory index."""
+        version = {
+            "commit": entry["commit"],
+            "time": entry["time"],
+            "date": entry["date"],
+            "message": entry["message"],
+        }
+        for filepath, blob in entry["files"].items():
+            self._by_path.setdefault(filepath, []).append(dict(version, blob=blob))
+        self.head = entry["commit"]
+
+    def refresh(self):
+        """
+        Read lines appended to the index file since the last read.
+
+        Starts over from the beginning when the file was replaced (rebuilt,
+        possibly by another process) or truncated since the last read.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if file_id != self._file_id or stat.st_size < self._offset:
+                    self._reset()
+                    self._file_id = file_id
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self._reset()
+            return
+
+        # Only consume complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += end
+
+    def append(self, entries: Iterable[dict]):
+        """Append commit entries (oldest first) to the index file."""
+        entries = list(entries)
+        if not entries:
+            return
+        self.refresh()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = "".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries)
+        with open(self.path, "a") as f:
+            f.write(data)
+        self.refresh()
+
+    def rebuild(self, entries: Iterable[dict]):
+        """Replace the whole index with entries (oldest first)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+
+        self._reset()
+        self.refresh()
+
+    def versions(self, filepath: str) -> List[dict]:
+        """
+        Return the commits that changed filepath, newest first.
+
+        Each version has the keys commit, time, date, message and blob.
+        """
+        self.refresh()
+        return list(reversed(self._by_path.get(filepath, [])))
@@ -0,0 +1,121 @@
+"""
+Migration of txt snapshot archives into git history.
+
+Sites that started on ``storage_model: txt`` have directories of
+``<hostname>_<MM-DD-YYYY_HH-MM>.txt`` files (optionally compressed, possibly in
+layout subdirectories). The snapshots are grouped into
+backup runs by their timestamps and appended to a git repository in
+chronological order, one commit per run dated at the run time, through a
+single git fast-import stream (built in memory with pygit2 for a bare pygit
+repository).
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from loguru import logger
+
+from router_backup.storage import STATE_DIR, BackupStorage, HashIndex, walk_txt_snapshots
+from router_backup.txt_compression import DICT_DIR_NAME, SnapshotCodec
+from router_backup.txt_store import read_snapshot
+
+# Snapshots further apart than this belong to different runs
+DEFAULT_RUN_GAP = 30
+
+Snapshot = Tuple[datetime, str, Path]
+
+
+def find_txt_snapshots(directory: str) -> List[Snapshot]:
+    """
+    List the txt snapshots below directory, in any layout, oldest first.
+
+    Returns:
+        List of (timestamp, backup filename, path) tuples
+    """
+    snapshots = [
+        (stamp, filename, path) for filename, stamp, path in walk_txt_snapshots(directory)
+    ]
+    snapshots.sort()
+    return snapshots
+
+
+def group_runs(
+    snapshots: List[Snapshot], gap_minutes: int = DEFAULT_RUN_GAP
+) -> List[List[Snapshot]]:
+    """
+    Group time-sorted snapshots into backup runs.
+
+    A new run starts when the gap to the previous snapshot exceeds
+    gap_minutes, or when a device already has a snapshot in the current run.
+    """
+    runs: List[List[Snapshot]] = []
+    gap = timedelta(minutes=gap_minutes)
+    names = set()
+    for snapshot in snapshots:
+        stamp, filename, _ = snapshot
+        if not runs or stamp - runs[-1][-1][0] > gap or filename in names:
+            runs.append([])
+            names = set()
+        runs[-1].append(snapshot)
+        names.add(filename)
+    return runs
+
+
+def _run_commits(
+    runs: List[List[Snapshot]], codec: SnapshotCodec, stats: Dict[str, int]
+) -> Iterator[dict]:
+    """Read each run's snapshots and yield it as a commit, skipping unchanged files."""
+    last_digest: Dict[str, str] = {}
+    for run in runs:
+        files = {}
+        for _, filename, path in run:
+            content = read_snapshot(path, codec)
+            digest = HashIndex.digest(content)
+            if last_digest.get(filename) == digest:
+                stats["unchanged"] += 1
+                continue
+            last_digest[filename] = digest
+            files[filename] = content
+        if not files:
+            continue
+
+        stats["files"] += len(files)
+        start, end = run[0][0], run[-1][0]
+        yield {
+            "files": files,
+            "message": (
+                f"Backup at {start.strftime('%Y-%m-%d_%H-%M')}: "
+                f"{len(files)} of {len(run)} devices changed (imported from txt)"
+            ),
+            "time": int(end.timestamp()),
+        }
+
+
+def migrate_txt_to_git(
+    source: str, storage: BackupStorage, gap_minutes: int = DEFAULT_RUN_GAP
+) -> dict:
+    """
+    Import a directory of txt snapshots into a git storage.
+
+    Args:
+        source: Directory holding the txt snapshots
+        storage: Target BackupStorage with the git model or a bare pygit repository
+        gap_minutes: Minutes between snapshots that start a new run
+
+    Returns:
+        dict with snapshots, runs, commits, files and unchanged counts
+    """
+    snapshots = find_txt_snapshots(source)
+    runs = group_runs(snapshots, gap_minutes)
+    stats = {"snapshots": len(snapshots), "runs": len(runs), "files": 0, "unchanged": 0}
+    logger.info(f"Found {len(snapshots)} txt snapshots in {len(runs)} runs in {source}")
+
+    if storage.dry_run:
+        stats["commits"] = 0
+        return stats
+
+    # Compressed snapshots may need the source's zstd dictionaries
+    codec = SnapshotCodec(dict_dir=Path(source) / STATE_DIR / DICT_DIR_NAME)
+    stats["commits"] = storage.import_history(_run_commits(runs, codec, stats))
+    return stats
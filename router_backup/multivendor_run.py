@@ -5,9 +5,9 @@ This module can be used both as a CLI tool (with typer) and as a library
 for the GUI interface in gui.py.
 """
 
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from csv import reader
 from datetime import datetime
-from ping3 import ping
 from router_backup.vendor_backups import (
     cisco_ios,
     cisco_asa,
@@ -19,10 +19,27 @@ from router_backup.vendor_backups import (
     vyos,
 )
 from router_backup.config import Config, get_default_config_path
-from router_backup.storage import BackupStorage, set_global_storage
+from router_backup.reachability import REACHABILITY_METHODS, sweep
+from router_backup.run_journal import RunJournal, RunState, latest_run
+from router_backup.scheduler import STATUS_SOCKET, BackupDaemon, Schedule, read_status
+from router_backup.snmp_poll import snmp_sweep
+from router_backup.syslog_listener import DEFAULT_DEBOUNCE, SYSLOG_PORT, ConfigChangeListener
+from router_backup.storage import (
+    STATE_DIR,
+    BackupStorage,
+    CollectingStorage,
+    QueuedWriter,
+    record_unchanged,
+    set_global_storage,
+    write_backup,
+)
+import json
+import math
 import os
+from pathlib import Path
+import signal
 import sys
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
 from loguru import logger
 import typer
 
@@ -50,10 +67,46 @@ VENDOR_NAMES = {
     "8": "Dell OS6",
 }
 
+# Values accepted in the optional ``vendor`` column of the devices CSV.
+# Selection keys and display names ("Cisco IOS", "cisco-ios") are also accepted.
+VENDOR_KEYS = {
+    "cisco_ios": "1",
+    "cisco_asa": "2",
+    "juniper": "3",
+    "vyos": "4",
+    "huawei": "5",
+    "fortinet": "6",
+    "microtik": "7",
+    "mikrotik": "7",
+    "dell_os6": "8",
+}
+
+# Header names recognised in the devices CSV, mapped to inventory fields.
+# Files without a header use the positional ip,username,password[,secret] layout.
+CSV_COLUMNS = {
+    "ip": "ip",
+    "host": "ip",
+    "hostname": "ip",
+    "address": "ip",
+    "username": "username",
+    "user": "username",
+    "password": "password",
+    "secret": "secret",
+    "enable_secret": "secret",
+    "enable": "secret",
+    "vendor": "vendor",
+    "site": "site",
+    "location": "site",
+}
+
+# Collection engines selectable with --engine
+ENGINES = ("netmiko", "async")
+
 # Global config and storage
 _config: Optional[Config] = None
 _storage: Optional[BackupStorage] = None
 _dry_run: bool = False
+_resume: bool = False
 
 
 def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None):
@@ -85,6 +138,10 @@ def load_config(
     devices_file: Optional[str] = None,
     storage_path: Optional[str] = None,
     storage_model: Optional[str] = None,
+    workers: Optional[int] = None,
+    reachability: Optional[str] = None,
+    engine: Optional[str] = None,
+    processes: Optional[int] = None,
 ) -> Config:
     """Load configuration from file or create from parameters."""
     global _config
@@ -107,6 +164,15 @@ def load_config(
         _config.storage = storage_path
     if storage_model:
         _config.storage_model = storage_model
+    if workers:
+        _config.concurrency = workers
+        _config.async_concurrency = workers
+    if reachability:
+        _config.reachability = reachability
+    if engine:
+        _config.engine = engine
+    if processes:
+        _config.processes = processes
 
     return _config
 
@@ -122,6 +188,16 @@ def init_storage(config: Config, hostname: str = "backup") -> BackupStorage:
         hostname=hostname,
         timestamp=timestamp,
         dry_run=_dry_run,
+        commit_mode=config.commit_mode,
+        pygit_bare=config.pygit_bare,
+        git_fast_import=config.git_fast_import,
+        skip_unchanged=config.skip_unchanged,
+        txt_compression=config.txt_compression,
+        txt_dedup=config.txt_dedup,
+        retention=config.retention,
+        layout=config.layout,
+        lock_timeout=config.lock_timeout,
+        change_probes=config.change_probes,
     )
 
     # Set global storage for vendor modules
@@ -136,20 +212,590 @@ def init_storage(config: Config, hostname: str = "backup") -> BackupStorage:
     return _storage
 
 
+def resolve_vendor(value: Optional[str]) -> Optional[str]:
+    """
+    Map a vendor column value to a VENDOR_MAP selection key.
+
+    Args:
+        value: Vendor as written in the CSV (e.g. "cisco_ios", "Cisco IOS", "1")
+
+    Returns:
+        Selection key, or None if the value is empty or unknown
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value in VENDOR_MAP:
+        return value
+    key = value.lower().replace("-", "_").replace(" ", "_")
+    if key in VENDOR_KEYS:
+        return VENDOR_KEYS[key]
+    for selection, name in VENDOR_NAMES.items():
+        if key == name.lower().replace(" ", "_"):
+            return selection
+    return None
+
+
+def load_inventory(csv_path: str) -> list:
+    """
+    Read the devices CSV into a list of device dicts.
+
+    Each device has the keys ip, username, password, secret, vendor and
+    site (secret, vendor and site may be None). A header row is detected
+    automatically; when present, columns are matched by name (see
+    CSV_COLUMNS), so optional ``vendor`` and ``site`` columns can be placed
+    anywhere.
+
+    Args:
+        csv_path: Path to the devices CSV file
+
+    Returns:
+        List of device dicts, in file order
+    """
+    import ipaddress
+
+    with open(csv_path, "r") as read_obj:
+        list_of_rows = [row for row in reader(read_obj) if row]
+
+    # Default positional layout: ip, username, password[, secret]
+    columns = {"ip": 0, "username": 1, "password": 2, "secret": 3}
+    data_rows = list_of_rows
+
+    # Skip header row if present
+    if len(list_of_rows) > 0:
+        # Check if first row contains headers (no IP address)
+        first_row = list_of_rows[0]
+        try:
+            # Try to parse first element as IP to detect if it's a header
+            ipaddress.ip_address(first_row[0])
+        except ValueError:
+            # First row is likely a header, use it to locate named columns
+            data_rows = list_of_rows[1:]
+            named = {}
+            for index, name in enumerate(first_row):
+                field = CSV_COLUMNS.get(name.strip().lower().replace(" ", "_"))
+                if field and field not in named:
+                    named[field] = index
+            if {"ip", "username", "password"} <= named.keys():
+                columns = named
+            else:
+                for field in ("vendor", "site"):
+                    if field in named:
+                        columns[field] = named[field]
+
+    devices = []
+    for row in data_rows:
+
+        def column(field):
+            index = columns.get(field)
+            if index is None or index >= len(row):
+                return None
+            return row[index].strip() or None
+
+        device = {field: column(field) for field in ("ip", "username", "password", "secret")}
+        if not device["ip"] or device["username"] is None or device["password"] is None:
+            logger.warning(f"Skipping malformed row: {row}")
+            continue
+        device["vendor"] = column("vendor")
+        device["site"] = column("site")
+        devices.append(device)
+
+    return devices
+
+
+def _backup_device(device: dict, selection: str, interactive: bool = False) -> str:
+    """
+    Back up a single reachable device.
+
+    Runs on a worker thread, so it only reports an outcome and leaves the
+    aggregation of results to the caller.
+
+    Args:
+        device: Inventory entry from load_inventory()
+        selection: VENDOR_MAP key of the driver to use
+        interactive: Whether to show interactive prompts
+
+    Returns:
+        Outcome of the backup: 'success' or 'failed'
+    """
+    vendor_module_obj, needs_secret = VENDOR_MAP[selection]
+    vendor_name = VENDOR_NAMES[selection]
+    ip = device["ip"]
+    username = device["username"]
+    password = device["password"]
+    secret = device["secret"] if needs_secret else None
+
+    try:
+        logger.info(f"Backing up {ip} ({vendor_name})")
+
+        if needs_secret and secret:
+            vendor_module_obj.backup(ip, username, password, secret)
+        else:
+            vendor_module_obj.backup(ip, username, password)
+
+        logger.success(f"Successfully backed up {ip}")
+        return "success"
+
+    except Exception as e:
+        logger.error(f"Failed to backup {ip}: {e}")
+
+        if interactive:
+            print(f"Error backing up {ip}: {e}")
+        return "failed"
+
+
+def _open_journal(
+    config: Config, command: str, devices: list, resume: bool = False
+) -> Tuple[Optional[RunJournal], Optional[RunState]]:
+    """
+    Start the journal of a run, or pick up the command's unfinished run.
+
+    Args:
+        config: Configuration (the journal lives under the storage path)
+        command: Journal name ('all' or a selection key)
+        devices: IPs of the devices the run is meant to back up
+        resume: Continue the command's unfinished run, if there is one
+
+    Returns:
+        Tuple of (journal, run to resume or None); the journal is None in
+        dry-run mode
+    """
+    if _dry_run:
+        return None, None
+    journal = RunJournal(Path(config.storage) / STATE_DIR, command)
+    if resume:
+        previous = journal.load()
+        if previous is not None and not previous.finished:
+            logger.info(f"Resuming run {previous.run}")
+            return journal, previous
+        logger.info(f"No unfinished '{command}' run to resume, starting a new run")
+    journal.start(devices)
+    return journal, None
+
+
+def _run_jobs(
+    jobs: list,
+    config: Config,
+    interactive: bool = False,
+    journal: Optional[RunJournal] = None,
+    previous: Optional[RunState] = None,
+    rtts: Optional[Dict[str, Optional[float]]] = None,
+) -> dict:
+    """
+    Back up a list of (device, selection) jobs on a bounded thread pool.
+
+    The whole inventory is swept for reachability first (unless the caller
+    already did, see ``rtts``); only reachable
+    devices are handed to the pool. With ``engine: async`` the reachable
+    devices are collected on a single asyncio event loop instead, and with
+    ``processes`` > 1 they are sharded across worker processes. With
+    ``commit_mode: run`` the git backends commit the whole run at once.
+
+    Each device's progress is recorded in the run's journal (see
+    run_journal.py), so an interrupted run can be resumed. The caller
+    starts and finishes the journal (see _open_journal()); one journal can
+    span several calls, as in the per-driver loop of 'all'.
+
+    Args:
+        jobs: List of (device dict, VENDOR_MAP key) tuples
+        config: Configuration object (``concurrency``, or ``async_concurrency``
+            with the async engine, bounds the collectors)
+        interactive: Whether to show interactive prompts
+        journal: Journal of the run; None disables journaling
+        previous: Interrupted run being resumed: only its devices are backed
+            up, skipping those whose config already reached storage
+        rtts: Result of a reachability sweep covering the jobs (IP -> RTT,
+            None if down), which is then not repeated
+
+    Returns:
+        dict with results: {'success': int, 'failed': int, 'down': int,
+        'unchanged': int, 'resumed': int, 'files': list}; 'unchanged' counts
+        successful backups that were skipped because the config had not
+        changed, 'resumed' successful backups taken over from the
+        interrupted run
+    """
+    results = {
+        "success": 0,
+        "failed": 0,
+        "down": 0,
+        "unchanged": 0,
+        "resumed": 0,
+        "files": [],
+        "down_devices": [],
+        "unchanged_devices": [],
+        "resumed_devices": [],
+        "rtt": {},
+    }
+
+    if previous is not None:
+        targets = set(previous.devices)
+        jobs = [job for job in jobs if job[0]["ip"] in targets]
+    selections = {device["ip"]: selection for device, selection in jobs}
+
+    def record_outcome(ip: str, outcome: str):
+        if journal is not None:
+            journal.record_outcome(ip, outcome, selections.get(ip))
+
+    # Backup names of the devices the writer stored, for the SNMP stamps
+    stored_files = {}
+
+    def record_stored(filename: str, device_ip: Optional[str], status: str):
+        if device_ip:
+            stored_files[device_ip] = filename
+        if journal is not None and device_ip:
+            journal.record_stored(device_ip, filename, status)
+
+    # With commit_mode 'run' the git backends commit every device at once
+    if _storage is not None:
+        _storage.set_device_info(
+            {
+                device["ip"]: {
+                    "vendor": VENDOR_NAMES[selection].lower().replace(" ", "_"),
+                    "site": device.get("site"),
+                }
+                for device, selection in jobs
+            }
+        )
+        _storage.begin_run()
+
+    writer = None
+    write_errors = {}
+    outcomes = []
+    polled = {}
+    try:
+        # Devices whose config the interrupted run already stored
+        if previous is not None:
+            remaining = []
+            for device, selection in jobs:
+                stored = previous.stored.get(device["ip"])
+                if stored and _storage.adopt_backup(stored["file"], device["ip"]):
+                    results["resumed"] += 1
+                    results["resumed_devices"].append(device["ip"])
+                    outcomes.append((device["ip"], "success"))
+                else:
+                    remaining.append((device, selection))
+            logger.info(f"Resumed {results['resumed']} devices stored by the interrupted run")
+            jobs = remaining
+
+        # Reachability pre-pass over the whole inventory
+        if rtts is None:
+            rtts = sweep(
+                [device["ip"] for device, _ in jobs],
+                method=config.reachability,
+                port=config.reachability_port,
+            )
+        results["rtt"] = {device["ip"]: rtts.get(device["ip"]) for device, _ in jobs}
+
+        reachable_jobs = []
+        for device, selection in jobs:
+            ip = device["ip"]
+            if rtts.get(ip) is None:
+                # Device is down
+                logger.warning(f"Device {ip} is down")
+                results["down"] += 1
+                results["down_devices"].append(ip)
+                record_outcome(ip, "down")
+
+                if interactive:
+                    print(f"{ip} is down!")
+            else:
+                reachable_jobs.append((device, selection))
+
+        # Collectors hand their configs to a single writer thread
+        if _storage is not None:
+            writer = QueuedWriter(_storage, config.write_queue_size, on_stored=record_stored)
+            set_global_storage(writer)
+
+        # SNMP pre-pass: devices whose config-change value did not move are
+        # done, and journaled as stored like any other unchanged backup
+        if config.snmp_prepass and writer is not None:
+            reachable_jobs, polled, unchanged = _snmp_prepass(reachable_jobs, config)
+            for ip, filename in unchanged:
+                writer.record_unchanged(filename, ip)
+                outcomes.append((ip, "success"))
+                record_outcome(ip, "success")
+
+        workers = _workers(config)
+        processes = max(1, config.processes)
+
+        if processes > 1 and len(reachable_jobs) > 1:
+            outcomes += _collect_sharded(
+                reachable_jobs, config.engine, workers, processes, interactive, record_outcome
+            )
+        else:
+            outcomes += _collect(
+                reachable_jobs, config.engine, workers, interactive, record_outcome
+            )
+    finally:
+        if writer is not None:
+            writer.close()
+            write_errors = writer.take_errors()
+            set_global_storage(_storage)
+        if _storage is not None:
+            _storage.commit_run()
+
+    for ip in write_errors:
+        record_outcome(ip, "failed")
+
+    # A polled value is only kept once the config it describes is stored
+    if polled:
+        _storage.record_snmp_stamps(
+            {
+                ip: (stored_files[ip], polled[ip])
+                for ip, outcome in outcomes
+                if outcome == "success"
+                and ip not in write_errors
+                and polled.get(ip)
+                and ip in stored_files
+            }
+        )
+
+    if _storage is not None and config.prune_on_run:
+        try:
+            _storage.prune()
+        except Exception as e:
+            logger.error(f"Pruning old backups failed: {e}")
+
+    # Successful backups whose content matched the last stored version
+    statuses = _storage.take_write_statuses() if _storage is not None else {}
+
+    for ip, outcome in outcomes:
+        if ip in write_errors:
+            outcome = "failed"
+        results[outcome] += 1
+        if outcome == "success" and statuses.get(ip) == "unchanged":
+            results["unchanged"] += 1
+            results["unchanged_devices"].append(ip)
+
+    _log_results(results)
+    return results
+
+
+def _snmp_prepass(jobs: list, config: Config) -> tuple:
+    """
+    Poll the config-change OID of every device whose vendor module defines one.
+
+    Returns:
+        Tuple of (jobs still to collect, dict of IP -> polled value, list of
+        (IP, backup name) of devices whose value matches the one stored with
+        their last backup)
+    """
+    targets = {}
+    for device, selection in jobs:
+        oid = getattr(VENDOR_MAP[selection][0], "SNMP_CHANGE_OID", None)
+        if oid:
+            targets[device["ip"]] = oid
+
+    polled = snmp_sweep(targets, community=config.snmp_community, port=config.snmp_port)
+    stored = _storage.snmp_stamps()
+
+    remaining, unchanged = [], []
+    for device, selection in jobs:
+        stamp = polled.get(device["ip"])
+        last = stored.get(device["ip"])
+        if stamp is not None and last is not None and last["stamp"] == stamp:
+            unchanged.append((device["ip"], last["file"]))
+        else:
+            remaining.append((device, selection))
+    logger.info(
+        f"SNMP pre-pass: {len(unchanged)} devices unchanged, {len(remaining)} to collect"
+    )
+    return remaining, polled, unchanged
+
+
+def _workers(config: Config) -> int:
+    """Return how many devices the configured engine collects at once."""
+    if config.engine == "async":
+        return max(1, config.async_concurrency)
+    return max(1, config.concurrency)
+
+
+def _collect(
+    jobs: list,
+    engine: str,
+    workers: int,
+    interactive: bool = False,
+    on_result: Optional[Callable[[str, str], None]] = None,
+) -> list:
+    """
+    Back up reachable devices with the selected engine.
+
+    Args:
+        jobs: List of (device dict, VENDOR_MAP key) tuples
+        engine: 'netmiko' (thread pool) or 'async' (asyncio event loop)
+        workers: Maximum number of devices collected at once
+        interactive: Whether to show interactive prompts
+        on_result: Called with (ip, outcome) as each device finishes
+
+    Returns:
+        List of (ip, outcome) tuples
+    """
+    if engine == "async":
+        from router_backup import async_engine
+
+        logger.info(f"Backing up with the async engine ({workers} concurrent sessions)")
+        outcomes = async_engine.run_backups(
+            [(device, *VENDOR_MAP[selection]) for device, selection in jobs],
+            concurrency=workers,
+            on_result=on_result,
+        )
+        if interactive:
+            for ip, outcome in outcomes.items():
+                if outcome == "failed":
+                    print(f"Error backing up {ip}")
+        return list(outcomes.items())
+
+    if workers > 1:
+        logger.info(f"Backing up with {workers} concurrent workers")
+
+    outcomes = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_backup_device, device, selection, interactive): device["ip"]
+            for device, selection in jobs
+        }
+
+        # Outcomes are only touched from this thread
+        for future in as_completed(futures):
+            outcomes.append((futures[future], future.result()))
+            if on_result is not None:
+                on_result(*outcomes[-1])
+
+    return outcomes
+
+
+def _run_shard(
+    jobs: list,
+    engine: str,
+    workers: int,
+    interactive: bool = False,
+    stamps: Optional[Dict[str, str]] = None,
+) -> tuple:
+    """
+    Collect one shard of the inventory in a worker process.
+
+    Storage writes are captured in memory and returned, so the parent process
+    remains the only writer to the repository.
+
+    Args:
+        stamps: Change stamps of the parent's storage, for the vendor change
+            probes (None when they are off)
+
+    Returns:
+        Tuple of (list of (ip, outcome), list of (filename, content, ip, stamp)
+        writes); content is None for backups skipped by their change probe
+    """
+    collector = CollectingStorage(stamps)
+    set_global_storage(collector)
+    outcomes = _collect(jobs, engine, workers, interactive)
+    return outcomes, collector.take_writes()
+
+
+def _collect_sharded(
+    jobs: list,
+    engine: str,
+    workers: int,
+    processes: int,
+    interactive: bool = False,
+    on_result: Optional[Callable[[str, str], None]] = None,
+) -> list:
+    """
+    Split jobs across worker processes, each running its own collectors.
+
+    The inventory is cut into several shards per process so that results and
+    storage writes flow back while the run is in progress. The parent stores
+    every returned config through the global storage (the run's writer).
+    on_result is called for each device of a shard once its writes are queued.
+
+    Returns:
+        List of (ip, outcome) tuples
+    """
+    shard_size = max(1, math.ceil(len(jobs) / (processes * 4)))
+    shards = [jobs[i : i + shard_size] for i in range(0, len(jobs), shard_size)]
+    logger.info(
+        f"Sharding {len(jobs)} devices into {len(shards)} shards across {processes} processes"
+    )
+
+    stamps = _storage.change_stamps() if _storage is not None else None
+
+    outcomes = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_run_shard, shard, engine, workers, interactive, stamps)
+            for shard in shards
+        ]
+        for future in as_completed(futures):
+            shard_outcomes, writes = future.result()
+            # Storage failures are reported by the run's writer
+            for filename, content, device_ip, stamp in writes:
+                if content is None:
+                    record_unchanged(filename, device_ip)
+                else:
+                    write_backup(filename, content, device_ip, stamp)
+            outcomes.extend(shard_outcomes)
+            if on_result is not None:
+                for ip, outcome in shard_outcomes:
+                    on_result(ip, outcome)
+
+    return outcomes
+
+
+def _log_results(results: dict):
+    """Log the summary line of a finished run."""
+    logger.info(
+        f"Backup complete: {results['success']} succeeded "
+        f"({results['unchanged']} unchanged), "
+        f"{results['failed']} failed, {results['down']} down"
+    )
+
+
+def _load_devices(csv_path: str) -> list:
+    """Load the inventory, logging a missing or unreadable CSV."""
+    try:
+        devices = load_inventory(csv_path)
+    except FileNotFoundError:
+        logger.error(f"CSV file not found: {csv_path}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error reading {csv_path}: {e}")
+        raise
+
+    logger.info(f"Found {len(devices)} devices to process")
+    return devices
+
+
 def run_script(
     user_selection: str,
     config: Optional[Config] = None,
     devices_file: Optional[str] = None,
     interactive: bool = False,
+    resume: bool = False,
+    only: Optional[set] = None,
+    devices: Optional[list] = None,
+    journal: Optional[RunJournal] = None,
+    previous: Optional[RunState] = None,
 ) -> dict:
     """
     Main backup function that processes devices from CSV.
 
+    Devices are backed up on a thread pool bounded by ``config.concurrency``
+    (``config.async_concurrency`` sessions with the async engine); a
+    concurrency of 1 keeps the original one-device-at-a-time behaviour.
+    Rows whose ``vendor`` column names a different vendor are skipped.
+
     Args:
-        user_selection: Vendor selection ("1"-"7")
+        user_selection: Vendor selection ("1"-"8")
         config: Configuration object (loads default if not provided)
         devices_file: Path to CSV file (overrides config)
         interactive: Whether to show interactive prompts
+        resume: Continue this vendor's unfinished run instead of starting over
+        only: Restrict the run to these device IPs (e.g. a retry)
+        devices: Inventory already read with load_inventory() (the CSV is
+            not read again)
+        journal: Journal of an enclosing run to record into (it is neither
+            started nor finished here); by default the run is journaled
+            under the vendor's selection key
+        previous: Interrupted run resumed by the enclosing run
 
     Returns:
         dict with results: {'success': int, 'failed': int, 'down': int, 'files': list}
@@ -169,94 +815,215 @@ def run_script(
         raise ValueError(f"Invalid vendor selection: {user_selection}")
 
     # Initialize storage
-    vendor_module_obj, needs_secret = VENDOR_MAP[user_selection]
     vendor_name = VENDOR_NAMES[user_selection]
     init_storage(config, hostname=vendor_name.lower().replace(" ", "_"))
 
     logger.info(f"Starting backup for {vendor_name} devices from {csv_path}")
 
-    results = {"success": 0, "failed": 0, "down": 0, "files": [], "down_devices": []}
+    if devices is None:
+        devices = _load_devices(csv_path)
 
-    try:
-        with open(csv_path, "r") as read_obj:
-            csv_reader = reader(read_obj)
-            list_of_rows = list(csv_reader)
-
-            # Skip header row if present
-            if len(list_of_rows) > 0:
-                # Check if first row contains headers (no IP address)
-                first_row = list_of_rows[0]
-                try:
-                    # Try to parse first element as IP to detect if it's a header
-                    import ipaddress
-
-                    ipaddress.ip_address(first_row[0])
-                    data_rows = list_of_rows
-                except ValueError:
-                    # First row is likely a header, skip it
-                    data_rows = list_of_rows[1:] if len(list_of_rows) > 1 else []
-            else:
-                data_rows = []
+    jobs = []
+    for device in devices:
+        if device["vendor"] and resolve_vendor(device["vendor"]) != user_selection:
+            logger.debug(f"Skipping {device['ip']}: vendor is {device['vendor']}")
+            continue
+        if only is not None and device["ip"] not in only:
+            continue
+        jobs.append((device, user_selection))
 
-            total_rows = len(data_rows)
-            logger.info(f"Found {total_rows} devices to process")
+    return _run_journaled(jobs, config, interactive, user_selection, resume, journal, previous)
 
-            for row in data_rows:
-                if len(row) < 3:
-                    logger.warning(f"Skipping malformed row: {row}")
-                    continue
 
-                ip = row[0]
-                username = row[1]
-                password = row[2]
-                secret = row[3] if len(row) > 3 and needs_secret else None
+def run_all(
+    config: Optional[Config] = None,
+    devices_file: Optional[str] = None,
+    interactive: bool = False,
+    resume: bool = False,
+    only: Optional[set] = None,
+    devices: Optional[list] = None,
+    journal: Optional[RunJournal] = None,
+    previous: Optional[RunState] = None,
+) -> dict:
+    """
+    Back up every device in one pass, using the CSV ``vendor`` column.
 
-                # Ping the host
-                ip_ping = ping(ip, timeout=2)
+    The inventory is read and pinged once, and each device is sent only to
+    its own vendor driver. Rows without a recognised vendor are skipped and
+    logged as errors ('all' sends rows without a vendor to the per-driver
+    loop instead).
 
-                if ip_ping is None or ip_ping is False:
-                    # Device is down
-                    logger.warning(f"Device {ip} is down")
-                    results["down"] += 1
-                    results["down_devices"].append(ip)
+    Args:
+        config: Configuration object (loads default if not provided)
+        devices_file: Path to CSV file (overrides config)
+        interactive: Whether to show interactive prompts
+        resume: Continue the unfinished 'all' run instead of starting over
+        only: Restrict the run to these device IPs (e.g. a retry)
+        devices: Inventory already read with load_inventory() (the CSV is
+            not read again)
+        journal: Journal of an enclosing run to record into (it is neither
+            started nor finished here); by default the run is journaled
+            as 'all'
+        previous: Interrupted run resumed by the enclosing run
 
-                    if interactive:
-                        print(f"{ip} is down!")
-                else:
-                    # Device is up, attempt backup
-                    try:
-                        logger.info(f"Backing up {ip} ({vendor_name})")
+    Returns:
+        dict with results: {'success': int, 'failed': int, 'down': int, 'files': list}
+    """
+    global _config
 
-                        if needs_secret and secret:
-                            vendor_module_obj.backup(ip, username, password, secret)
-                        else:
-                            vendor_module_obj.backup(ip, username, password)
+    if config is None:
+        config = _config if _config else Config()
 
-                        results["success"] += 1
-                        logger.success(f"Successfully backed up {ip}")
+    csv_path = devices_file if devices_file else config.device_file
 
-                    except Exception as e:
-                        results["failed"] += 1
-                        logger.error(f"Failed to backup {ip}: {e}")
+    init_storage(config, hostname="all")
 
-                        if interactive:
-                            print(f"Error backing up {ip}: {e}")
+    logger.info(f"Starting backup for all devices from {csv_path}")
 
-    except FileNotFoundError:
-        logger.error(f"CSV file not found: {csv_path}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error during backup: {e}")
-        raise
+    if devices is None:
+        devices = _load_devices(csv_path)
+    if only is not None:
+        devices = [device for device in devices if device["ip"] in only]
 
-    logger.info(
-        f"Backup complete: {results['success']} succeeded, "
-        f"{results['failed']} failed, {results['down']} down"
+    return _run_journaled(
+        _vendor_jobs(devices), config, interactive, "all", resume, journal, previous
     )
 
+
+def _vendor_jobs(devices: list) -> list:
+    """Pair each device with the driver of its vendor column, logging unknown vendors."""
+    jobs = []
+    for device in devices:
+        selection = resolve_vendor(device["vendor"])
+        if selection is None:
+            logger.error(f"Skipping {device['ip']}: unknown vendor {device['vendor']!r}")
+            continue
+        jobs.append((device, selection))
+    return jobs
+
+
+def _run_journaled(
+    jobs: list,
+    config: Config,
+    interactive: bool,
+    command: str,
+    resume: bool,
+    journal: Optional[RunJournal],
+    previous: Optional[RunState],
+) -> dict:
+    """Run jobs in the given journal, or in a journal of their own under command."""
+    if journal is not None:
+        return _run_jobs(jobs, config, interactive, journal, previous)
+
+    journal, previous = _open_journal(
+        config, command, [device["ip"] for device, _ in jobs], resume
+    )
+    results = _run_jobs(jobs, config, interactive, journal, previous)
+    if journal is not None:
+        journal.finish(results)
     return results
 
 
+def run_inventory(
+    config: Optional[Config] = None,
+    resume: bool = False,
+    only: Optional[set] = None,
+    journal: Optional[RunJournal] = None,
+) -> dict:
+    """
+    Back up the whole inventory: the 'all' command.
+
+    Rows with a vendor are sent to their own driver in one pass (as
+    run_all()); rows without one are tried with every driver in turn, as
+    before inventories had a vendor column. The CSV is read and swept for
+    reachability once, all passes share one storage, and everything is
+    journaled as one 'all' run. Devices that are down, or that a resumed
+    run takes over, are only counted by the first pass over them.
+
+    Args:
+        config: Configuration object (loads default if not provided)
+        resume: Continue the unfinished 'all' run instead of starting over
+        only: Restrict the run to these device IPs (e.g. a retry)
+        journal: Journal to record into instead of starting one (e.g. a
+            retry); it is not finished here
+
+    Returns:
+        dict with the results of the vendor-column pass ('tagged') and the
+        summed counts of every pass
+
+    Raises:
+        Exception: If the CSV cannot be read
+    """
+    global _config
+
+    if config is None:
+        config = _config if _config else Config()
+
+    init_storage(config, hostname="all")
+    logger.info(f"Starting backup for all devices from {config.device_file}")
+
+    devices = _load_devices(config.device_file)
+    if only is not None:
+        devices = [device for device in devices if device["ip"] in only]
+
+    own_journal = journal is None
+    previous = None
+    if own_journal:
+        journal, previous = _open_journal(
+            config, "all", [device["ip"] for device in devices], resume
+        )
+    if previous is not None:
+        targets = set(previous.devices)
+        devices = [device for device in devices if device["ip"] in targets]
+
+    rtts = sweep(
+        [device["ip"] for device in devices],
+        method=config.reachability,
+        port=config.reachability_port,
+    )
+    tagged = [device for device in devices if device["vendor"]]
+    untagged = [device for device in devices if not device["vendor"]]
+
+    passes = []
+    if tagged:
+        # Single pass: each device goes straight to its own driver
+        passes.append(_run_jobs(_vendor_jobs(tagged), config, False, journal, previous, rtts))
+
+    if untagged:
+        # Rows without a vendor (legacy inventories): try every driver in turn
+        if tagged:
+            logger.info(f"{len(untagged)} devices have no vendor, trying every driver")
+        for selection in VENDOR_MAP.keys():
+            try:
+                results = _run_jobs(
+                    [(device, selection) for device in untagged],
+                    config,
+                    False,
+                    journal,
+                    previous,
+                    rtts,
+                )
+                logger.info(f"{VENDOR_NAMES[selection]}: {results['success']} succeeded")
+                passes.append(results)
+            except Exception as e:
+                logger.error(f"Error backing up {VENDOR_NAMES[selection]}: {e}")
+                continue
+            # Later drivers skip what this pass already reported as down or resumed
+            done = set(results["down_devices"]) | set(results["resumed_devices"])
+            untagged = [device for device in untagged if device["ip"] not in done]
+            previous = None
+            if not untagged:
+                break
+
+    totals = {
+        key: sum(results[key] for results in passes)
+        for key in ("success", "failed", "down", "unchanged", "resumed")
+    }
+    if own_journal and journal is not None:
+        journal.finish(totals)
+    return dict(totals, tagged=passes[0] if tagged else None)
+
+
 # Typer CLI app
 app = typer.Typer(help="Multi-vendor network device backup tool")
 
@@ -275,21 +1042,57 @@ def main(
     storage: Optional[str] = typer.Option(
         None, "--storage", "-s", help="Storage model: txt, git, or pygit (overrides config)"
     ),
+    workers: Optional[int] = typer.Option(
+        None, "--workers", "-w", help="Number of devices to back up concurrently (overrides config)"
+    ),
+    reachability: Optional[str] = typer.Option(
+        None,
+        "--reachability",
+        "-r",
+        help="Reachability check before backup: icmp, tcp, or none (overrides config)",
+    ),
+    engine: Optional[str] = typer.Option(
+        None,
+        "--engine",
+        "-e",
+        help="Collection engine: netmiko (threads) or async (asyncssh) (overrides config)",
+    ),
+    processes: Optional[int] = typer.Option(
+        None,
+        "--processes",
+        "-P",
+        help="Shard the inventory across this many worker processes (overrides config)",
+    ),
     verbose: bool = typer.Option(False, "--verbose", "-v", help="Enable verbose logging"),
     dry_run: bool = typer.Option(
         False, "--dryrun", "-n", help="Simulate backup without writing files"
     ),
+    resume: bool = typer.Option(
+        False, "--resume", help="Continue the interrupted run, skipping devices already stored"
+    ),
 ):
     """Network device backup tool supporting multiple vendors."""
     # Load configuration
-    global _config, _dry_run
+    global _config, _dry_run, _resume
     _dry_run = dry_run
+    _resume = resume
     _config = load_config(
         config_file=config,
         devices_file=devices,
         storage_model=storage,
+        workers=workers,
+        reachability=reachability,
+        engine=engine,
+        processes=processes,
     )
 
+    if _config.reachability not in REACHABILITY_METHODS:
+        typer.echo(f"Invalid reachability method: {_config.reachability}")
+        raise typer.Exit(1)
+    if _config.engine not in ENGINES:
+        typer.echo(f"Invalid engine: {_config.engine}")
+        raise typer.Exit(1)
+
     # Setup logging
     log_level = "DEBUG" if verbose else _config.log_level
     log_file = _config.log_file or os.path.join(_config.storage, "backup.log")
@@ -321,13 +1124,17 @@ def backup_all():
     global _config
     logger.info("Starting backup for all vendors")
 
-    for selection in VENDOR_MAP.keys():
-        try:
-            results = run_script(selection, config=_config)
-            logger.info(f"{VENDOR_NAMES[selection]}: {results['success']} succeeded")
-        except Exception as e:
-            logger.error(f"Error backing up {VENDOR_NAMES[selection]}: {e}")
+    try:
+        results = run_inventory(config=_config, resume=_resume)
+    except Exception:
+        raise typer.Exit(1)
 
+    if results["tagged"] is not None:
+        tagged = results["tagged"]
+        typer.echo(
+            f"All vendors backup complete: {tagged['success']} succeeded, "
+            f"{tagged['failed']} failed, {tagged['down']} down"
+        )
     show_dry_run_summary()
 
 
@@ -335,7 +1142,7 @@ def backup_all():
 def backup_cisco_ios():
     """Backup Cisco IOS devices."""
     global _config
-    results = run_script("1", config=_config, interactive=True)
+    results = run_script("1", config=_config, interactive=True, resume=_resume)
     typer.echo(f"Cisco IOS backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
@@ -344,7 +1151,7 @@ def backup_cisco_ios():
 def backup_cisco_asa():
     """Backup Cisco ASA devices."""
     global _config
-    results = run_script("2", config=_config, interactive=True)
+    results = run_script("2", config=_config, interactive=True, resume=_resume)
     typer.echo(f"Cisco ASA backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
@@ -353,7 +1160,7 @@ def backup_cisco_asa():
 def backup_dell_os6():
     """Backup DELL OS6 devices."""
     global _config
-    results = run_script("8", config=_config, interactive=True)
+    results = run_script("8", config=_config, interactive=True, resume=_resume)
     typer.echo(f"Dell OS6 backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
@@ -362,7 +1169,7 @@ def backup_dell_os6():
 def backup_juniper():
     """Backup Juniper devices."""
     global _config
-    results = run_script("3", config=_config, interactive=True)
+    results = run_script("3", config=_config, interactive=True, resume=_resume)
     typer.echo(f"Juniper backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
@@ -371,7 +1178,7 @@ def backup_juniper():
 def backup_vyos():
     """Backup VyOS routers."""
     global _config
-    results = run_script("4", config=_config, interactive=True)
+    results = run_script("4", config=_config, interactive=True, resume=_resume)
     typer.echo(f"VyOS backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
@@ -380,7 +1187,7 @@ def backup_vyos():
 def backup_huawei():
     """Backup Huawei devices."""
     global _config
-    results = run_script("5", config=_config, interactive=True)
+    results = run_script("5", config=_config, interactive=True, resume=_resume)
     typer.echo(f"Huawei backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
@@ -389,7 +1196,7 @@ def backup_huawei():
 def backup_fortinet():
     """Backup Fortinet devices."""
     global _config
-    results = run_script("6", config=_config, interactive=True)
+    results = run_script("6", config=_config, interactive=True, resume=_resume)
     typer.echo(f"Fortinet backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
@@ -398,11 +1205,203 @@ def backup_fortinet():
 def backup_microtik():
     """Backup Microtik devices."""
     global _config
-    results = run_script("7", config=_config, interactive=True)
+    results = run_script("7", config=_config, interactive=True, resume=_resume)
     typer.echo(f"Microtik backup complete: {results['success']} succeeded")
     show_dry_run_summary()
 
 
+@app.command(name="retry")
+def retry(
+    failed: bool = typer.Option(
+        True,
+        "--failed/--unfinished",
+        help="Retry the failed and down devices (default), or every device not yet successful",
+    ),
+):
+    """Re-run devices of the latest run that did not succeed."""
+    global _config
+    config = _config if _config else Config()
+
+    run = latest_run(Path(config.storage) / STATE_DIR)
+    if run is None:
+        typer.echo("No journaled run to retry")
+        raise typer.Exit(1)
+
+    if failed:
+        targets = set(run.retry_targets())
+    else:
+        targets = {
+            ip
+            for ip in run.devices
+            if run.outcomes.get(ip, {}).get("outcome") != "success" and ip not in run.stored
+        }
+    if not targets:
+        typer.echo(f"Nothing to retry in run {run.run}")
+        return
+
+    logger.info(f"Retrying {len(targets)} devices of run {run.run} ({run.command})")
+    # The retry continues the run's journal, which keeps the earlier outcomes
+    journal = None
+    if not _dry_run:
+        journal = RunJournal(Path(config.storage) / STATE_DIR, run.command)
+        journal.retry(sorted(targets))
+    if run.command == "all":
+        results = run_inventory(config=config, only=targets, journal=journal)
+    else:
+        results = run_script(
+            run.command, config=config, interactive=True, only=targets, journal=journal
+        )
+    if journal is not None:
+        journal.finish(results)
+    typer.echo(
+        f"Retry complete: {results['success']} succeeded, "
+        f"{results['failed']} failed, {results['down']} down"
+    )
+    show_dry_run_summary()
+
+
+@app.command(name="listen")
+def listen(
+    host: str = typer.Option("0.0.0.0", "--host", help="Address to receive syslog on"),
+    udp_port: int = typer.Option(SYSLOG_PORT, "--udp-port", help="Syslog UDP port (0 disables)"),
+    tcp_port: int = typer.Option(SYSLOG_PORT, "--tcp-port", help="Syslog TCP port (0 disables)"),
+    debounce: float = typer.Option(
+        DEFAULT_DEBOUNCE,
+        "--debounce",
+        help="Seconds without further changes before a changed device is backed up",
+    ),
+):
+    """Back up devices as soon as they log a configuration change over syslog."""
+    global _config
+    config = _config if _config else Config()
+
+    devices = {device["ip"]: device for device in _load_devices(config.device_file)}
+    if not devices:
+        typer.echo(f"No devices in {config.device_file}")
+        raise typer.Exit(1)
+
+    def backup_changed(batch: Dict[str, str]):
+        jobs = []
+        for ip, vendor in batch.items():
+            device = devices[ip]
+            # The inventory's vendor column wins over the message format
+            selection = resolve_vendor(device["vendor"]) or resolve_vendor(vendor)
+            if selection is None:
+                logger.warning(f"Skipping {ip}: unknown vendor {device['vendor']!r}")
+                continue
+            jobs.append((device, selection))
+        if jobs:
+            init_storage(config, hostname="syslog")
+            _run_jobs(jobs, config)
+
+    listener = ConfigChangeListener(devices, backup_changed, debounce=debounce)
+    logger.info(f"Watching {len(devices)} devices for configuration changes")
+    try:
+        listener.run(host, udp_port or None, tcp_port or None)
+    except OSError as e:
+        typer.echo(f"Cannot listen for syslog: {e}")
+        raise typer.Exit(1)
+
+
+def _daemon_socket(config: Config) -> Path:
+    """Path of the daemon's status socket."""
+    if config.daemon_socket:
+        return Path(config.daemon_socket)
+    return Path(config.storage) / STATE_DIR / STATUS_SOCKET
+
+
+@app.command(name="daemon")
+def daemon():
+    """Run the schedules of config.yaml in one long-lived process."""
+    global _config
+    config = _config if _config else Config()
+
+    try:
+        schedules = [
+            Schedule.from_config(entry, resolve_vendor) for entry in config.schedules or []
+        ]
+    except ValueError as e:
+        typer.echo(f"Invalid schedule: {e}")
+        raise typer.Exit(1)
+    if not schedules:
+        typer.echo("No schedules configured (see 'schedules' in config.example.yaml)")
+        raise typer.Exit(1)
+
+    # The inventory is re-read only when the CSV changes
+    inventory = {"mtime": None, "jobs": []}
+
+    def load_jobs() -> list:
+        try:
+            mtime = os.path.getmtime(config.device_file)
+        except OSError:
+            mtime = None
+        if mtime != inventory["mtime"]:
+            jobs = []
+            for device in _load_devices(config.device_file):
+                selection = resolve_vendor(device["vendor"])
+                if selection is None:
+                    logger.warning(f"Skipping {device['ip']}: unknown vendor {device['vendor']!r}")
+                    continue
+                jobs.append((device, selection))
+            inventory.update(mtime=mtime, jobs=jobs)
+        return inventory["jobs"]
+
+    # One storage (and repository) for the daemon's lifetime
+    storage = init_storage(config, hostname="daemon")
+
+    def run_batch(jobs: list, name: str) -> dict:
+        storage.hostname = name
+        storage.timestamp = get_timestamp()
+        return _run_jobs(jobs, config)
+
+    backup_daemon = BackupDaemon(schedules, load_jobs, run_batch, _daemon_socket(config))
+    signal.signal(signal.SIGTERM, lambda signum, frame: backup_daemon.request_stop())
+    for schedule in schedules:
+        logger.info(f"Schedule {schedule.name}: {schedule.cron.expression}")
+    try:
+        backup_daemon.run()
+    except RuntimeError as e:
+        typer.echo(str(e))
+        raise typer.Exit(1)
+
+
+@app.command(name="status")
+def daemon_status(
+    as_json: bool = typer.Option(False, "--json", help="Print the raw status document"),
+):
+    """Show the state of a running daemon."""
+    global _config
+    config = _config if _config else Config()
+    path = _daemon_socket(config)
+    try:
+        status = read_status(path)
+    except OSError:
+        typer.echo(f"No daemon listening on {path}")
+        raise typer.Exit(1)
+
+    if as_json:
+        typer.echo(json.dumps(status, indent=2))
+        return
+    typer.echo(f"Daemon {status['pid']} running since {status['started']}")
+    for schedule in status["schedules"]:
+        typer.echo(
+            f"  {schedule['name']} ({schedule['cron']}): next {schedule['next_run']}, "
+            f"last {schedule['last_run'] or 'never'}"
+        )
+    typer.echo(
+        f"Running: {len(status['running'])}, queued: {len(status['queued'])}, "
+        f"coalesced triggers: {status['coalesced']}"
+    )
+    batch = status["last_batch"]
+    if batch:
+        results = batch["results"]
+        typer.echo(
+            f"Last batch {batch['name']} at {batch['started']} ({batch['seconds']}s): "
+            f"{results.get('success', 0)} succeeded, {results.get('failed', 0)} failed, "
+            f"{results.get('down', 0)} down"
+        )
+
+
 @app.command(name="init-config")
 def init_config(
     path: Optional[str] = typer.Option(
@@ -460,6 +1459,7 @@ def interactive_menu():
             results = run_script(user_selection, config=_config, interactive=True)
             print(f"\nBackup complete!")
             print(f"  Success: {results['success']}")
+            print(f"  Unchanged: {results['unchanged']}")
             print(f"  Failed: {results['failed']}")
             print(f"  Down: {results['down']}")
             show_dry_run_summary()
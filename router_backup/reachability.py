@@ -0,0 +1,138 @@
+"""
+Concurrent reachability sweep for the device inventory.
+
+Checks every device before any SSH work starts, either with ICMP echo
+(ping3, needs raw socket privileges) or with a TCP connect to the SSH port
+(unprivileged). Down devices no longer cost a serial timeout each.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
+
+from loguru import logger
+from ping3 import ping
+
+REACHABILITY_METHODS = ("icmp", "tcp", "none")
+
+# Upper bounds on probes in flight at once
+ICMP_WORKERS = 512
+TCP_CONNECTIONS = 2048
+
+
+def _icmp_probe(host: str, timeout: float) -> Optional[float]:
+    """Ping one host, returning the RTT in seconds or None if it is down."""
+    try:
+        rtt = ping(host, timeout=timeout)
+    except Exception as e:
+        logger.debug(f"ICMP probe of {host} failed: {e}")
+        return None
+    if rtt is None or rtt is False:
+        return None
+    return rtt
+
+
+def icmp_sweep(
+    hosts: Iterable[str], timeout: float = 2.0, workers: int = ICMP_WORKERS
+) -> Dict[str, Optional[float]]:
+    """
+    Ping all hosts concurrently.
+
+    Args:
+        hosts: Hosts to check
+        timeout: Per-host timeout in seconds
+        workers: Maximum number of pings in flight
+
+    Returns:
+        dict mapping host to RTT in seconds, or None if unreachable
+    """
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(workers, len(hosts))) as executor:
+        rtts = executor.map(lambda host: _icmp_probe(host, timeout), hosts)
+        return dict(zip(hosts, rtts))
+
+
+async def _tcp_probe(
+    host: str, port: int, timeout: float, semaphore: asyncio.Semaphore
+) -> Optional[float]:
+    """Time a TCP connect to host:port, returning None if it fails."""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.debug(f"TCP probe of {host}:{port} failed: {e!r}")
+            return None
+        rtt = time.perf_counter() - start
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return rtt
+
+
+async def _tcp_sweep(hosts, port, timeout, limit):
+    semaphore = asyncio.Semaphore(limit)
+    rtts = await asyncio.gather(*(_tcp_probe(host, port, timeout, semaphore) for host in hosts))
+    return dict(zip(hosts, rtts))
+
+
+def tcp_sweep(
+    hosts: Iterable[str], port: int = 22, timeout: float = 2.0, limit: int = TCP_CONNECTIONS
+) -> Dict[str, Optional[float]]:
+    """
+    Check all hosts concurrently with a TCP connect, on a single event loop.
+
+    Args:
+        hosts: Hosts to check
+        port: TCP port to connect to (SSH by default)
+        timeout: Per-host timeout in seconds
+        limit: Maximum number of connection attempts in flight
+
+    Returns:
+        dict mapping host to connect time in seconds, or None if unreachable
+    """
+    hosts = list(dict.fromkeys(hosts))
+    if not hosts:
+        return {}
+    return asyncio.run(_tcp_sweep(hosts, port, timeout, limit))
+
+
+def sweep(
+    hosts: Iterable[str], method: str = "icmp", port: int = 22, timeout: float = 2.0
+) -> Dict[str, Optional[float]]:
+    """
+    Run a reachability sweep over the inventory.
+
+    Args:
+        hosts: Hosts to check
+        method: 'icmp', 'tcp' or 'none' (treat every host as reachable)
+        port: TCP port used by the 'tcp' method
+        timeout: Per-host timeout in seconds
+
+    Returns:
+        dict mapping host to RTT in seconds, or None if unreachable
+        (the 'none' method reports an RTT of 0.0 for every host)
+    """
+    hosts = list(dict.fromkeys(hosts))
+    start = time.perf_counter()
+
+    if method == "icmp":
+        rtts = icmp_sweep(hosts, timeout=timeout)
+    elif method == "tcp":
+        rtts = tcp_sweep(hosts, port=port, timeout=timeout)
+    elif method == "none":
+        return {host: 0.0 for host in hosts}
+    else:
+        raise ValueError(f"Unknown reachability method: {method}")
+
+    down = sum(1 for rtt in rtts.values() if rtt is None)
+    logger.info(
+        f"Reachability sweep ({method}) of {len(hosts)} devices took "
+        f"{time.perf_counter() - start:.1f}s: {len(hosts) - down} up, {down} down"
+    )
+    return rtts
@@ -0,0 +1,93 @@
+"""
+repo_lock.py - Cross-process lock of a backup storage directory.
+
+Overlapping runs (e.g. a cron job that overran its interval) must not write
+to the same repository at the same time: git fails on ``index.lock`` and
+the hash index would lose updates. The lock is an ``flock`` on a file in the
+storage state directory, so it is released by the kernel when the holder
+exits, however it exits.
+
+On platforms without fcntl the lock is a no-op.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Seconds between attempts while waiting for the lock
+LOCK_POLL_INTERVAL = 0.2
+
+
+class RepositoryLock:
+    """Exclusive, process-wide lock on a storage directory."""
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: Lock file (created on first acquire)
+        """
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        """Whether this process holds the lock."""
+        return self._fd is not None
+
+    def acquire(self, timeout: float = 0) -> bool:
+        """
+        Take the lock, waiting up to timeout seconds for the current holder.
+
+        Returns:
+            True if the lock is now held, False on timeout
+        """
+        if self.held:
+            return True
+        if fcntl is None:
+            self._fd = -1
+            return True
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    return False
+                time.sleep(LOCK_POLL_INTERVAL)
+
+        # Record the holder, for whoever is left waiting
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        logger.debug(f"Acquired repository lock {self.path}")
+        return True
+
+    def holder(self) -> Optional[int]:
+        """Return the PID recorded by the current holder, if any."""
+        try:
+            return int(self.path.read_text().strip())
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        """Release the lock if held."""
+        if self._fd is None:
+            return
+        if self._fd >= 0:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+        logger.debug(f"Released repository lock {self.path}")
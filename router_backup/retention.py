@@ -0,0 +1,102 @@
+"""
+Retention policy for stored backups.
+
+A policy is a set of tiers, each keeping the newest backup of every hour,
+day, week, month or year for a number of days (or forever):
+
+    retention:
+      hourly: 2        # one per hour for 2 days
+      daily: 30        # one per day for 30 days
+      weekly: 365      # one per ISO week for a year
+      monthly: forever # one per month, never expires
+
+A backup is kept if any tier keeps it; the newest backup is always kept.
+The txt model applies the policy to each device's snapshot files, the git
+models to the commits of the branch (history compaction).
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+# Tier name -> bucket key of a timestamp
+TIERS: Dict[str, Callable[[datetime], tuple]] = {
+    "hourly": lambda ts: (ts.year, ts.month, ts.day, ts.hour),
+    "daily": lambda ts: (ts.year, ts.month, ts.day),
+    "weekly": lambda ts: tuple(ts.isocalendar()[:2]),
+    "monthly": lambda ts: (ts.year, ts.month),
+    "yearly": lambda ts: (ts.year,),
+}
+
+FOREVER = "forever"
+
+
+class RetentionPolicy:
+    """Decides which backups of a series to keep."""
+
+    def __init__(self, tiers: Dict[str, Optional[float]]):
+        """
+        Args:
+            tiers: Tier name -> days to keep (None keeps forever)
+        """
+        self.tiers = tiers
+
+    @classmethod
+    def from_config(cls, retention: Optional[Dict]) -> Optional["RetentionPolicy"]:
+        """
+        Build a policy from the ``retention`` config mapping.
+
+        Returns:
+            The policy, or None if no retention is configured
+
+        Raises:
+            ValueError: On unknown tiers or invalid durations
+        """
+        if not retention:
+            return None
+        tiers = {}
+        for name, days in retention.items():
+            if name not in TIERS:
+                raise ValueError(f"Unknown retention tier: {name} (use {', '.join(TIERS)})")
+            if days is None or days == FOREVER:
+                tiers[name] = None
+            else:
+                try:
+                    tiers[name] = float(days)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid retention for {name}: {days!r}")
+                if tiers[name] < 0:
+                    raise ValueError(f"Invalid retention for {name}: {days!r}")
+        return cls(tiers)
+
+    def select(self, timestamps: List[datetime], now: Optional[datetime] = None) -> Set[int]:
+        """
+        Choose the backups to keep.
+
+        Args:
+            timestamps: Backup times of one series (any order)
+            now: Reference time (defaults to now)
+
+        Returns:
+            Indices into timestamps of the backups to keep
+        """
+        if not timestamps:
+            return set()
+        now = now or datetime.now()
+        # Ties go to the later entry, e.g. commits made within the same second
+        newest_first = sorted(
+            range(len(timestamps)), key=lambda i: (timestamps[i], i), reverse=True
+        )
+        keep = {newest_first[0]}
+
+        for name, days in self.tiers.items():
+            bucket_of = TIERS[name]
+            cutoff = None if days is None else now - timedelta(days=days)
+            seen = set()
+            for i in newest_first:
+                if cutoff is not None and timestamps[i] < cutoff:
+                    break
+                bucket = bucket_of(timestamps[i])
+                if bucket not in seen:
+                    seen.add(bucket)
+                    keep.add(i)
+        return keep
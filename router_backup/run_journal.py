@@ -0,0 +1,174 @@
+"""
+run_journal.py - Per-device checkpoint journal of backup runs.
+
+Every run appends what happened to each device to a JSON-lines file in the
+storage state directory, one file per command (``all``, or a vendor
+selection key), holding only that command's latest run:
+
+    {"event": "start", "run": "...", "command": "all", "time": ..., "devices": [...]}
+    {"event": "stored", "ip": "10.0.0.1", "file": "core-rtr1", "status": "written"}
+    {"event": "outcome", "ip": "10.0.0.1", "outcome": "success", "vendor": "1"}
+    {"event": "end", "time": ..., "results": {"success": 1, ...}}
+
+A run killed before its ``end`` line can be resumed: devices whose config
+reached storage are not collected again. ``retry --failed`` re-runs the
+failed and down devices of the most recent run and appends to its journal:
+
+    {"event": "retry", "time": ..., "devices": [...]}
+    ... stored and outcome lines of the retried devices ...
+    {"event": "end", "time": ..., "results": {...}}
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Directory (under the storage state directory) holding the journals
+JOURNAL_DIR = "journal"
+
+# Outcomes retried by ``retry --failed``
+RETRY_OUTCOMES = ("failed", "down")
+
+
+class RunState:
+    """A run as read back from its journal."""
+
+    def __init__(self, start: dict):
+        self.run: str = start["run"]
+        self.command: str = start["command"]
+        self.started: float = start["time"]
+        self.devices: List[str] = start.get("devices", [])
+        self.finished = False
+        self.retries = 0
+        self.stored: Dict[str, dict] = {}
+        self.outcomes: Dict[str, dict] = {}
+
+    def _apply(self, entry: dict):
+        event = entry.get("event")
+        if event == "stored":
+            self.stored[entry["ip"]] = entry
+        elif event == "outcome":
+            # A success is final: 'all' tries every driver on devices without
+            # a vendor, and all but one of them fail
+            if self.outcomes.get(entry["ip"], {}).get("outcome") != "success":
+                self.outcomes[entry["ip"]] = entry
+        elif event == "retry":
+            # Resuming an interrupted retry continues the retried devices
+            self.devices = entry.get("devices", [])
+            self.retries += 1
+            self.finished = False
+        elif event == "end":
+            self.finished = True
+
+    def retry_targets(self) -> Dict[str, Optional[str]]:
+        """Return the failed and down devices (IP -> vendor selection)."""
+        return {
+            ip: entry.get("vendor")
+            for ip, entry in self.outcomes.items()
+            if entry["outcome"] in RETRY_OUTCOMES
+        }
+
+
+class RunJournal:
+    """Append-only journal of one command's latest run."""
+
+    def __init__(self, state_dir: Path, command: str):
+        """
+        Args:
+            state_dir: Storage state directory
+            command: Name of the command being journaled ('all' or a selection key)
+        """
+        self.command = command
+        self.path = Path(state_dir) / JOURNAL_DIR / f"{command}.jsonl"
+        self._lock = threading.Lock()
+
+    def _append(self, entry: dict):
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        # One write per line, so a kill leaves at most one partial line
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+    def load(self) -> Optional[RunState]:
+        """Read the journaled run back, or None if there is none."""
+        return load_run(self.path)
+
+    def start(self, devices: List[str]) -> str:
+        """
+        Start a new run, replacing the previous one.
+
+        Args:
+            devices: IPs of the devices the run is meant to back up
+
+        Returns:
+            Id of the run
+        """
+        run = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        start = {
+            "event": "start",
+            "run": run,
+            "command": self.command,
+            "time": time.time(),
+            "devices": devices,
+        }
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(start, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        return run
+
+    def retry(self, devices: List[str]):
+        """
+        Continue the journaled run with a retry of some of its devices.
+
+        The run's earlier outcomes are kept; outcomes of the retried devices
+        are appended after them.
+
+        Args:
+            devices: IPs of the devices being retried
+        """
+        self._append({"event": "retry", "time": time.time(), "devices": devices})
+
+    def record_stored(self, ip: str, filename: str, status: str):
+        """Record that a device's config reached storage."""
+        self._append({"event": "stored", "ip": ip, "file": filename, "status": status})
+
+    def record_outcome(self, ip: str, outcome: str, vendor: Optional[str] = None):
+        """Record the outcome of a device ('success', 'failed' or 'down')."""
+        self._append({"event": "outcome", "ip": ip, "outcome": outcome, "vendor": vendor})
+
+    def finish(self, results: dict):
+        """Mark the run complete."""
+        counts = {key: value for key, value in results.items() if isinstance(value, int)}
+        self._append({"event": "end", "time": time.time(), "results": counts})
+
+
+def load_run(path: Path) -> Optional[RunState]:
+    """Read the run journaled at path; a trailing partial line is ignored."""
+    try:
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None
+
+    state = None
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if entry.get("event") == "start":
+            state = RunState(entry)
+        elif state is not None:
+            state._apply(entry)
+    return state
+
+
+def latest_run(state_dir: Path) -> Optional[RunState]:
+    """Return the most recently started run of any command."""
+    runs = [load_run(path) for path in (Path(state_dir) / JOURNAL_DIR).glob("*.jsonl")]
+    runs = [run for run in runs if run is not None]
+    return max(runs, key=lambda run: run.started, default=None)
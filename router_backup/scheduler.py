@@ -0,0 +1,437 @@
+"""
+scheduler.py - Long-running backup daemon with cron-style schedules.
+
+``router-backup daemon`` keeps the interpreter, the vendor drivers and the
+storage open between runs, instead of paying for them on every cron start.
+Schedules are read from the ``schedules`` list of config.yaml:
+
+    schedules:
+      - name: core
+        cron: "*/30 * * * *"
+        vendor: cisco_ios
+        site: [dc1, dc2]
+      - name: nightly
+        cron: "0 2 * * *"
+
+Each schedule selects devices by vendor, site and/or IP (all devices when
+none is given). When a schedule fires its devices are queued; a device that
+is already queued or being backed up is not queued twice, so overlapping
+triggers coalesce. A single worker thread backs up everything queued as
+one batch.
+
+The daemon answers status requests on a Unix socket with a JSON document
+(``router-backup status``).
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+# Socket file (under the storage state directory) of the status endpoint
+STATUS_SOCKET = "daemon.sock"
+
+# Ranges of the five cron fields: minute, hour, day of month, month, day of week
+# (Sunday is 0 or 7)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# Keys of a schedule entry that select devices
+SCHEDULE_SELECTORS = ("vendor", "site", "devices")
+
+# Longest sleep of the schedule loop between checks for request_stop()
+STOP_POLL_SECONDS = 1.0
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> Set[int]:
+    """Expand one cron field ('*', '*/5', '1-5', '1,15', '10-40/10') to its values."""
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {field}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            start, end = int(start_text), int(end_text)
+        else:
+            start = end = int(part)
+            if step > 1:
+                end = high
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron field {field!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A five-field cron expression (minute hour day-of-month month day-of-week)."""
+
+    def __init__(self, expression: str):
+        """
+        Raises:
+            ValueError: If the expression is not a valid cron expression
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        try:
+            parsed = [
+                _parse_cron_field(field, low, high)
+                for field, (low, high) in zip(fields, CRON_FIELDS)
+            ]
+        except ValueError as e:
+            raise ValueError(f"Invalid cron expression {expression!r}: {e}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # cron counts Sunday as 0, Python as 6
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        # Restricting both day fields means either may match, as in cron
+        self._day_or = not fields[2].startswith("*") and not fields[4].startswith("*")
+
+    def _day_matches(self, day: datetime) -> bool:
+        in_month = day.day in self.days
+        in_week = day.weekday() in self.weekdays
+        return (in_month or in_week) if self._day_or else (in_month and in_week)
+
+    def next_after(self, after: datetime) -> datetime:
+        """Return the first matching minute after the given time."""
+        moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months or not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"Cron expression {self.expression!r} never matches")
+
+
+def _as_set(value) -> Optional[Set[str]]:
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return {str(item) for item in value}
+    return {str(value)}
+
+
+class Schedule:
+    """A named cron schedule and the devices it backs up."""
+
+    def __init__(
+        self,
+        name: str,
+        cron: CronSchedule,
+        vendors: Optional[Set[str]] = None,
+        sites: Optional[Set[str]] = None,
+        devices: Optional[Set[str]] = None,
+    ):
+        """
+        Args:
+            name: Schedule name (used in commit messages and status)
+            cron: When the schedule fires
+            vendors: VENDOR_MAP selection keys to back up (None: any)
+            sites: CSV site values to back up (None: any)
+            devices: Device IPs to back up (None: any)
+        """
+        self.name = name
+        self.cron = cron
+        self.vendors = vendors
+        self.sites = sites
+        self.devices = devices
+
+    @classmethod
+    def from_config(
+        cls, entry: dict, resolve_vendor: Callable[[str], Optional[str]]
+    ) -> "Schedule":
+        """
+        Build a schedule from one entry of the config's ``schedules`` list.
+
+        Args:
+            entry: {'name', 'cron', and optionally 'vendor', 'site', 'devices'}
+            resolve_vendor: Maps a vendor name to its selection key
+
+        Raises:
+            ValueError: If the entry is invalid
+        """
+        if not isinstance(entry, dict) or "cron" not in entry:
+            raise ValueError(f"Schedule needs a cron expression: {entry!r}")
+        unknown = set(entry) - {"name", "cron", *SCHEDULE_SELECTORS}
+        if unknown:
+            raise ValueError(f"Unknown schedule keys: {', '.join(sorted(unknown))}")
+
+        vendors = None
+        if entry.get("vendor") is not None:
+            vendors = set()
+            for name in _as_set(entry["vendor"]):
+                selection = resolve_vendor(name)
+                if selection is None:
+                    raise ValueError(f"Unknown vendor in schedule: {name}")
+                vendors.add(selection)
+
+        return cls(
+            name=str(entry.get("name") or entry["cron"]),
+            cron=CronSchedule(str(entry["cron"])),
+            vendors=vendors,
+            sites=_as_set(entry.get("site")),
+            devices=_as_set(entry.get("devices")),
+        )
+
+    def selects(self, device: dict, selection: str) -> bool:
+        """Check whether a device (with its vendor selection) belongs to this schedule."""
+        if self.vendors is not None and selection not in self.vendors:
+            return False
+        if self.sites is not None and device.get("site") not in self.sites:
+            return False
+        if self.devices is not None and device["ip"] not in self.devices:
+            return False
+        return True
+
+
+def _isoformat(moment: Optional[datetime]) -> Optional[str]:
+    return moment.isoformat(timespec="seconds") if moment else None
+
+
+class _StatusHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        status = self.server.daemon_status()
+        self.wfile.write(json.dumps(status).encode() + b"\n")
+
+
+class _StatusServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def read_status(path: Path, timeout: float = 5.0) -> dict:
+    """
+    Ask a running daemon for its status.
+
+    Raises:
+        OSError: If no daemon is listening on path
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+class BackupDaemon:
+    """Fires schedules, coalesces the devices they select and backs them up in batches."""
+
+    def __init__(
+        self,
+        schedules: List[Schedule],
+        load_jobs: Callable[[], List[Tuple[dict, str]]],
+        run_batch: Callable[[List[Tuple[dict, str]], str], dict],
+        status_path: Optional[Path] = None,
+    ):
+        """
+        Args:
+            schedules: Schedules to fire
+            load_jobs: Returns the inventory as (device, selection) jobs;
+                called on every trigger, so it should cache
+            run_batch: Backs up a list of jobs under a batch name and returns
+                the run results
+            status_path: Unix socket of the status endpoint (None: no endpoint)
+        """
+        self.schedules = schedules
+        self.load_jobs = load_jobs
+        self.run_batch = run_batch
+        self.status_path = Path(status_path) if status_path else None
+        self.started = datetime.now()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = False
+        # Set by request_stop(), which may run in a signal handler
+        self._stop_requested = threading.Event()
+        # Jobs waiting for the worker, by IP, and the schedules that queued them
+        self._queued: Dict[str, Tuple[dict, str]] = {}
+        self._queued_by: List[str] = []
+        self._running: Set[str] = set()
+        self._next_runs: Dict[str, datetime] = {}
+        self._last_runs: Dict[str, datetime] = {}
+        self._last_batch: Optional[dict] = None
+        self._coalesced = 0
+        self._server: Optional[_StatusServer] = None
+
+    def trigger(self, schedule: Schedule) -> int:
+        """
+        Queue the devices of a schedule that are not already queued or running.
+
+        Returns:
+            Number of devices queued
+        """
+        jobs = [job for job in self.load_jobs() if schedule.selects(*job)]
+        with self._lock:
+            self._last_runs[schedule.name] = datetime.now()
+            added = 0
+            for device, selection in jobs:
+                ip = device["ip"]
+                if ip in self._queued or ip in self._running:
+                    self._coalesced += 1
+                    continue
+                self._queued[ip] = (device, selection)
+                added += 1
+            if added and schedule.name not in self._queued_by:
+                self._queued_by.append(schedule.name)
+            self._wakeup.notify_all()
+        skipped = len(jobs) - added
+        logger.info(
+            f"Schedule {schedule.name} fired: {added} devices queued"
+            + (f", {skipped} already queued or running" if skipped else "")
+        )
+        return added
+
+    def _work(self):
+        """Worker thread: back up everything queued, one batch at a time."""
+        while True:
+            with self._lock:
+                while not self._queued and not self._stopping:
+                    self._wakeup.wait()
+                if self._stopping:
+                    return
+                batch = list(self._queued.values())
+                name = "+".join(self._queued_by)
+                self._queued, self._queued_by = {}, []
+                self._running = {device["ip"] for device, _ in batch}
+
+            started = time.time()
+            try:
+                results = self.run_batch(batch, name)
+            except Exception as e:
+                logger.error(f"Scheduled backup {name} failed: {e}")
+                results = {"error": str(e)}
+
+            with self._lock:
+                self._running = set()
+                self._last_batch = {
+                    "name": name,
+                    "started": datetime.fromtimestamp(started).isoformat(timespec="seconds"),
+                    "seconds": round(time.time() - started, 1),
+                    "devices": len(batch),
+                    "results": {
+                        key: value
+                        for key, value in results.items()
+                        if isinstance(value, (int, str))
+                    },
+                }
+
+    def status(self) -> dict:
+        """Return the daemon's state as a JSON-serialisable dict."""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "started": self.started.isoformat(timespec="seconds"),
+                "schedules": [
+                    {
+                        "name": schedule.name,
+                        "cron": schedule.cron.expression,
+                        "next_run": _isoformat(self._next_runs.get(schedule.name)),
+                        "last_run": _isoformat(self._last_runs.get(schedule.name)),
+                    }
+                    for schedule in self.schedules
+                ],
+                "running": sorted(self._running),
+                "queued": sorted(self._queued),
+                "coalesced": self._coalesced,
+                "last_batch": self._last_batch,
+            }
+
+    def _start_status_server(self):
+        if self.status_path is None or not hasattr(socket, "AF_UNIX"):
+            return
+        self.status_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.status_path.exists():
+            try:
+                read_status(self.status_path, timeout=1)
+            except OSError:
+                # Left behind by a daemon that did not exit cleanly
+                self.status_path.unlink()
+            else:
+                raise RuntimeError(f"Another daemon is listening on {self.status_path}")
+        self._server = _StatusServer(str(self.status_path), _StatusHandler)
+        self._server.daemon_status = self.status
+        os.chmod(self.status_path, 0o600)
+        threading.Thread(
+            target=self._server.serve_forever, name="daemon-status", daemon=True
+        ).start()
+        logger.info(f"Status socket at {self.status_path}")
+
+    def run(self, now: Callable[[], datetime] = datetime.now):
+        """
+        Fire schedules until stop() or request_stop() is called (or Ctrl-C).
+
+        Raises:
+            RuntimeError: If another daemon owns the status socket
+        """
+        self._start_status_server()
+        worker = threading.Thread(target=self._work, name="daemon-worker")
+        worker.start()
+        try:
+            current = now()
+            for schedule in self.schedules:
+                self._next_runs[schedule.name] = schedule.cron.next_after(current)
+            while not self._stop_requested.is_set():
+                with self._lock:
+                    if self._stopping:
+                        break
+                    wait = min(self._next_runs.values()) - now()
+                    self._wakeup.wait(max(0.0, min(wait.total_seconds(), STOP_POLL_SECONDS)))
+                    if self._stopping:
+                        break
+                if self._stop_requested.is_set():
+                    break
+                current = now()
+                for schedule in self.schedules:
+                    if self._next_runs[schedule.name] <= current:
+                        self.trigger(schedule)
+                        with self._lock:
+                            self._next_runs[schedule.name] = schedule.cron.next_after(current)
+        except KeyboardInterrupt:
+            logger.info("Daemon interrupted")
+        finally:
+            self.stop()
+            # A batch in progress is finished; queued devices are dropped
+            worker.join()
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
+                try:
+                    self.status_path.unlink()
+                except OSError:
+                    pass
+
+    def request_stop(self):
+        """
+        Ask run() to stop after the current batch; safe in a signal handler.
+
+        The handler runs on the thread of run(), possibly while it holds the
+        lock, so this only sets an event that run() polls.
+        """
+        self._stop_requested.set()
+
+    def stop(self):
+        """Stop run() after the current batch; safe to call from any thread."""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
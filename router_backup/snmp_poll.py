@@ -0,0 +1,333 @@
+"""
+SNMP pre-pass that finds the devices whose configuration changed.
+
+Before any SSH session, one SNMPv2c GET per device reads a config-change
+counter, e.g. Cisco's ccmHistoryRunningLastChanged (the sysUpTime of the
+last running-config change). The value is compared with the one stored
+after the device's last successful backup; only devices whose value moved
+(or could not be read) are collected over SSH.
+
+The whole inventory is polled concurrently on a single event loop. The
+protocol is the handful of BER types a GET needs, so no SNMP library is
+required; encode_message() and parse_message() also serve agent stand-ins
+in the tests.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# Upper bound on requests in flight at once
+SNMP_REQUESTS = 1024
+
+SNMP_VERSION_2C = 1
+
+# BER tags
+TAG_INTEGER = 0x02
+TAG_OCTET_STRING = 0x04
+TAG_NULL = 0x05
+TAG_OID = 0x06
+TAG_SEQUENCE = 0x30
+TAG_IP_ADDRESS = 0x40
+TAG_COUNTER32 = 0x41
+TAG_GAUGE32 = 0x42
+TAG_TIMETICKS = 0x43
+TAG_COUNTER64 = 0x46
+TAG_GET_REQUEST = 0xA0
+TAG_GET_RESPONSE = 0xA2
+
+# Varbind values meaning the agent has no such OID
+NO_VALUE_TAGS = (0x80, 0x81, 0x82)
+
+_request_ids = itertools.count((os.getpid() << 12) & 0x3FFFFFFF)
+
+
+def _encode_length(length: int) -> bytes:
+    if length < 0x80:
+        return bytes([length])
+    body = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([0x80 | len(body)]) + body
+
+
+def _tlv(tag: int, body: bytes) -> bytes:
+    return bytes([tag]) + _encode_length(len(body)) + body
+
+
+def _encode_integer(tag: int, value: int) -> bytes:
+    length = max(1, (value.bit_length() + 8) // 8)
+    return _tlv(tag, value.to_bytes(length, "big", signed=True))
+
+
+def _encode_oid(oid: str) -> bytes:
+    parts = [int(part) for part in oid.strip(".").split(".")]
+    if len(parts) < 2:
+        raise ValueError(f"Invalid OID: {oid}")
+    body = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        body.extend(reversed(chunk))
+    return _tlv(TAG_OID, bytes(body))
+
+
+def _encode_value(value) -> bytes:
+    """Encode a varbind value: None (NULL), str/bytes (octets), int or (tag, int)."""
+    if value is None:
+        return _tlv(TAG_NULL, b"")
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return _tlv(TAG_OCTET_STRING, value)
+    if isinstance(value, tuple):
+        tag, number = value
+        if tag in NO_VALUE_TAGS:
+            return _tlv(tag, b"")
+        return _encode_integer(tag, number)
+    return _encode_integer(TAG_INTEGER, value)
+
+
+def encode_message(
+    community: str, pdu_type: int, request_id: int, varbinds: List[Tuple[str, object]]
+) -> bytes:
+    """
+    Encode an SNMPv2c message.
+
+    Args:
+        community: Community string
+        pdu_type: TAG_GET_REQUEST or TAG_GET_RESPONSE
+        request_id: Request id echoed by the agent
+        varbinds: (OID, value) pairs; see _encode_value() for values
+
+    Returns:
+        The datagram
+    """
+    bindings = b"".join(
+        _tlv(TAG_SEQUENCE, _encode_oid(oid) + _encode_value(value)) for oid, value in varbinds
+    )
+    pdu = _tlv(
+        pdu_type,
+        _encode_integer(TAG_INTEGER, request_id)
+        + _encode_integer(TAG_INTEGER, 0)
+        + _encode_integer(TAG_INTEGER, 0)
+        + _tlv(TAG_SEQUENCE, bindings),
+    )
+    version = _encode_integer(TAG_INTEGER, SNMP_VERSION_2C)
+    return _tlv(TAG_SEQUENCE, version + _tlv(TAG_OCTET_STRING, community.encode()) + pdu)
+
+
+def _read_tlv(data: bytes, offset: int) -> Tuple[int, bytes, int]:
+    """Read one TLV at offset, returning (tag, body, offset after it)."""
+    try:
+        tag = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            size = length & 0x7F
+            length = int.from_bytes(data[offset : offset + size], "big")
+            offset += size
+    except IndexError:
+        raise ValueError("Truncated SNMP message")
+    end = offset + length
+    if end > len(data):
+        raise ValueError("Truncated SNMP message")
+    return tag, data[offset:end], end
+
+
+def _read_sequence(body: bytes) -> List[Tuple[int, bytes]]:
+    items = []
+    offset = 0
+    while offset < len(body):
+        tag, value, offset = _read_tlv(body, offset)
+        items.append((tag, value))
+    return items
+
+
+def _decode_oid(body: bytes) -> str:
+    if not body:
+        raise ValueError("Empty OID")
+    parts = [body[0] // 40, body[0] % 40]
+    value = 0
+    for byte in body[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(value)
+            value = 0
+    return ".".join(str(part) for part in parts)
+
+
+def _decode_value(tag: int, body: bytes):
+    if tag in NO_VALUE_TAGS or tag == TAG_NULL:
+        return None
+    if tag == TAG_INTEGER:
+        return int.from_bytes(body, "big", signed=True)
+    if tag in (TAG_COUNTER32, TAG_GAUGE32, TAG_TIMETICKS, TAG_COUNTER64):
+        return int.from_bytes(body, "big")
+    if tag == TAG_IP_ADDRESS:
+        return ".".join(str(byte) for byte in body)
+    if tag == TAG_OID:
+        return _decode_oid(body)
+    return body
+
+
+def parse_message(data: bytes) -> Tuple[str, int, int, List[Tuple[str, object]]]:
+    """
+    Decode an SNMPv2c message.
+
+    Returns:
+        (community, PDU type, request id, [(OID, value)]); values are ints,
+        bytes, strings (IP addresses, OIDs) or None for NULL and no-such-object
+
+    Raises:
+        ValueError: If data is not an SNMPv2c message
+    """
+    tag, body, _ = _read_tlv(data, 0)
+    if tag != TAG_SEQUENCE:
+        raise ValueError("Not an SNMP message")
+    message = _read_sequence(body)
+    if len(message) != 3 or message[0][0] != TAG_INTEGER or message[1][0] != TAG_OCTET_STRING:
+        raise ValueError("Not an SNMP message")
+    if int.from_bytes(message[0][1], "big") != SNMP_VERSION_2C:
+        raise ValueError("Not an SNMPv2c message")
+
+    pdu_type, pdu = message[2]
+    fields = _read_sequence(pdu)
+    if len(fields) != 4 or fields[3][0] != TAG_SEQUENCE:
+        raise ValueError("Malformed SNMP PDU")
+    request_id = int.from_bytes(fields[0][1], "big", signed=True)
+    error_status = int.from_bytes(fields[1][1], "big")
+    if error_status:
+        raise ValueError(f"SNMP error status {error_status}")
+
+    varbinds = []
+    for _, binding in _read_sequence(fields[3][1]):
+        (_, oid), (value_tag, value) = _read_sequence(binding)
+        varbinds.append((_decode_oid(oid), _decode_value(value_tag, value)))
+    return message[1][1].decode(errors="replace"), pdu_type, request_id, varbinds
+
+
+def _stamp(value) -> Optional[str]:
+    """Turn a polled value into the stamp stored between runs."""
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+class _GetProtocol(asyncio.DatagramProtocol):
+    """Receives the response to one GET."""
+
+    def __init__(self, request_id: int, future: asyncio.Future):
+        self.request_id = request_id
+        self.future = future
+
+    def datagram_received(self, data: bytes, addr):
+        try:
+            _, pdu_type, request_id, varbinds = parse_message(data)
+        except ValueError as e:
+            logger.debug(f"Ignoring SNMP datagram from {addr}: {e}")
+            return
+        if pdu_type == TAG_GET_RESPONSE and request_id == self.request_id:
+            if not self.future.done():
+                self.future.set_result(varbinds)
+
+    def error_received(self, exc: Exception):
+        # ICMP port unreachable and the like
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def _snmp_get(
+    host: str,
+    oid: str,
+    community: str,
+    port: int,
+    timeout: float,
+    retries: int,
+    semaphore: asyncio.Semaphore,
+) -> Optional[str]:
+    """GET one OID from host, returning its stamp or None if it cannot be read."""
+    loop = asyncio.get_running_loop()
+    async with semaphore:
+        request_id = next(_request_ids) & 0x7FFFFFFF
+        request = encode_message(community, TAG_GET_REQUEST, request_id, [(oid, None)])
+        future = loop.create_future()
+        try:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: _GetProtocol(request_id, future), remote_addr=(host, port)
+            )
+        except OSError as e:
+            logger.debug(f"SNMP poll of {host} failed: {e}")
+            return None
+        try:
+            for _ in range(retries + 1):
+                transport.sendto(request)
+                try:
+                    varbinds = await asyncio.wait_for(asyncio.shield(future), timeout)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+            else:
+                logger.debug(f"SNMP poll of {host} timed out")
+                return None
+        except OSError as e:
+            logger.debug(f"SNMP poll of {host} failed: {e}")
+            return None
+        finally:
+            transport.close()
+
+    values = dict(varbinds)
+    return _stamp(values.get(oid.strip(".")))
+
+
+async def _snmp_sweep(targets, community, port, timeout, retries, limit):
+    semaphore = asyncio.Semaphore(limit)
+    hosts = list(targets)
+    stamps = await asyncio.gather(
+        *(
+            _snmp_get(host, targets[host], community, port, timeout, retries, semaphore)
+            for host in hosts
+        )
+    )
+    return dict(zip(hosts, stamps))
+
+
+def snmp_sweep(
+    targets: Dict[str, str],
+    community: str = "public",
+    port: int = 161,
+    timeout: float = 2.0,
+    retries: int = 1,
+    limit: int = SNMP_REQUESTS,
+) -> Dict[str, Optional[str]]:
+    """
+    Read one config-change OID from every host concurrently.
+
+    Args:
+        targets: dict mapping host to the OID to read from it
+        community: SNMPv2c community
+        port: Agent UDP port
+        timeout: Seconds to wait for each attempt
+        retries: Attempts after the first one that timed out
+        limit: Maximum number of requests in flight
+
+    Returns:
+        dict mapping host to the polled stamp, or None if it could not be read
+    """
+    if not targets:
+        return {}
+    start = time.perf_counter()
+    stamps = asyncio.run(_snmp_sweep(targets, community, port, timeout, retries, max(1, limit)))
+    missing = sum(1 for stamp in stamps.values() if stamp is None)
+    logger.info(
+        f"SNMP pre-pass of {len(targets)} devices took {time.perf_counter() - start:.1f}s: "
+        f"{len(targets) - missing} answered, {missing} without a stamp"
+    )
+    return stamps
@@ -1,17 +1,242 @@
 """Unified storage interface for router-backup."""
 
+import difflib
+import hashlib
+import json
 import os
+import queue
+import re
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Callable, Dict, Iterable, Iterator, Optional, Literal, Tuple
 from loguru import logger
 
 from router_backup.storage_git import StorageGit
 from router_backup.storage_pygit import StoragePyGit
+from router_backup.txt_compression import (
+    DEFAULT_DICT_SIZE,
+    DICT_DIR_NAME,
+    SnapshotCodec,
+    train_dictionary,
+)
+from router_backup.repo_lock import RepositoryLock
+from router_backup.retention import RetentionPolicy
+from router_backup.txt_index import TxtSnapshotIndex
+from router_backup.txt_store import OBJECTS_DIR, POINTER_SUFFIX, ObjectStore, read_snapshot
 
 
 StorageModel = Literal["txt", "git", "pygit"]
 
+# Directory under storage_path holding router-backup's own state files
+STATE_DIR = ".router-backup"
+
+# txt model snapshots are named <filename>_<MM-DD-YYYY_HH-MM>.txt
+TXT_TIMESTAMP_FORMAT = "%m-%d-%Y_%H-%M"
+TXT_FILENAME_PATTERN = re.compile(
+    r"^(?P<name>.+)_(?P<stamp>\d{2}-\d{2}-\d{4}_\d{2}-\d{2})\.txt(?:\.gz|\.zst)?(?:\.ref)?$"
+)
+
+# Formats of the run timestamp given to BackupStorage (the CLI's, then the default)
+RUN_TIMESTAMP_FORMATS = (TXT_TIMESTAMP_FORMAT, "%Y-%m-%d_%H-%M")
+
+
+# Seconds a run waits for another process's lock before spooling its writes
+DEFAULT_LOCK_TIMEOUT = 60
+
+# Directory (under the state directory) of writes spooled by runs that found
+# the storage locked; the lock holder stores them when it finishes
+SPOOL_DIR = "spool"
+
+# Writes a QueuedWriter buffers before collectors block
+DEFAULT_WRITE_QUEUE_SIZE = 64
+
+# Placeholders of the directory layout template; date fields (txt model only)
+# partition snapshots by the day they were taken
+LAYOUT_FIELDS = ("hostname", "ip", "vendor", "site")
+LAYOUT_DATE_FIELDS = ("year", "month", "day")
+LAYOUT_UNKNOWN = "unknown"
+
+
+def parse_txt_filename(name: str) -> Optional[Tuple[str, datetime]]:
+    """
+    Split a txt snapshot file name into backup name and timestamp.
+
+    Returns:
+        (filename, timestamp), or None if name is not a txt snapshot
+    """
+    match = TXT_FILENAME_PATTERN.match(name)
+    if not match:
+        return None
+    try:
+        stamp = datetime.strptime(match.group("stamp"), TXT_TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+    return match.group("name"), stamp
+
+
+def _parse_run_timestamp(timestamp: str) -> Optional[datetime]:
+    """Parse a run timestamp (see RUN_TIMESTAMP_FORMATS); None if it has another format."""
+    for fmt in RUN_TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(timestamp, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def walk_txt_snapshots(root: Path) -> Iterator[Tuple[str, datetime, Path]]:
+    """
+    Find the txt snapshots below root, in any layout directory.
+
+    Hidden directories (the state directory, .git) are skipped.
+
+    Yields:
+        (backup filename, timestamp, path) tuples, in no particular order
+    """
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for name in filenames:
+            parsed = parse_txt_filename(name)
+            if parsed is not None:
+                yield parsed[0], parsed[1], Path(dirpath) / name
+
+
+def _write_json_atomic(path: Path, data) -> None:
+    """Write JSON to path via a temporary file, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+class HashIndex:
+    """Persisted map of backup name to the SHA-256 of its last stored content."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._hashes: Dict[str, str] = {}
+        self._dirty = False
+        if path.exists():
+            try:
+                with open(path, "r") as f:
+                    self._hashes = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable hash index {path}: {e}")
+
+    @staticmethod
+    def digest(content: str) -> str:
+        """Return the SHA-256 hex digest of content."""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, name: str) -> Optional[str]:
+        """Return the last stored value for name, if any."""
+        return self._hashes.get(name)
+
+    def copy(self) -> Dict[str, str]:
+        """Return a copy of the whole map."""
+        return dict(self._hashes)
+
+    def matches(self, name: str, digest: str) -> bool:
+        """Check whether digest is the last stored hash for name."""
+        return self._hashes.get(name) == digest
+
+    def update(self, name: str, digest: str):
+        """Record digest as the last stored hash for name."""
+        if self._hashes.get(name) != digest:
+            self._hashes[name] = digest
+            self._dirty = True
+
+    def save(self):
+        """Persist the index if it changed."""
+        if self._dirty:
+            _write_json_atomic(self.path, self._hashes)
+            self._dirty = False
+
+
+class ChangeStampIndex(HashIndex):
+    """
+    Persisted map of backup name to the change stamp its device reported.
+
+    A change stamp is whatever a vendor's change probe returns (the time of
+    the last configuration change, a commit, a config checksum); it is
+    recorded together with the backup it describes.
+    """
+
+
+class SnmpStampIndex:
+    """
+    Persisted map of device IP to the SNMP config-change value read before its
+    last stored backup, and the name that backup was stored under.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._stamps: Dict[str, Dict[str, str]] = {}
+        self._dirty = False
+        if path.exists():
+            try:
+                with open(path, "r") as f:
+                    self._stamps = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable SNMP stamps {path}: {e}")
+
+    def copy(self) -> Dict[str, Dict[str, str]]:
+        """Return IP -> {'file': backup name, 'stamp': value} for every device."""
+        return {
+            ip: dict(entry)
+            for ip, entry in self._stamps.items()
+            # Entries without the backup name cannot be matched to a stored copy
+            if isinstance(entry, dict) and entry.get("file") and entry.get("stamp")
+        }
+
+    def update(self, ip: str, filename: str, stamp: str):
+        """Record the value read before the backup of ip stored as filename."""
+        entry = {"file": filename, "stamp": stamp}
+        if self._stamps.get(ip) != entry:
+            self._stamps[ip] = entry
+            self._dirty = True
+
+    def save(self):
+        """Persist the map if it changed."""
+        if self._dirty:
+            _write_json_atomic(self.path, self._stamps)
+            self._dirty = False
+
+
+class LocationMap:
+    """Persisted map of backup name to the layout fields it was last written with."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fields: Dict[str, Dict[str, str]] = {}
+        self._dirty = False
+        if path.exists():
+            try:
+                with open(path, "r") as f:
+                    self._fields = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable location map {path}: {e}")
+
+    def get(self, name: str) -> Dict[str, str]:
+        """Return the recorded layout fields of name (empty if unknown)."""
+        return self._fields.get(name, {})
+
+    def update(self, name: str, fields: Dict[str, str]):
+        """Record the layout fields of name."""
+        if self._fields.get(name) != fields:
+            self._fields[name] = fields
+            self._dirty = True
+
+    def save(self):
+        """Persist the map if it changed."""
+        if self._dirty:
+            _write_json_atomic(self.path, self._fields)
+            self._dirty = False
+
 
 class DryRunStats:
     """Statistics for dry-run mode."""
@@ -65,6 +290,16 @@ class BackupStorage:
         hostname: Optional[str] = None,
         timestamp: Optional[str] = None,
         dry_run: bool = False,
+        commit_mode: str = "run",
+        pygit_bare: bool = False,
+        skip_unchanged: bool = True,
+        git_fast_import: bool = False,
+        txt_compression: str = "none",
+        txt_dedup: bool = False,
+        retention: Optional[dict] = None,
+        layout: str = "",
+        lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
+        change_probes: bool = False,
     ):
         """
         Initialize backup storage.
@@ -75,14 +310,93 @@ class BackupStorage:
             hostname: Device hostname (for git commit messages)
             timestamp: Timestamp string (for git commit messages)
             dry_run: If True, simulate operations without writing
+            commit_mode: 'run' to commit all writes between begin_run() and
+                commit_run() at once, 'device' for one commit per write
+            pygit_bare: Use a bare repository for the pygit model
+            skip_unchanged: Skip writes whose content hash matches the last
+                stored version of that backup
+            git_fast_import: Write commits of the git model through a single
+                git fast-import process instead of add/commit
+            txt_compression: Compression of txt snapshots - 'none', 'gzip'
+                or 'zstd' (reads handle all of them)
+            txt_dedup: Store each unique txt snapshot body once and make
+                snapshot files hardlinks (or pointers) to it
+            retention: Retention tiers applied by prune(), e.g.
+                {'daily': 30, 'monthly': 'forever'} (see retention.py)
+            layout: Directory template backups are stored under, e.g.
+                '{vendor}/{site}' or '{year}/{month}/{day}' (txt only);
+                empty stores everything flat in storage_path
+            lock_timeout: Seconds to wait for a run of another process
+                holding the storage lock; a run that times out spools its
+                writes for that process instead
+            change_probes: Let vendor modules skip pulling a configuration
+                when their change probe reports the stamp stored with the
+                last backup
+
+        Raises:
+            ValueError: If the layout template is invalid for the storage model
         """
         self.storage_path = Path(storage_path)
         self.storage_model = storage_model
         self.hostname = hostname or "unknown"
-        self.timestamp = timestamp or datetime.now().strftime("%Y-%m-%d_%H-%M")
+        self.timestamp = timestamp or datetime.now().strftime(RUN_TIMESTAMP_FORMATS[1])
         self.dry_run = dry_run
+        self.commit_mode = commit_mode
+        self.pygit_bare = pygit_bare
+        self.skip_unchanged = skip_unchanged
+        self.git_fast_import = git_fast_import
+        self.txt_compression = txt_compression
+        self.txt_dedup = txt_dedup
+        self.retention = RetentionPolicy.from_config(retention)
+        self.layout = layout.strip("/")
+        self._check_layout()
         self._dry_run_stats = DryRunStats() if dry_run else None
 
+        # Files staged by the current run: filepath -> device description
+        self._run_active = False
+        self._staged = {}
+
+        # Content hashes of the last stored version of every backup; hashes
+        # of staged files are applied once their commit succeeds
+        self.state_dir = self.storage_path / STATE_DIR
+        self._hash_index = HashIndex(self.state_dir / "hashes.json")
+        self._pending_hashes: Dict[str, tuple] = {}
+
+        # Change stamps reported by vendor change probes, stored alongside
+        # the hashes (stamps of staged files travel in _pending_hashes)
+        self.change_probes = change_probes
+        self._stamp_index = ChangeStampIndex(self.state_dir / "stamps.json")
+
+        # Config-change values read by the SNMP pre-pass, by device IP
+        self._snmp_stamps = SnmpStampIndex(self.state_dir / "snmp-stamps.json")
+
+        # Excludes other processes; held for the whole of a run. A run that
+        # cannot get it appends its writes to a spool file instead.
+        self.lock_timeout = lock_timeout
+        self._lock = RepositoryLock(self.state_dir / "lock")
+        self._spool_path: Optional[Path] = None
+
+        # Compresses new txt snapshots and decompresses existing ones
+        self._txt_codec = SnapshotCodec(
+            txt_compression if storage_model == "txt" else "none",
+            self.state_dir / DICT_DIR_NAME,
+        )
+
+        # Sorted snapshot files of every txt backup, for versions/read/diff
+        self._txt_index = TxtSnapshotIndex(self.state_dir / "txt-index.jsonl")
+
+        # Layout fields (vendor, site) by device IP, set by the caller before a
+        # run, and the fields each backup was last written with
+        self._device_info: Dict[str, Dict[str, Optional[str]]] = {}
+        self._locations = LocationMap(self.state_dir / "locations.json")
+
+        # Outcome of each write ('written' or 'unchanged'), by device IP or filename
+        self._write_statuses: Dict[str, str] = {}
+
+        # Serializes writes when devices are backed up concurrently; the git
+        # backends share one index and HEAD and must not commit in parallel.
+        self._write_lock = threading.Lock()
+
         # Ensure storage directory exists
         if not dry_run:
             self.storage_path.mkdir(parents=True, exist_ok=True)
@@ -96,20 +410,111 @@ class BackupStorage:
         elif storage_model == "pygit":
             self._init_pygit_storage()
 
+    def _check_layout(self):
+        """Validate the layout template against the supported placeholders."""
+        if not self.layout:
+            return
+        sample = {field: "x" for field in LAYOUT_FIELDS + LAYOUT_DATE_FIELDS}
+        try:
+            self.layout.format(**sample)
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"Invalid layout {self.layout!r}: unknown placeholder {e}")
+        if self.storage_model != "txt" and any(
+            f"{{{field}}}" in self.layout for field in LAYOUT_DATE_FIELDS
+        ):
+            raise ValueError("Date placeholders in the layout are only supported by txt storage")
+
+    def set_device_info(self, devices: Dict[str, Dict[str, Optional[str]]]):
+        """
+        Provide layout fields of the devices about to be backed up.
+
+        Args:
+            devices: Device IP -> {'vendor': ..., 'site': ...}
+        """
+        with self._write_lock:
+            self._device_info.update(devices)
+
+    def _layout_fields(self, filename: str, device_ip: Optional[str] = None) -> Dict[str, str]:
+        """Return the layout fields of a backup, recording them on write."""
+        recorded = self._locations.get(filename)
+        info = self._device_info.get(device_ip, {}) if device_ip else {}
+        fields = {
+            "hostname": filename,
+            "ip": device_ip or recorded.get("ip") or LAYOUT_UNKNOWN,
+            "vendor": info.get("vendor") or recorded.get("vendor") or LAYOUT_UNKNOWN,
+            "site": info.get("site") or recorded.get("site") or LAYOUT_UNKNOWN,
+        }
+        return {
+            # Field values become single path components
+            name: value.replace("/", "_").replace("\\", "_").replace("..", "_")
+            for name, value in fields.items()
+        }
+
+    def _layout_dir(
+        self, filename: str, device_ip: Optional[str] = None, when: Optional[datetime] = None
+    ) -> str:
+        """
+        Render the layout directory of a backup, relative to storage_path.
+
+        Args:
+            filename: Backup name (hostname)
+            device_ip: Device IP when writing (the fields used are recorded),
+                None when reading
+            when: Snapshot time for date placeholders (txt writes)
+
+        Returns:
+            Relative directory ('' with the flat layout)
+        """
+        if not self.layout:
+            return ""
+        fields = self._layout_fields(filename, device_ip)
+        if device_ip is not None:
+            self._locations.update(filename, {k: fields[k] for k in ("ip", "vendor", "site")})
+        if when is not None:
+            dates = {"year": f"{when:%Y}", "month": f"{when:%m}", "day": f"{when:%d}"}
+        else:
+            dates = {}
+        return self.layout.format(**fields, **dates)
+
+    def _backup_path(self, filename: str, device_ip: Optional[str] = None) -> str:
+        """Return the path of a backup inside a git repository."""
+        directory = self._layout_dir(filename, device_ip)
+        return f"{directory}/{filename}.txt" if directory else f"{filename}.txt"
+
     def _init_git_storage(self):
         """Initialize git storage backend."""
-        self._git_storage = StorageGit(str(self.storage_path))
+        self._git_storage = StorageGit(str(self.storage_path), fast_import=self.git_fast_import)
         if not self.dry_run and not self._git_storage.is_initialized():
             self._git_storage.init()
             logger.info(f"Initialized git repository at {self.storage_path}")
+        self._exclude_state_dir()
+
+    def _exclude_state_dir(self):
+        """Keep the state directory out of git status in working-tree repositories."""
+        exclude_file = self.storage_path / ".git" / "info" / "exclude"
+        if self.dry_run or not exclude_file.parent.parent.is_dir():
+            return
+        pattern = f"/{STATE_DIR}/"
+        try:
+            existing = exclude_file.read_text() if exclude_file.exists() else ""
+            if pattern not in existing.splitlines():
+                exclude_file.parent.mkdir(exist_ok=True)
+                with open(exclude_file, "a") as f:
+                    if existing and not existing.endswith("\n"):
+                        f.write("\n")
+                    f.write(pattern + "\n")
+        except OSError as e:
+            logger.debug(f"Could not update {exclude_file}: {e}")
 
     def _init_pygit_storage(self):
         """Initialize pygit2 storage backend."""
         try:
-            self._pygit_storage = StoragePyGit(str(self.storage_path))
+            self._pygit_storage = StoragePyGit(str(self.storage_path), bare=self.pygit_bare)
             if not self.dry_run and not self._pygit_storage.is_initialized():
                 self._pygit_storage.init()
                 logger.info(f"Initialized pygit2 repository at {self.storage_path}")
+            if not self._pygit_storage.bare:
+                self._exclude_state_dir()
         except ImportError:
             logger.error("pygit2 not installed, falling back to txt storage")
             self.storage_model = "txt"
@@ -117,7 +522,13 @@ class BackupStorage:
             logger.error(f"Failed to initialize pygit2 storage: {e}")
             self.storage_model = "txt"
 
-    def write_backup(self, filename: str, content: str, device_ip: Optional[str] = None):
+    def write_backup(
+        self,
+        filename: str,
+        content: str,
+        device_ip: Optional[str] = None,
+        stamp: Optional[str] = None,
+    ) -> str:
         """
         Write backup content using the configured storage model.
 
@@ -125,34 +536,487 @@ class BackupStorage:
             filename: Base filename (without extension)
             content: Configuration content to store
             device_ip: Device IP address (optional, for commit messages)
+            stamp: Change stamp the device reported for this content,
+                recorded once the content is stored
+
+        Returns:
+            'unchanged' if the write was skipped because the content matches
+            the last stored version, 'spooled' if another process holds the
+            storage and will store it, otherwise 'written'
+
+        Raises:
+            TimeoutError: Outside a run, if another process holds the
+                storage lock for longer than lock_timeout
         """
-        if self.storage_model == "txt":
-            self._write_txt(filename, content)
-        elif self.storage_model == "git":
-            self._write_git(filename, content, device_ip)
-        elif self.storage_model == "pygit":
-            self._write_pygit(filename, content, device_ip)
+        with self._write_lock:
+            if self._spool_path is not None:
+                status = self._spool_write(filename, content, device_ip, stamp)
+            elif self._run_active or self.dry_run:
+                status = self._write_one(filename, content, device_ip, stamp)
+            else:
+                with self._repository_locked():
+                    status = self._write_one(filename, content, device_ip, stamp)
+
+            self._write_statuses[device_ip or filename] = status
+            return status
+
+    def _write_one(
+        self,
+        filename: str,
+        content: str,
+        device_ip: Optional[str],
+        stamp: Optional[str] = None,
+        when: Optional[datetime] = None,
+    ) -> str:
+        """
+        Store one backup; the caller holds the write lock (and the storage lock).
+
+        when is the time of txt snapshots (default now), e.g. the time of a
+        spooled run.
+        """
+        digest = HashIndex.digest(content)
+        if (
+            self.skip_unchanged
+            and self._hash_index.matches(filename, digest)
+            and self._has_stored_copy(filename, digest, device_ip)
+        ):
+            prefix = "[DRY-RUN] " if self.dry_run else ""
+            logger.info(f"{prefix}No changes for {filename}, skipping write")
+            print(f"{prefix}No changes for {filename}")
+            status = "unchanged"
+            if stamp is not None and not self.dry_run:
+                # The stored version already is this content
+                self._stamp_index.update(filename, stamp)
+                if not self._run_active:
+                    self._stamp_index.save()
+        else:
+            if self.storage_model == "txt":
+                self._write_txt(filename, content, device_ip, when)
+            elif self.storage_model == "git":
+                self._write_git(filename, content, device_ip)
+            elif self.storage_model == "pygit":
+                self._write_pygit(filename, content, device_ip)
+            else:
+                raise ValueError(f"Unknown storage model: {self.storage_model}")
+            status = "written"
+
+            if not self.dry_run:
+                if self._run_active and self.storage_model != "txt":
+                    # Not stored until commit_run() succeeds
+                    self._pending_hashes[f"{filename}.txt"] = (filename, digest, stamp)
+                else:
+                    self._hash_index.update(filename, digest)
+                    if stamp is not None:
+                        self._stamp_index.update(filename, stamp)
+                    if not self._run_active:
+                        self._hash_index.save()
+                        self._stamp_index.save()
+                if not self._run_active:
+                    self._locations.save()
+        return status
+
+    def _stored_digest(self, filename: str, device_ip: Optional[str] = None) -> Optional[str]:
+        """
+        Return the SHA-256 of the copy of a backup storage currently holds.
+
+        That is the newest txt snapshot, or the file at the backup's layout
+        path in the working tree (HEAD of a bare repository).
+
+        Returns:
+            The digest, or None if there is no stored copy
+        """
+        try:
+            if self.storage_model == "txt":
+                newest = self._txt_history().newest(filename)
+                if newest is None:
+                    return None
+                content = read_snapshot(self.storage_path / newest[1], self._txt_codec)
+            else:
+                filepath = self._backup_path(filename, device_ip)
+                if self.storage_model == "pygit" and self._git_backend().bare:
+                    content = self._git_backend().read_version(filepath, "HEAD")
+                    if content is None:
+                        return None
+                else:
+                    content = (self.storage_path / filepath).read_text()
+        except (OSError, UnicodeDecodeError):
+            return None
+        return HashIndex.digest(content)
+
+    def _has_stored_copy(
+        self, filename: str, digest: Optional[str], device_ip: Optional[str] = None
+    ) -> bool:
+        """
+        Check that the stored copy of a backup still has the given content hash.
+
+        The hash index only remembers what was last written; the copy may have
+        been pruned or deleted since, the working tree reset, or the layout
+        changed so that the backup now belongs at another path.
+        """
+        return digest is not None and self._stored_digest(filename, device_ip) == digest
+
+    @contextmanager
+    def _repository_locked(self):
+        """
+        Hold the storage lock for a single operation outside a run.
+
+        Raises:
+            TimeoutError: If another process holds it for longer than lock_timeout
+        """
+        if self.dry_run or self._lock.held:
+            yield
+            return
+        if not self._lock.acquire(self.lock_timeout):
+            raise TimeoutError(
+                f"Storage {self.storage_path} is locked by process {self._lock.holder()}"
+            )
+        try:
+            self._reload_state()
+            yield
+        finally:
+            self._lock.release()
+
+    def _reload_state(self):
+        """Re-read the state another process may have changed since we last held the lock."""
+        self._hash_index = HashIndex(self.state_dir / "hashes.json")
+        self._stamp_index = ChangeStampIndex(self.state_dir / "stamps.json")
+        self._snmp_stamps = SnmpStampIndex(self.state_dir / "snmp-stamps.json")
+        self._locations = LocationMap(self.state_dir / "locations.json")
+        self._txt_index.refresh()
+
+    def _spool_write(
+        self,
+        filename: str,
+        content: str,
+        device_ip: Optional[str],
+        stamp: Optional[str] = None,
+    ) -> str:
+        """Append a write to this run's spool file, for the process holding the lock."""
+        tmp_path = self._spool_path.with_name(self._spool_path.name + ".tmp")
+        lines = []
+        if not tmp_path.exists():
+            tmp_path.parent.mkdir(parents=True, exist_ok=True)
+            header = {"hostname": self.hostname, "timestamp": self.timestamp, "pid": os.getpid()}
+            lines.append(header)
+        lines.append(
+            {
+                "filename": filename,
+                "content": content,
+                "device_ip": device_ip,
+                "stamp": stamp,
+                "info": self._device_info.get(device_ip) if device_ip else None,
+            }
+        )
+        with open(tmp_path, "a") as f:
+            f.write("".join(json.dumps(line) + "\n" for line in lines))
+        logger.info(f"Spooled {len(content)} bytes of {filename} for the active writer")
+        print(f"Spooled {len(content)} bytes of {filename}")
+        return "spooled"
+
+    def _finish_spool(self):
+        """Publish this run's spool file, and store it right away if the lock came free."""
+        spool_path, self._spool_path = self._spool_path, None
+        tmp_path = spool_path.with_name(spool_path.name + ".tmp")
+        if not tmp_path.exists():
+            return
+        os.replace(tmp_path, spool_path)
+        if self._lock.acquire(0):
+            try:
+                self._reload_state()
+                self._drain_spool()
+            finally:
+                self._lock.release()
         else:
-            raise ValueError(f"Unknown storage model: {self.storage_model}")
+            logger.info(f"Left {spool_path.name} for process {self._lock.holder()} to store")
+
+    def _drain_spool(self):
+        """Store the runs spooled by other processes, one commit each; needs the lock."""
+        spool_dir = self.state_dir / SPOOL_DIR
+        if not spool_dir.is_dir():
+            return
 
-    def _write_txt(self, filename: str, content: str):
-        """Write backup as plain text file."""
-        dt_string = datetime.now().strftime("%m-%d-%Y_%H-%M")
-        filepath = self.storage_path / f"{filename}_{dt_string}.txt"
+        own = (self.hostname, self.timestamp, self._write_statuses)
+        try:
+            for path in sorted(spool_dir.glob("*.jsonl")):
+                try:
+                    with open(path, "r") as f:
+                        header = json.loads(f.readline())
+                        entries = [json.loads(line) for line in f if line.strip()]
+                    logger.info(
+                        f"Storing {len(entries)} backups spooled by process {header['pid']}"
+                    )
+                    # txt snapshots keep the time of the run that spooled them
+                    when = _parse_run_timestamp(header["timestamp"])
+                    self.hostname, self.timestamp = header["hostname"], header["timestamp"]
+                    self._write_statuses = {}
+                    self._run_active = True
+                    self._staged = {}
+                    self._pending_hashes = {}
+                    for entry in entries:
+                        if entry.get("info"):
+                            self._device_info[entry["device_ip"]] = entry["info"]
+                        self._write_one(
+                            entry["filename"],
+                            entry["content"],
+                            entry["device_ip"],
+                            entry.get("stamp"),
+                            when,
+                        )
+                    self._commit_staged()
+                    path.unlink()
+                except Exception as e:
+                    # The spool file stays for the next lock holder
+                    logger.error(f"Failed to store spooled backups from {path.name}: {e}")
+        finally:
+            self.hostname, self.timestamp, self._write_statuses = own
+            self._run_active = False
+
+    def get_change_stamp(self, filename: str) -> Optional[str]:
+        """
+        Return the change stamp stored with the last backup of filename, if probing.
+
+        None when the stored copy of that backup is gone, so it is collected again.
+        """
+        if not self.change_probes:
+            return None
+        with self._write_lock:
+            stamp = self._stamp_index.get(filename)
+            if stamp is None or not self._has_stored_copy(
+                filename, self._hash_index.get(filename)
+            ):
+                return None
+            return stamp
+
+    def change_stamps(self) -> Optional[Dict[str, str]]:
+        """Return a copy of the change stamps of every stored backup, or None if not probing."""
+        if not self.change_probes:
+            return None
+        with self._write_lock:
+            return {
+                filename: stamp
+                for filename, stamp in self._stamp_index.copy().items()
+                if self._has_stored_copy(filename, self._hash_index.get(filename))
+            }
+
+    def snmp_stamps(self) -> Dict[str, Dict[str, str]]:
+        """
+        Return the SNMP config-change values of the last successful backups.
+
+        Returns:
+            Device IP -> {'file': backup name, 'stamp': value}, for backups
+            whose stored copy is still there
+        """
+        with self._write_lock:
+            return {
+                ip: entry
+                for ip, entry in self._snmp_stamps.copy().items()
+                if self._has_stored_copy(entry["file"], self._hash_index.get(entry["file"]))
+            }
+
+    def record_snmp_stamps(self, stamps: Dict[str, Tuple[str, str]]):
+        """
+        Store the SNMP config-change values of devices that were backed up.
+
+        Args:
+            stamps: Device IP -> (backup name, value read before the backup)
+        """
+        if self.dry_run or not stamps:
+            return
+        with self._write_lock:
+            for ip, (filename, stamp) in stamps.items():
+                self._snmp_stamps.update(ip, filename, stamp)
+            self._snmp_stamps.save()
+
+    def record_unchanged(self, filename: str, device_ip: Optional[str] = None) -> str:
+        """
+        Record a backup skipped because its change probe matched the stored stamp.
+
+        Returns:
+            'unchanged'
+        """
+        with self._write_lock:
+            prefix = "[DRY-RUN] " if self.dry_run else ""
+            logger.info(f"{prefix}Change stamp of {filename} unchanged, skipped the fetch")
+            print(f"{prefix}No changes for {filename} (change probe)")
+            self._write_statuses[device_ip or filename] = "unchanged"
+            return "unchanged"
+
+    def take_write_statuses(self) -> Dict[str, str]:
+        """Return and clear the write outcomes recorded so far, by device IP or filename."""
+        with self._write_lock:
+            statuses, self._write_statuses = self._write_statuses, {}
+        return statuses
+
+    def _write_txt(
+        self,
+        filename: str,
+        content: str,
+        device_ip: Optional[str] = None,
+        when: Optional[datetime] = None,
+    ):
+        """Write backup as plain text file, stamped with when (default now)."""
+        now = when or datetime.now()
+        dt_string = now.strftime(TXT_TIMESTAMP_FORMAT)
+        directory = self.storage_path / self._layout_dir(filename, device_ip or "", now)
+        filepath = directory / f"{filename}_{dt_string}{self._txt_codec.suffix}"
 
         if self.dry_run:
             self._dry_run_stats.add_operation("WRITE", str(filepath), len(content))
             logger.info(f"[DRY-RUN] Would write {len(content)} bytes to {filepath}")
             print(f"[DRY-RUN] Would write {len(content)} bytes to {filepath}")
+            return
+
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.txt_dedup:
+            store = ObjectStore(self.state_dir / OBJECTS_DIR, self._txt_codec)
+            object_path = store.put(content, HashIndex.digest(content))
+            filepath = store.link(object_path, filepath)
+            logger.info(f"Linked {len(content)} bytes to {filepath} ({object_path.name[:12]})")
+            print(f"Outputted {len(content)} bytes to {filepath}")
         else:
-            with open(filepath, "w") as f:
-                f.write(content)
-            logger.info(f"Written {len(content)} bytes to {filepath}")
+            data = self._txt_codec.encode(content)
+            with open(filepath, "wb") as f:
+                f.write(data)
+            logger.info(f"Written {len(content)} bytes ({len(data)} stored) to {filepath}")
             print(f"Outputted {len(content)} bytes to {filepath}")
 
+        # Until the index is first built the next read walks the directory anyway
+        if self._txt_index.exists():
+            self._txt_index.append(
+                filename,
+                datetime.strptime(dt_string, TXT_TIMESTAMP_FORMAT),
+                filepath.relative_to(self.storage_path).as_posix(),
+            )
+
+    def _txt_history(self, rebuild: bool = False) -> TxtSnapshotIndex:
+        """Return the txt snapshot index, building it from the files if needed."""
+        if rebuild or not self._txt_index.exists():
+            snapshots = walk_txt_snapshots(self.storage_path)
+            self._txt_index.rebuild(
+                (name, taken, path.relative_to(self.storage_path).as_posix())
+                for name, taken, path in snapshots
+            )
+            logger.debug(f"Rebuilt txt snapshot index {self._txt_index.path}")
+        else:
+            self._txt_index.refresh()
+        return self._txt_index
+
+    def rebuild_txt_index(self) -> int:
+        """
+        Rebuild the txt snapshot index from the snapshot files.
+
+        Needed after snapshots were added or deleted by other tools.
+
+        Returns:
+            Number of indexed snapshots
+        """
+        index = self._txt_history(rebuild=True)
+        return sum(len(index.snapshots(name)) for name in index.names())
+
+    def _txt_snapshots(self, filename: str) -> list:
+        """Return the txt snapshots of a backup as (timestamp, path), newest first."""
+        return [
+            (taken, self.storage_path / path)
+            for taken, path in self._txt_history().snapshots(filename)
+        ]
+
+    def _read_txt_version(self, filename: str, stamp: str) -> Optional[str]:
+        """Read the txt snapshot of filename taken at stamp (MM-DD-YYYY_HH-MM)."""
+        try:
+            taken = datetime.strptime(stamp, TXT_TIMESTAMP_FORMAT)
+        except ValueError:
+            return None
+        path = self._txt_history().find(filename, taken)
+        if path is None:
+            return None
+        try:
+            return read_snapshot(self.storage_path / path, self._txt_codec)
+        except FileNotFoundError:
+            # Removed behind the index's back: rebuild it and look again
+            path = self._txt_history(rebuild=True).find(filename, taken)
+            return read_snapshot(self.storage_path / path, self._txt_codec) if path else None
+
+    def train_txt_dictionary(self, per_device: int = 3, size: int = DEFAULT_DICT_SIZE) -> int:
+        """
+        Train a zstd dictionary on the newest txt snapshots of every backup.
+
+        New zstd snapshots are compressed with it; older ones keep reading
+        with the dictionary they were written with.
+
+        Args:
+            per_device: Newest snapshots of each backup used as samples
+            size: Dictionary size in bytes
+
+        Returns:
+            Id of the new dictionary
+
+        Raises:
+            ValueError: If there are no txt snapshots to train on
+        """
+        index = self._txt_history()
+        if not index.names():
+            raise ValueError(f"No txt snapshots in {self.storage_path}")
+
+        samples = []
+        for name in index.names():
+            samples.extend(
+                read_snapshot(self.storage_path / path, self._txt_codec)
+                for _, path in index.snapshots(name)[:per_device]
+            )
+
+        dict_id = train_dictionary(samples, self.state_dir / DICT_DIR_NAME, size)
+        with self._write_lock:
+            self._txt_codec = SnapshotCodec(self.txt_compression, self.state_dir / DICT_DIR_NAME)
+        logger.info(f"Trained zstd dictionary {dict_id} on {len(samples)} snapshots")
+        return dict_id
+
+    def _iter_txt_diff(
+        self, filename: str, stamp1: str, stamp2: Optional[str] = None
+    ) -> Iterator[str]:
+        """Yield a unified diff between two txt snapshots (stamp2 None: the newest)."""
+        if stamp2 is None:
+            newest = self._txt_history().newest(filename)
+            stamp2 = newest[0].strftime(TXT_TIMESTAMP_FORMAT) if newest else ""
+        old = self._read_txt_version(filename, stamp1)
+        new = self._read_txt_version(filename, stamp2)
+        if old is None or new is None:
+            yield f"Version {stamp1 if old is None else stamp2} not found"
+            return
+        lines = difflib.unified_diff(
+            old.splitlines(),
+            new.splitlines(),
+            fromfile=f"a/{filename}_{stamp1}",
+            tofile=f"b/{filename}_{stamp2}",
+            lineterm="",
+        )
+        empty = True
+        for line in lines:
+            empty = False
+            yield line
+        if empty:
+            yield "No differences found."
+
+    def _git_backend(self):
+        """Return the active git backend (StorageGit or StoragePyGit)."""
+        backend = self._git_storage if self.storage_model == "git" else self._pygit_storage
+        if backend is None:
+            logger.error(f"{self.storage_model} storage not initialized")
+            raise RuntimeError(f"{self.storage_model} storage not initialized")
+        return backend
+
     def _write_git(self, filename: str, content: str, device_ip: Optional[str] = None):
         """Write backup to git repository."""
-        filepath = f"{filename}.txt"
+        self._write_versioned(filename, content, device_ip, "GIT-COMMIT", "git")
+
+    def _write_pygit(self, filename: str, content: str, device_ip: Optional[str] = None):
+        """Write backup to pygit2 repository."""
+        self._write_versioned(filename, content, device_ip, "PYGIT-COMMIT", "pygit2")
+
+    def _write_versioned(
+        self, filename: str, content: str, device_ip: Optional[str], operation: str, label: str
+    ):
+        """Commit a backup, or stage it when a run is in progress."""
+        filepath = self._backup_path(filename, device_ip or "")
         full_path = self.storage_path / filepath
 
         # Create commit message
@@ -160,37 +1024,298 @@ class BackupStorage:
         commit_msg = f"Backup {self.hostname}{ip_str} at {self.timestamp}"
 
         if self.dry_run:
-            self._dry_run_stats.add_operation("GIT-COMMIT", str(full_path), len(content))
-            logger.info(f"[DRY-RUN] Would commit {len(content)} bytes to git: {filepath}")
-            print(f"[DRY-RUN] Would commit {len(content)} bytes to git: {filepath}")
+            self._dry_run_stats.add_operation(operation, str(full_path), len(content))
+            logger.info(f"[DRY-RUN] Would commit {len(content)} bytes to {label}: {filepath}")
+            print(f"[DRY-RUN] Would commit {len(content)} bytes to {label}: {filepath}")
+        elif self._run_active and self.commit_mode == "run":
+            # Batched run: write the file now, commit once in commit_run()
+            self._git_backend().stage_file(filepath, content)
+            self._staged[filepath] = f"{filename}{ip_str}"
+            logger.info(f"Staged backup for {label}: {filepath}")
+            print(f"Staged {len(content)} bytes for {label}: {filepath}")
         else:
             # Write file and commit
-            if self._git_storage:
-                self._git_storage.write_file(filepath, content, commit_msg)
-                logger.info(f"Committed backup to git: {filepath}")
-                print(f"Committed {len(content)} bytes to git: {filepath}")
-            else:
-                logger.error("Git storage not initialized")
-                raise RuntimeError("Git storage not initialized")
+            self._git_backend().write_file(filepath, content, commit_msg)
+            logger.info(f"Committed backup to {label}: {filepath}")
+            print(f"Committed {len(content)} bytes to {label}: {filepath}")
 
-    def _write_pygit(self, filename: str, content: str, device_ip: Optional[str] = None):
-        """Write backup to pygit2 repository."""
-        filepath = f"{filename}.txt"
-        full_path = self.storage_path / filepath
+    def begin_run(self):
+        """
+        Start a run-level transaction.
 
-        # Create commit message
-        ip_str = f" ({device_ip})" if device_ip else ""
-        commit_msg = f"Backup {self.hostname}{ip_str} at {self.timestamp}"
+        With commit_mode 'run' and a git backend, every write until
+        commit_run() is staged and committed together in a single commit.
+        The hash index is persisted once, at commit_run().
 
+        The run holds the storage lock until commit_run(). If another process
+        holds it for longer than lock_timeout, the run's writes are spooled
+        and stored by that process when its own run ends.
+        """
         if self.dry_run:
-            self._dry_run_stats.add_operation("PYGIT-COMMIT", str(full_path), len(content))
-            logger.info(f"[DRY-RUN] Would commit {len(content)} bytes to pygit2: {filepath}")
-            print(f"[DRY-RUN] Would commit {len(content)} bytes to pygit2: {filepath}")
-        else:
-            # Write file and commit
-            self._pygit_storage.write_file(filepath, content, commit_msg)
-            logger.info(f"Committed backup to pygit2: {filepath}")
-            print(f"Committed {len(content)} bytes to pygit2: {filepath}")
+            return
+        with self._write_lock:
+            if self._lock.acquire(self.lock_timeout):
+                self._reload_state()
+                # Runs spooled for a process that exited before storing them
+                self._drain_spool()
+            else:
+                name = f"{time.time_ns()}-{os.getpid()}.jsonl"
+                self._spool_path = self.state_dir / SPOOL_DIR / name
+                logger.warning(
+                    f"Storage locked by process {self._lock.holder()}, "
+                    f"spooling this run's backups for it"
+                )
+            self._run_active = True
+            self._staged = {}
+            self._pending_hashes = {}
+
+    def adopt_backup(self, filename: str, device_ip: Optional[str] = None) -> bool:
+        """
+        Take a backup written by an interrupted run into the current run.
+
+        Writes of the txt model and of commit_mode 'device' are stored as
+        they happen. With commit_mode 'run', the interrupted run's file is
+        still in the working tree and is committed by this run; backends
+        that stage in memory (fast-import, bare pygit) lost it.
+
+        Args:
+            filename: Backup filename the interrupted run wrote
+            device_ip: Device IP of the backup
+
+        Returns:
+            True if the backup is stored or will be committed by this run,
+            False if it has to be collected again
+        """
+        if self.storage_model == "txt" or self.commit_mode != "run":
+            return True
+        if self.git_fast_import and self.storage_model == "git":
+            return False
+        if self.pygit_bare and self.storage_model == "pygit":
+            return False
+
+        with self._write_lock:
+            if not self._run_active or self._spool_path is not None:
+                return False
+            filepath = self._backup_path(filename, device_ip or "")
+            try:
+                content = (self.storage_path / filepath).read_text()
+            except OSError:
+                return False
+            ip_str = f" ({device_ip})" if device_ip else ""
+            self._staged[filepath] = f"{filename}{ip_str}"
+            self._pending_hashes[filepath] = (filename, HashIndex.digest(content), None)
+            self._write_statuses[device_ip or filename] = "written"
+        return True
+
+    @property
+    def run_active(self) -> bool:
+        """Whether a run started by begin_run() is in progress."""
+        return self._run_active
+
+    def commit_run(self) -> list:
+        """
+        Commit everything staged since begin_run() as one commit.
+
+        The commit message lists the devices whose configuration changed.
+
+        Returns:
+            List of changed file paths (empty if nothing changed or spooled)
+        """
+        with self._write_lock:
+            if not self._run_active:
+                return []
+            self._run_active = False
+            if self._spool_path is not None:
+                self._finish_spool()
+                return []
+            try:
+                changed = self._commit_staged()
+                self._drain_spool()
+            finally:
+                self._lock.release()
+            return changed
+
+    def _commit_staged(self) -> list:
+        """Commit the files staged by a run; the caller holds both locks."""
+        self._run_active = False
+        staged, self._staged = self._staged, {}
+        pending, self._pending_hashes = self._pending_hashes, {}
+
+        # Every device the run wrote or skipped as unchanged, not only the staged ones
+        total = max(len(staged), len(self._write_statuses))
+
+        changed = []
+        committed = True
+        if staged:
+            backend = self._git_backend()
+            changed = backend.add_files(sorted(staged))
+            if not changed:
+                logger.info(f"No configuration changes in {total} backups")
+                print(f"No changes to commit for {total} backups")
+            else:
+                lines = [
+                    f"Backup {self.hostname} at {self.timestamp}: "
+                    f"{len(changed)} of {total} devices changed",
+                    "",
+                ]
+                lines.extend(f"- {staged.get(path, path)}" for path in changed)
+                committed = backend.commit("\n".join(lines) + "\n")
+
+                if committed:
+                    logger.info(f"Committed {len(changed)} changed backups in one commit")
+                    print(f"Committed {len(changed)} changed backups of {total}")
+
+        # Per-device commits (commit_mode 'device') have already landed
+        if committed:
+            for filename, digest, stamp in pending.values():
+                self._hash_index.update(filename, digest)
+                if stamp is not None:
+                    self._stamp_index.update(filename, stamp)
+        self._hash_index.save()
+        self._stamp_index.save()
+        self._locations.save()
+        return changed
+
+    def import_history(self, commits: Iterable[dict]) -> int:
+        """
+        Append historical backups to the git model in one fast-import stream.
+
+        A bare pygit repository, which has no working tree to check the
+        history out into, builds the commits in memory instead.
+
+        Args:
+            commits: Commits, oldest first. Each is a dict with 'files'
+                (backup filename without extension -> content), 'message'
+                and 'time' (Unix timestamp)
+
+        Returns:
+            Number of commits imported
+
+        Raises:
+            ValueError: If the storage model is not git or bare pygit
+            TimeoutError: If another process holds the storage lock
+        """
+        bare_pygit = self.storage_model == "pygit" and self._pygit_storage.bare
+        if self.storage_model != "git" and not bare_pygit:
+            raise ValueError("History import requires the git model or a bare pygit repository")
+
+        latest = {}
+
+        def as_commits():
+            for commit in commits:
+                for filename, content in commit["files"].items():
+                    latest[filename] = content
+                yield dict(
+                    commit,
+                    files={
+                        self._backup_path(name): content
+                        for name, content in commit["files"].items()
+                    },
+                )
+
+        with self._write_lock, self._repository_locked():
+            count = self._git_backend().import_commits(as_commits())
+            if count:
+                # The newest imported version is now the last stored one
+                for filename, content in latest.items():
+                    self._hash_index.update(filename, HashIndex.digest(content))
+                self._hash_index.save()
+        return count
+
+    def prune(self, now: Optional[datetime] = None) -> dict:
+        """
+        Apply the retention policy.
+
+        txt snapshots are deleted per backup (plus objects of the
+        deduplicated store nothing links to any more); the git models
+        compact the branch history to the kept commits. In dry-run mode
+        nothing is deleted.
+
+        Args:
+            now: Reference time for the policy (defaults to now)
+
+        Returns:
+            dict with 'kept' and 'removed' counts (snapshots or commits)
+
+        Raises:
+            TimeoutError: If another process holds the storage lock
+        """
+        if self.retention is None:
+            logger.info("No retention policy configured, nothing to prune")
+            return {"kept": 0, "removed": 0}
+
+        with self._write_lock, self._repository_locked():
+            if self.storage_model == "txt":
+                results = self._prune_txt(now)
+            else:
+                policy = self.retention
+                kept, removed = self._git_backend().compact_history(
+                    lambda times: policy.select(
+                        [datetime.fromtimestamp(t) for t in times], now
+                    ),
+                    dry_run=self.dry_run,
+                )
+                results = {"kept": kept, "removed": removed}
+
+        prefix = "[DRY-RUN] Would prune" if self.dry_run else "Pruned"
+        logger.info(f"{prefix} {results['removed']} backups, keeping {results['kept']}")
+        return results
+
+    def _prune_txt(self, now: Optional[datetime]) -> dict:
+        """Delete txt snapshots the retention policy does not keep."""
+        by_name: Dict[str, list] = {}
+        for name, taken, path in walk_txt_snapshots(self.storage_path):
+            by_name.setdefault(name, []).append((taken, path))
+
+        results = {"kept": 0, "removed": 0, "objects_removed": 0}
+        kept = []
+        for name, snapshots in by_name.items():
+            keep = self.retention.select([taken for taken, _ in snapshots], now)
+            results["kept"] += len(keep)
+            for i, (taken, path) in enumerate(snapshots):
+                if i in keep:
+                    kept.append((name, taken, path.relative_to(self.storage_path).as_posix()))
+                else:
+                    results["removed"] += 1
+                    if not self.dry_run:
+                        os.unlink(path)
+                        self._remove_empty_dirs(os.path.dirname(path))
+
+        if not self.dry_run and results["removed"]:
+            self._txt_index.rebuild(kept)
+            results["objects_removed"] = self._gc_txt_objects()
+        return results
+
+    def _remove_empty_dirs(self, directory: str):
+        """Remove directory and its parents up to storage_path while they are empty."""
+        root = os.path.abspath(self.storage_path)
+        directory = os.path.abspath(directory)
+        while directory != root and directory.startswith(root + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+    def _gc_txt_objects(self) -> int:
+        """Delete deduplicated txt objects no snapshot links or points to."""
+        objects_dir = self.state_dir / OBJECTS_DIR
+        if not objects_dir.is_dir():
+            return 0
+
+        # Objects still referenced by pointer records
+        referenced = set()
+        for _, _, path in walk_txt_snapshots(self.storage_path):
+            if path.name.endswith(POINTER_SUFFIX):
+                referenced.add((path.parent / path.read_text().strip()).resolve())
+
+        removed = 0
+        for path in objects_dir.glob("*/*"):
+            # A link count of 1 means no snapshot hardlinks to the object
+            if path.stat().st_nlink == 1 and path.resolve() not in referenced:
+                path.unlink()
+                removed += 1
+        return removed
 
     def get_dry_run_summary(self) -> Optional[str]:
         """Get dry-run summary if in dry-run mode."""
@@ -199,40 +1324,299 @@ class BackupStorage:
         return None
 
     def get_versions(self, filename: str) -> list:
-        """Get version history for a file (git/pygit only)."""
+        """
+        Get version history for a file.
+
+        For the txt model every snapshot is a version; its 'hash' is the
+        snapshot timestamp (MM-DD-YYYY_HH-MM).
+        """
         if self.dry_run:
             logger.info(f"[DRY-RUN] Would list versions for {filename}")
             return []
         if self.storage_model == "git":
-            return self._git_storage.list_versions(f"{filename}.txt")
+            return self._git_storage.list_versions(self._backup_path(filename))
         elif self.storage_model == "pygit":
-            return self._pygit_storage.list_versions(f"{filename}.txt")
+            return self._pygit_storage.list_versions(self._backup_path(filename))
         else:
-            return []
+            return [
+                {
+                    "hash": taken.strftime(TXT_TIMESTAMP_FORMAT),
+                    "date": taken.strftime("%Y-%m-%d %H:%M"),
+                    "message": path.name,
+                }
+                for taken, path in self._txt_snapshots(filename)
+            ]
 
     def get_version_content(self, filename: str, commit_hash: str) -> Optional[str]:
-        """Get content of a specific version (git/pygit only)."""
+        """Get content of a specific version (a timestamp for the txt model)."""
         if self.dry_run:
             logger.info(f"[DRY-RUN] Would read version {commit_hash} of {filename}")
             return None
         if self.storage_model == "git":
-            return self._git_storage.read_version(f"{filename}.txt", commit_hash)
+            return self._git_storage.read_version(self._backup_path(filename), commit_hash)
         elif self.storage_model == "pygit":
-            return self._pygit_storage.read_version(f"{filename}.txt", commit_hash)
+            return self._pygit_storage.read_version(self._backup_path(filename), commit_hash)
         else:
-            return None
+            return self._read_txt_version(filename, commit_hash)
+
+    def get_version_contents(self, versions: list) -> list:
+        """
+        Get the content of many versions at once.
+
+        Args:
+            versions: List of (filename, commit hash) pairs
+
+        Returns:
+            Contents in the same order, None for versions that cannot be read
+        """
+        if self.dry_run:
+            logger.info(f"[DRY-RUN] Would read {len(versions)} versions")
+            return [None] * len(versions)
+        if self.storage_model == "txt":
+            return [
+                self._read_txt_version(filename, stamp) for filename, stamp in versions
+            ]
+        return self._git_backend().read_versions(
+            [(self._backup_path(filename), commit_hash) for filename, commit_hash in versions]
+        )
 
     def diff_versions(self, filename: str, commit1: str, commit2: Optional[str] = None) -> str:
-        """Show diff between versions (git/pygit only)."""
+        """Show diff between versions (timestamps for the txt model)."""
         if self.dry_run:
             logger.info(f"[DRY-RUN] Would diff versions {commit1} and {commit2} of {filename}")
             return f"[DRY-RUN] Would show diff between {commit1} and {commit2 or 'current'}"
         if self.storage_model == "git":
-            return self._git_storage.diff_versions(f"{filename}.txt", commit1, commit2)
+            return self._git_storage.diff_versions(self._backup_path(filename), commit1, commit2)
         elif self.storage_model == "pygit":
-            return self._pygit_storage.diff_versions(f"{filename}.txt", commit1, commit2)
+            return self._pygit_storage.diff_versions(self._backup_path(filename), commit1, commit2)
         else:
-            return "Version control not available with txt storage model"
+            return "\n".join(self._iter_txt_diff(filename, commit1, commit2))
+
+    def iter_diff(
+        self, filename: str, commit1: str, commit2: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Yield diff lines between versions.
+
+        Line-by-line counterpart of diff_versions. With the git model the
+        lines come straight from git diff and the diff is never held in
+        memory whole; pygit and txt compare the two versions in memory.
+        Errors are reported as a single line, like diff_versions does.
+        """
+        if self.dry_run:
+            yield self.diff_versions(filename, commit1, commit2)
+            return
+        if self.storage_model == "txt":
+            yield from self._iter_txt_diff(filename, commit1, commit2)
+            return
+
+        backend = self._git_backend()
+        if not backend.is_initialized():
+            yield "Repository not initialized."
+            return
+
+        lines = backend.iter_diff(self._backup_path(filename), commit1, commit2)
+        empty = True
+        try:
+            for line in lines:
+                empty = False
+                yield line
+        except (KeyError, ValueError) as e:
+            yield f"Commit {e.args[0] if e.args else ''} not found"
+            return
+        except Exception as e:
+            yield f"Error: {e}"
+            return
+        if empty:
+            yield "No differences found."
+
+
+class CollectingStorage:
+    """
+    Stand-in storage that keeps writes in memory.
+
+    Installed as the global storage in worker processes, so collected configs
+    travel back to the parent process, which stores them through its own
+    BackupStorage and keeps a single writer per repository.
+    """
+
+    def __init__(self, stamps: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            stamps: The parent's change stamps (BackupStorage.change_stamps()),
+                None when change probes are off
+        """
+        self.writes = []
+        self.stamps = stamps
+        self._lock = threading.Lock()
+
+    @property
+    def change_probes(self) -> bool:
+        """Whether vendor modules should run their change probes."""
+        return self.stamps is not None
+
+    def get_change_stamp(self, filename: str) -> Optional[str]:
+        """Return the parent's change stamp of filename."""
+        return (self.stamps or {}).get(filename)
+
+    def write_backup(
+        self,
+        filename: str,
+        content: str,
+        device_ip: Optional[str] = None,
+        stamp: Optional[str] = None,
+    ) -> Optional[str]:
+        """Record a write to be replayed by the parent process."""
+        with self._lock:
+            self.writes.append((filename, content, device_ip, stamp))
+        return None
+
+    def record_unchanged(self, filename: str, device_ip: Optional[str] = None) -> Optional[str]:
+        """Record a probe-skipped backup; replayed as a write without content."""
+        with self._lock:
+            self.writes.append((filename, None, device_ip, None))
+        return None
+
+    def take_writes(self) -> list:
+        """Return and clear the recorded writes."""
+        with self._lock:
+            writes, self.writes = self.writes, []
+        return writes
+
+
+class QueuedWriter:
+    """
+    Single writer thread in front of a BackupStorage.
+
+    Installed as the global storage during a run: collector threads (or the
+    process shard loop) enqueue writes and return at once, and one thread
+    drains the queue into the storage, so the repository index and HEAD only
+    ever see one writer. The queue is bounded; collectors block while it is
+    full, which caps the configs held in memory when fetching outpaces the
+    disk. Writes drained together outside a run are committed as one run.
+    """
+
+    def __init__(
+        self,
+        storage: BackupStorage,
+        maxsize: int = DEFAULT_WRITE_QUEUE_SIZE,
+        on_stored: Optional[Callable[[str, Optional[str], str], None]] = None,
+    ):
+        """
+        Args:
+            storage: Storage the writes end up in
+            maxsize: Writes buffered before write_backup() blocks
+            on_stored: Called on the writer thread with (filename, device IP,
+                status) after each successful write
+        """
+        self.storage = storage
+        self.on_stored = on_stored
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+        self._errors: Dict[str, str] = {}
+        self._thread = threading.Thread(target=self._drain, name="storage-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def change_probes(self) -> bool:
+        """Whether vendor modules should run their change probes."""
+        return self.storage.change_probes
+
+    def get_change_stamp(self, filename: str) -> Optional[str]:
+        """Return the change stamp stored with the last backup of filename."""
+        return self.storage.get_change_stamp(filename)
+
+    def write_backup(
+        self,
+        filename: str,
+        content: str,
+        device_ip: Optional[str] = None,
+        stamp: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Enqueue a write, blocking while the queue is full.
+
+        The outcome is recorded by the storage (take_write_statuses()) or,
+        on failure, by take_errors().
+
+        Raises:
+            RuntimeError: If the writer has been closed
+        """
+        if not self._thread.is_alive():
+            raise RuntimeError("Storage writer is closed")
+        self._queue.put((filename, content, device_ip, stamp))
+        return None
+
+    def record_unchanged(self, filename: str, device_ip: Optional[str] = None) -> Optional[str]:
+        """Enqueue a backup skipped by its change probe, so it is journaled in order."""
+        return self.write_backup(filename, None, device_ip)
+
+    def _drain(self):
+        """Writer thread: store queued writes until close() enqueues None."""
+        while True:
+            batch = [self._queue.get()]
+            # Take whatever else is already waiting, to commit it together
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            writes = [item for item in batch if item is not None]
+            try:
+                if writes:
+                    self._store(writes)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _store(self, writes: list):
+        """Store one batch of writes, as one commit unless a run is in progress."""
+        batched = not self.storage.run_active and len(writes) > 1
+        if batched:
+            self.storage.begin_run()
+        try:
+            for filename, content, device_ip, stamp in writes:
+                try:
+                    if content is None:
+                        status = self.storage.record_unchanged(filename, device_ip)
+                    else:
+                        status = self.storage.write_backup(filename, content, device_ip, stamp)
+                except Exception as e:
+                    logger.error(f"Failed to store backup of {device_ip or filename}: {e}")
+                    self._errors[device_ip or filename] = str(e)
+                    continue
+                if self.on_stored is not None:
+                    try:
+                        self.on_stored(filename, device_ip, status)
+                    except Exception as e:
+                        # A dead writer thread would leave flush() waiting forever
+                        logger.error(f"Failed to record backup of {device_ip or filename}: {e}")
+                        self._errors[device_ip or filename] = str(e)
+        finally:
+            if batched:
+                try:
+                    self.storage.commit_run()
+                except Exception as e:
+                    logger.error(f"Failed to commit {len(writes)} backups: {e}")
+                    for filename, _, device_ip, _ in writes:
+                        self._errors[device_ip or filename] = str(e)
+
+    def flush(self):
+        """Wait until every write enqueued so far has been stored."""
+        self._queue.join()
+
+    def close(self):
+        """Store the remaining writes and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def take_errors(self) -> Dict[str, str]:
+        """Return and clear failed writes (device IP or filename -> error); call after flush()."""
+        errors, self._errors = self._errors, {}
+        return errors
 
 
 # Global storage instance for vendor backup modules
@@ -250,7 +1634,12 @@ def get_global_storage() -> Optional[BackupStorage]:
     return _global_storage
 
 
-def write_backup(filename: str, content: str, device_ip: Optional[str] = None):
+def write_backup(
+    filename: str,
+    content: str,
+    device_ip: Optional[str] = None,
+    stamp: Optional[str] = None,
+) -> Optional[str]:
     """
     Write backup using global storage instance.
     Falls back to legacy backup-config directory if no storage configured.
@@ -259,11 +1648,15 @@ def write_backup(filename: str, content: str, device_ip: Optional[str] = None):
         filename: Base filename (without extension)
         content: Configuration content to store
         device_ip: Device IP address (optional, for commit messages in git storage)
+        stamp: Change stamp the device reported (optional, see get_change_stamp())
+
+    Returns:
+        Write status from the storage instance ('written' or 'unchanged')
     """
     global _global_storage
 
     if _global_storage is not None:
-        _global_storage.write_backup(filename, content, device_ip)
+        return _global_storage.write_backup(filename, content, device_ip, stamp)
     else:
         # Fallback to legacy behavior
         backup_file = os.path.join("backup-config", f"{filename}.txt")
@@ -271,3 +1664,37 @@ def write_backup(filename: str, content: str, device_ip: Optional[str] = None):
         with open(backup_file, "w") as f:
             f.write(content)
         print(f"Outputted {len(content)} bytes to {backup_file}")
+        return "written"
+
+
+def change_probes_enabled() -> bool:
+    """Check whether vendor modules should run their change probes."""
+    return bool(getattr(_global_storage, "change_probes", False))
+
+
+def get_change_stamp(filename: str) -> Optional[str]:
+    """
+    Return the change stamp stored with the last backup of filename.
+
+    Returns:
+        The stamp, or None if change probes are off or none is stored
+    """
+    if not change_probes_enabled():
+        return None
+    return _global_storage.get_change_stamp(filename)
+
+
+def record_unchanged(filename: str, device_ip: Optional[str] = None) -> Optional[str]:
+    """
+    Record a backup whose fetch was skipped because its change stamp matched.
+
+    Args:
+        filename: Base filename (without extension)
+        device_ip: Device IP address
+
+    Returns:
+        'unchanged' (None when the storage records it later)
+    """
+    if _global_storage is None:
+        return None
+    return _global_storage.record_unchanged(filename, device_ip)
@@ -10,25 +10,156 @@ Provides functionality to:
 - Diff files across versions
 """
 
+import os
 import subprocess
+import tempfile
+import threading
+from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    from router_backup.history_index import HistoryIndex
+except ImportError:
+    # Run as a standalone script from the router_backup directory
+    from history_index import HistoryIndex
+
+# git log format for the history index: one record per commit
+HISTORY_FORMAT = "%x1e%H%x1f%P%x1f%ct%x1f%ci%x1f%s"
+
+# git log format for history compaction: everything needed to recreate a commit
+COMPACT_FORMAT = "%x1e%T%x1f%ct%x1f%an%x1f%ae%x1f%ad%x1f%cn%x1f%ce%x1f%cd%x1f%B"
+
+# Bytes of object names written to cat-file before reading the answers; kept
+# well below the pipe buffer so neither side can block on a full pipe
+CAT_FILE_CHUNK = 16 * 1024
+
+
+class GitCatFile:
+    """
+    A long-lived ``git cat-file --batch`` process for reading objects.
+
+    Every lookup is a pipe round trip instead of a fork and exec of git.
+    Objects and refs created after the process started are still found.
+    """
+
+    def __init__(self, repo_path: Path):
+        self.repo_path = repo_path
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+
+    def _start(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ["git", "-C", str(self.repo_path), "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._process
+
+    def _read_object(self, stdout) -> Tuple[Optional[str], Optional[bytes]]:
+        """Read one answer: (object id, content), or (None, None) if missing."""
+        header = stdout.readline()
+        if not header:
+            raise BrokenPipeError("git cat-file exited")
+        # "<name> missing" / "<name> ambiguous" carry no content
+        if header.rstrip().endswith((b" missing", b" ambiguous")):
+            return None, None
+        object_id, _, size = header.split()
+        size = int(size)
+        data = stdout.read(size + 1)[:size]
+        return object_id.decode(), data
+
+    def get(self, names: List[str]) -> List[Tuple[Optional[str], Optional[bytes]]]:
+        """
+        Look up objects by name (e.g. "HEAD", "<commit>:<path>").
+
+        Returns:
+            List of (object id, content) in the order of names, with
+            (None, None) for names that do not resolve
+        """
+        results = []
+        with self._lock:
+            for attempt in range(2):
+                process = self._start()
+                try:
+                    start = len(results)
+                    while start < len(names):
+                        end, size = start, 0
+                        while end < len(names) and (end == start or size < CAT_FILE_CHUNK):
+                            size += len(names[end]) + 1
+                            end += 1
+                        request = "".join(f"{name}\n" for name in names[start:end])
+                        process.stdin.write(request.encode())
+                        process.stdin.flush()
+                        for _ in range(start, end):
+                            results.append(self._read_object(process.stdout))
+                        start = end
+                    return results
+                except (BrokenPipeError, OSError):
+                    # The process died (e.g. repository moved); start a new one
+                    self._close()
+                    if attempt:
+                        raise
+                    # Unanswered names of the chunk in flight are asked again
+                    del results[start:]
+        return results
+
+    def _close(self):
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+
+    def close(self):
+        """Stop the cat-file process."""
+        with self._lock:
+            self._close()
+
+
+def _quote_path(path: str) -> str:
+    """Quote a path for a fast-import command if it needs it."""
+    if path.startswith('"') or "\n" in path:
+        escaped = path.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return f'"{escaped}"'
+    return path
 
 
 class StorageGit:
     """A storage system using git for version control."""
 
-    def __init__(self, repo_path: str = "."):
-        """Initialize StorageGit with a repository path."""
+    def __init__(self, repo_path: str = ".", fast_import: bool = False):
+        """
+        Initialize StorageGit with a repository path.
+
+        Args:
+            repo_path: Repository path
+            fast_import: Write commits through git fast-import instead of
+                the add/commit porcelain
+        """
         self.repo_path = Path(repo_path).resolve()
         self.git_dir = self.repo_path / ".git"
+        self.fast_import = fast_import
+        self._history_index: Optional[HistoryIndex] = None
+        self._cat_file = GitCatFile(self.repo_path)
+
+        # fast-import mode: staged content kept until add_files()/commit()
+        self._staged_content: Dict[str, str] = {}
+        self._pending_files: Dict[str, str] = {}
 
     def _run_git(
-        self, args: List[str], check: bool = True
+        self, args: List[str], check: bool = True, input: Optional[str] = None
     ) -> subprocess.CompletedProcess:
         """Run a git command in the repository."""
         cmd = ["git", "-C", str(self.repo_path)] + args
-        result = subprocess.run(cmd, capture_output=True, text=True, check=check)
+        result = subprocess.run(
+            cmd, capture_output=True, text=True, check=check, input=input
+        )
         return result
 
     def is_initialized(self) -> bool:
@@ -59,6 +190,13 @@ class StorageGit:
             print("Repository not initialized. Run init() first.")
             return False
 
+        if self.fast_import:
+            changed = self.write_files({filepath: content}, commit_msg or f"Add {filepath}")
+            if changed is None:
+                return False
+            print(f"Committed {filepath}" if changed else f"No changes to commit for {filepath}")
+            return True
+
         full_path = self.repo_path / filepath
         full_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -73,6 +211,7 @@ class StorageGit:
         result = self._run_git(["commit", "-m", msg], check=False)
 
         if result.returncode == 0:
+            self._record_commit()
             print(f"Committed {filepath}")
             return True
         else:
@@ -86,42 +225,404 @@ class StorageGit:
             print(f"Failed to commit: {result.stderr}")
             return False
 
+    def stage_file(self, filepath: str, content: str) -> bool:
+        """Write a file to the working tree without staging or committing it."""
+        if not self.is_initialized():
+            print("Repository not initialized. Run init() first.")
+            return False
+
+        if self.fast_import:
+            # The working tree is updated from the commit in commit()
+            self._staged_content[filepath] = content
+            return True
+
+        full_path = self.repo_path / filepath
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(full_path, "w") as f:
+            f.write(content)
+        return True
+
+    def add_files(self, filepaths: List[str]) -> List[str]:
+        """
+        Stage several files with a single git process.
+
+        Returns the staged paths that differ from HEAD.
+        """
+        if not self.is_initialized() or not filepaths:
+            return []
+
+        if self.fast_import:
+            files = {
+                path: self._staged_content.pop(path)
+                for path in filepaths
+                if path in self._staged_content
+            }
+            self._pending_files = self._changed_files(files)
+            return list(self._pending_files)
+
+        self._run_git(
+            [
+                "--literal-pathspecs",
+                "add",
+                "--pathspec-from-file=-",
+                "--pathspec-file-nul",
+            ],
+            input="\0".join(filepaths),
+        )
+        result = self._run_git(["diff", "--cached", "--name-only", "-z"], check=False)
+        return [path for path in result.stdout.split("\0") if path]
+
+    def commit(self, commit_msg: str) -> bool:
+        """Commit whatever is staged in the index."""
+        if not self.is_initialized():
+            print("Repository not initialized. Run init() first.")
+            return False
+
+        if self.fast_import:
+            files, self._pending_files = self._pending_files, {}
+            if not files:
+                print("No changes to commit")
+                return True
+            return self.import_commits([{"files": files, "message": commit_msg}]) == 1
+
+        result = self._run_git(["commit", "-q", "-F", "-"], check=False, input=commit_msg)
+        if result.returncode == 0:
+            self._record_commit()
+            return True
+        if "nothing to commit" in result.stdout or "nothing to commit" in result.stderr:
+            print("No changes to commit")
+            return True
+        print(f"Failed to commit: {result.stderr}")
+        return False
+
+    def _changed_files(self, files: Dict[str, str]) -> Dict[str, str]:
+        """Return the files whose content differs from HEAD."""
+        paths = sorted(files)
+        if self._head() is None:
+            return {path: files[path] for path in paths}
+        current = self._cat_file.get([f"HEAD:{path}" for path in paths])
+        return {
+            path: files[path]
+            for path, (_, data) in zip(paths, current)
+            if data is None or data != files[path].encode("utf-8")
+        }
+
+    def write_files(
+        self, files: Dict[str, str], commit_msg: str, time: Optional[int] = None
+    ) -> Optional[List[str]]:
+        """
+        Commit several files at once through git fast-import.
+
+        Nothing is committed if no file differs from HEAD.
+
+        Args:
+            files: Mapping of file path to content
+            commit_msg: Commit message
+            time: Commit timestamp (defaults to now)
+
+        Returns:
+            List of changed paths, or None if the commit failed
+        """
+        if not self.is_initialized():
+            print("Repository not initialized. Run init() first.")
+            return None
+
+        changed = self._changed_files(files)
+        if changed and not self.import_commits(
+            [{"files": changed, "message": commit_msg, "time": time}]
+        ):
+            return None
+        return list(changed)
+
+    def _ident(self) -> str:
+        """Return the committer identity as 'Name <email>'."""
+        result = self._run_git(["var", "GIT_COMMITTER_IDENT"], check=False)
+        ident = result.stdout.strip()
+        if result.returncode != 0 or ">" not in ident:
+            return "StorageGit <storage@git.local>"
+        return ident[: ident.rindex(">") + 1]
+
+    def _branch_ref(self) -> str:
+        """Return the ref HEAD points to (the branch may not exist yet)."""
+        result = self._run_git(["symbolic-ref", "-q", "HEAD"], check=False)
+        return result.stdout.strip() or "refs/heads/master"
+
+    def import_commits(self, commits: Iterable[dict], update_worktree: bool = True) -> int:
+        """
+        Stream commits on top of HEAD through a single git fast-import process.
+
+        Used for run commits in fast-import mode and for bulk backfills such
+        as years of old snapshots. Commits are consumed lazily, so a
+        generator keeps memory flat however long the history is.
+
+        Args:
+            commits: Commits, oldest first. Each is a dict with 'files'
+                (path -> str or bytes content), 'message' and optionally
+                'time' (Unix timestamp, defaults to now)
+            update_worktree: Check the imported files out into the working
+                tree and index
+
+        Returns:
+            Number of commits imported (0 if the import failed)
+        """
+        if not self.is_initialized():
+            print("Repository not initialized. Run init() first.")
+            return 0
+
+        old_head = self._head()
+        ident = self._ident()
+        ref = self._branch_ref()
+
+        process = subprocess.Popen(
+            ["git", "-C", str(self.repo_path), "fast-import", "--quiet", "--done"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        count = 0
+        try:
+            out = process.stdin
+            for commit in commits:
+                if not commit["files"]:
+                    continue
+                timestamp = int(commit.get("time") or datetime.now().timestamp())
+                tz = datetime.fromtimestamp(timestamp).astimezone().strftime("%z")
+                message = commit["message"].encode("utf-8")
+
+                out.write(f"commit {ref}\n".encode())
+                out.write(f"author {ident} {timestamp} {tz}\n".encode())
+                out.write(f"committer {ident} {timestamp} {tz}\n".encode())
+                out.write(f"data {len(message)}\n".encode() + message + b"\n")
+                if count == 0 and old_head:
+                    out.write(f"from {old_head}\n".encode())
+                for path, content in commit["files"].items():
+                    data = content.encode("utf-8") if isinstance(content, str) else content
+                    out.write(f"M 100644 inline {_quote_path(path)}\n".encode())
+                    out.write(f"data {len(data)}\n".encode() + data + b"\n")
+                out.write(b"\n")
+                count += 1
+            out.write(b"done\n")
+            out.close()
+        except BrokenPipeError:
+            pass
+        stderr = process.stderr.read().decode(errors="replace")
+        process.stderr.close()
+
+        if process.wait() != 0:
+            print(f"Failed to import: {stderr.strip()}")
+            return 0
+        if count == 0:
+            return 0
+
+        new_head = self._head()
+        if update_worktree:
+            # Two-way merge: only paths that changed are checked out
+            trees = [old_head, new_head] if old_head else [new_head]
+            result = self._run_git(["read-tree", "-m", "-u"] + trees, check=False)
+            if result.returncode != 0:
+                print(f"Imported, but could not update working tree: {result.stderr}")
+        else:
+            self._run_git(["reset", "-q"], check=False)
+
+        self._sync_history()
+        return count
+
     def update_file(
         self, filepath: str, content: str, commit_msg: Optional[str] = None
     ) -> bool:
         """Update a file and commit the changes."""
         return self.write_file(filepath, content, commit_msg or f"Update {filepath}")
 
-    def list_versions(self, filepath: str) -> List[dict]:
-        """List all versions of a file with their commit info."""
+    def _history(self) -> HistoryIndex:
+        """Return the per-file history index stored in the git directory."""
+        if self._history_index is None:
+            self._history_index = HistoryIndex(self.git_dir / "router-backup" / "history.jsonl")
+        return self._history_index
+
+    def _log_entries(self, revisions: List[str]) -> List[Dict]:
+        """Read commits (oldest first) with the blobs they changed, in one git process."""
+        result = self._run_git(
+            [
+                "log",
+                "--reverse",
+                "--first-parent",
+                "--no-renames",
+                "--raw",
+                "--no-abbrev",
+                f"--format={HISTORY_FORMAT}",
+            ]
+            + revisions
+            + ["--"],
+            check=False,
+        )
+        if result.returncode != 0:
+            return []
+
+        entries = []
+        for record in result.stdout.split("\x1e")[1:]:
+            header, _, raw = record.partition("\n")
+            commit_hash, parents, timestamp, date_str, message = header.split("\x1f", 4)
+            files = {}
+            for line in raw.splitlines():
+                # :<old mode> <new mode> <old blob> <new blob> <status>\t<path>
+                if line.startswith(":") and "\t" in line:
+                    meta, path = line.split("\t", 1)
+                    files[path] = meta.split()[3]
+            entries.append(
+                {
+                    "commit": commit_hash,
+                    "parent": parents.split()[0] if parents else "",
+                    "time": int(timestamp),
+                    "date": date_str.strip(),
+                    "message": message,
+                    "files": files,
+                }
+            )
+        return entries
+
+    def _head(self) -> Optional[str]:
+        """Return the full hash of HEAD, or None before the first commit."""
+        return self._cat_file.get(["HEAD"])[0][0]
+
+    def _record_commit(self):
+        """Append the commit just created on HEAD to the history index."""
+        entries = self._log_entries(["-1", "HEAD"])
+        index = self._history()
+        index.refresh()
+        if entries and entries[0]["parent"] == (index.head or ""):
+            index.append(entries)
+        else:
+            self._sync_history()
+
+    def _sync_history(self) -> HistoryIndex:
+        """Bring the history index up to HEAD, rebuilding it if history was rewritten."""
+        index = self._history()
+        index.refresh()
+        head = self._head()
+
+        if head is None:
+            if index.head is not None:
+                index.rebuild([])
+        elif index.head != head:
+            is_ancestor = index.head is not None and (
+                self._run_git(
+                    ["merge-base", "--is-ancestor", index.head, head], check=False
+                ).returncode
+                == 0
+            )
+            if is_ancestor:
+                # Catch up with commits made since the index was last written
+                index.append(self._log_entries([f"{index.head}..{head}"]))
+            else:
+                index.rebuild(self._log_entries([head]))
+        return index
+
+    def rebuild_history_index(self) -> int:
+        """
+        Rebuild the per-file history index from the full history.
+
+        Returns:
+            Number of commits indexed
+        """
         if not self.is_initialized():
             print("Repository not initialized.")
-            return []
+            return 0
+
+        head = self._head()
+        entries = self._log_entries([head]) if head else []
+        self._history().rebuild(entries)
+        return len(entries)
+
+    def compact_history(
+        self, select: Callable[[List[int]], Set[int]], dry_run: bool = False
+    ) -> Tuple[int, int]:
+        """
+        Rewrite the branch keeping only the commits chosen by select.
+
+        Each kept commit keeps its tree, message, author and dates, so it
+        still holds every file as of its time; the changes of dropped commits
+        are folded into the next kept one. HEAD's tree never changes. The
+        dropped commits are then expired from the reflog and garbage
+        collected.
+
+        Args:
+            select: Gets the commit times (oldest first) and returns the
+                indices of the commits to keep
+            dry_run: Only count what would be kept and removed
+
+        Returns:
+            (kept, removed) commit counts
+        """
+        if not self.is_initialized():
+            print("Repository not initialized.")
+            return 0, 0
+
+        head = self._head()
+        if head is None:
+            return 0, 0
 
         result = self._run_git(
-            ["log", "--follow", "--format=%H|%ci|%s", "--", filepath], check=False
+            ["log", "--first-parent", "--reverse", "--date=raw", f"--format={COMPACT_FORMAT}", head]
         )
+        commits = [record.split("\x1f", 8) for record in result.stdout.split("\x1e")[1:]]
+        keep = select([int(commit[1]) for commit in commits])
+        keep.add(len(commits) - 1)
+        removed = len(commits) - len(keep)
+        if dry_run or removed == 0:
+            return len(keep), removed
+
+        parent = None
+        for i, (tree, _, an, ae, ad, cn, ce, cd, message) in enumerate(commits):
+            if i not in keep:
+                continue
+            env = dict(
+                os.environ,
+                GIT_AUTHOR_NAME=an,
+                GIT_AUTHOR_EMAIL=ae,
+                GIT_AUTHOR_DATE=ad,
+                GIT_COMMITTER_NAME=cn,
+                GIT_COMMITTER_EMAIL=ce,
+                GIT_COMMITTER_DATE=cd,
+            )
+            parents = ["-p", parent] if parent else []
+            result = subprocess.run(
+                ["git", "-C", str(self.repo_path), "commit-tree", tree, "-F", "-"] + parents,
+                input=message.rstrip("\n") + "\n",
+                capture_output=True,
+                text=True,
+                env=env,
+                check=True,
+            )
+            parent = result.stdout.strip()
 
-        if result.returncode != 0:
-            print(f"Error: {result.stderr}")
+        self._run_git(["update-ref", "-m", "compact history", self._branch_ref(), parent, head])
+        self._run_git(["reflog", "expire", "--expire=now", "--all"], check=False)
+        self._run_git(["gc", "--prune=now", "--quiet"], check=False)
+        self._sync_history()
+        return len(keep), removed
+
+    def list_versions(self, filepath: str) -> List[dict]:
+        """
+        List all versions of a file with their commit info.
+
+        Served from the per-file history index, which is updated at commit
+        time and caught up from history when HEAD moved without it.
+        """
+        if not self.is_initialized():
+            print("Repository not initialized.")
             return []
 
-        versions = []
-        for line in result.stdout.strip().split("\n"):
-            if line and "|" in line:
-                parts = line.split("|", 2)
-                if len(parts) == 3:
-                    commit_hash, date_str, message = parts
-                    versions.append(
-                        {
-                            "hash": commit_hash[:8],
-                            "full_hash": commit_hash,
-                            "date": date_str.strip(),
-                            "message": message,
-                        }
-                    )
-
-        return versions
+        index = self._sync_history()
+        return [
+            {
+                "hash": version["commit"][:8],
+                "full_hash": version["commit"],
+                "date": version["date"],
+                "message": version["message"],
+            }
+            for version in index.versions(filepath)
+        ]
 
     def read_version(self, filepath: str, commit_hash: str) -> Optional[str]:
         """Read a specific version of a file."""
@@ -129,13 +630,59 @@ class StorageGit:
             print("Repository not initialized.")
             return None
 
-        result = self._run_git(["show", f"{commit_hash}:{filepath}"], check=False)
+        return self.read_versions([(filepath, commit_hash)])[0]
 
-        if result.returncode == 0:
-            return result.stdout
-        else:
-            print(f"Error reading version: {result.stderr}")
-            return None
+    def read_versions(self, versions: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        Read many file versions through the persistent cat-file process.
+
+        Args:
+            versions: List of (filepath, commit hash) pairs
+
+        Returns:
+            File contents in the same order, None for versions that do not exist
+        """
+        if not self.is_initialized():
+            print("Repository not initialized.")
+            return [None] * len(versions)
+
+        names = [f"{commit_hash}:{filepath}" for filepath, commit_hash in versions]
+        contents = []
+        for name, (_, data) in zip(names, self._cat_file.get(names)):
+            if data is None:
+                print(f"Error reading version: {name} not found")
+                contents.append(None)
+            else:
+                contents.append(data.decode("utf-8", errors="replace"))
+        return contents
+
+    def iter_diff(
+        self, filepath: str, commit1: str, commit2: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Yield a unified diff of one file between two versions, line by line.
+
+        Lines are read from git diff's stdout as it writes them, so large
+        diffs are never held in memory. If commit2 is None, commit1 is
+        compared with the working file.
+
+        Raises:
+            RuntimeError: If git diff fails
+        """
+        revisions = [commit1, commit2] if commit2 else [commit1]
+        cmd = ["git", "-C", str(self.repo_path), "diff"] + revisions + ["--", filepath]
+        # stderr goes to a file: a full stderr pipe would block git mid-diff
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+            try:
+                for line in process.stdout:
+                    yield line.rstrip("\n")
+            finally:
+                process.stdout.close()
+                returncode = process.wait()
+            if returncode != 0:
+                stderr.seek(0)
+                raise RuntimeError(stderr.read().decode("utf-8", errors="replace").strip())
 
     def diff_versions(
         self, filepath: str, commit1: str, commit2: Optional[str] = None
@@ -181,6 +728,10 @@ class StorageGit:
         result = self._run_git(["status"])
         return result.stdout
 
+    def close(self):
+        """Stop the background cat-file process."""
+        self._cat_file.close()
+
 
 def main():
     """CLI interface for storage_git."""
@@ -227,6 +778,12 @@ def main():
     status_parser = subparsers.add_parser("status", help="Show repository status")
     status_parser.add_argument("--path", "-p", default=".", help="Repository path")
 
+    # Reindex command
+    reindex_parser = subparsers.add_parser(
+        "reindex", help="Rebuild the per-file history index"
+    )
+    reindex_parser.add_argument("--path", "-p", default=".", help="Repository path")
+
     args = parser.parse_args()
 
     if not args.command:
@@ -261,6 +818,10 @@ def main():
     elif args.command == "status":
         print(storage.status())
 
+    elif args.command == "reindex":
+        count = storage.rebuild_history_index()
+        print(f"Indexed {count} commits")
+
 
 if __name__ == "__main__":
     main()
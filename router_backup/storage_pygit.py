@@ -4,26 +4,59 @@ storage_pygit.py - A file storage system backed by git using pygit2.
 
 Uses pygit2 library instead of shell commands for better performance
 and more control over git operations.
+
+In bare mode there is no working tree: blobs are written straight to the
+object database and commits are built from HEAD's tree in memory, so the
+cost of a write does not grow with the size of the repository.
 """
 
+import shutil
+import subprocess
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import pygit2
 
+try:
+    from router_backup.history_index import HistoryIndex
+except ImportError:
+    # Run as a standalone script from the router_backup directory
+    from history_index import HistoryIndex
+
 
 class StoragePyGit:
     """A storage system using pygit2 for version control."""
 
-    def __init__(self, repo_path: str = "."):
-        """Initialize StoragePyGit with a repository path."""
+    def __init__(self, repo_path: str = ".", bare: bool = False):
+        """
+        Initialize StoragePyGit with a repository path.
+
+        Args:
+            repo_path: Repository path (the git directory itself when bare)
+            bare: Use a bare repository; an existing bare repository at
+                repo_path is detected automatically
+        """
         self.repo_path = Path(repo_path).resolve()
         self.git_dir = self.repo_path / ".git"
         self.repo: Optional[pygit2.Repository] = None
 
+        # An existing bare repository has HEAD and objects/ at the top level
+        if not self.git_dir.exists() and (self.repo_path / "HEAD").exists():
+            bare = (self.repo_path / "objects").is_dir()
+        self.bare = bare
+        if bare:
+            self.git_dir = self.repo_path
+
+        # Per-file commit history, loaded on first use
+        self._history_index: Optional[HistoryIndex] = None
+
+        # Blobs written by stage_file() in bare mode: filepath -> blob id
+        self._staged_blobs: Dict[str, pygit2.Oid] = {}
+        self._pending_tree: Optional[pygit2.Oid] = None
+
         # Try to open repo if it exists
-        if self.git_dir.exists():
+        if (self.git_dir / "HEAD").exists():
             try:
                 self.repo = pygit2.Repository(str(self.repo_path))
             except pygit2.GitError:
@@ -42,7 +75,7 @@ class StoragePyGit:
         self.repo_path.mkdir(parents=True, exist_ok=True)
 
         try:
-            self.repo = pygit2.init_repository(str(self.repo_path))
+            self.repo = pygit2.init_repository(str(self.repo_path), bare=self.bare)
 
             # Configure git user if not set
             config = self.repo.config
@@ -55,14 +88,15 @@ class StoragePyGit:
             except KeyError:
                 config["user.name"] = "StoragePyGit"
 
-            print(f"Initialized empty repository at {self.repo_path}")
+            kind = "bare repository" if self.bare else "repository"
+            print(f"Initialized empty {kind} at {self.repo_path}")
             return True
         except pygit2.GitError as e:
             print(f"Error initializing repository: {e}")
             return False
 
-    def _create_signature(self) -> pygit2.Signature:
-        """Create a git signature for commits."""
+    def _create_signature(self, time: Optional[int] = None) -> pygit2.Signature:
+        """Create a git signature for commits (at `time`, default now)."""
         config = self.repo.config
         try:
             email = config["user.email"]
@@ -73,7 +107,9 @@ class StoragePyGit:
         except KeyError:
             name = "StoragePyGit"
 
-        return pygit2.Signature(name, email, int(datetime.now().timestamp()))
+        if time is None:
+            time = int(datetime.now().timestamp())
+        return pygit2.Signature(name, email, time)
 
     def write_file(
         self, filepath: str, content: str, commit_msg: Optional[str] = None
@@ -83,6 +119,16 @@ class StoragePyGit:
             print("Repository not initialized. Run init() first.")
             return False
 
+        if self.bare:
+            changed = self.write_files({filepath: content}, commit_msg or f"Add {filepath}")
+            if changed is None:
+                return False
+            if changed:
+                print(f"Committed {filepath}")
+            else:
+                print(f"No changes to commit for {filepath}")
+            return True
+
         full_path = self.repo_path / filepath
         full_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -130,7 +176,7 @@ class StoragePyGit:
                 # Subsequent commits - update current branch
                 ref = "HEAD"
 
-            self.repo.create_commit(
+            commit_id = self.repo.create_commit(
                 ref,
                 author,
                 committer,
@@ -138,71 +184,428 @@ class StoragePyGit:
                 tree,
                 parents,
             )
+            self._record_commit(commit_id)
             print(f"Committed {filepath}")
             return True
         except pygit2.GitError as e:
             print(f"Failed to commit: {e}")
             return False
 
+    def _head_commit(self) -> Optional[pygit2.Commit]:
+        """Return the HEAD commit, or None on an unborn branch."""
+        try:
+            return self.repo.head.peel(pygit2.Commit)
+        except (pygit2.GitError, KeyError):
+            return None
+
+    def _build_tree(self, tree: Optional[pygit2.Tree], changes: Dict[str, Any]) -> pygit2.Oid:
+        """
+        Write a tree equal to `tree` with `changes` applied.
+
+        `changes` maps entry names to blob ids, or to nested dicts for
+        subdirectories. Untouched entries are reused as they are.
+        """
+        builder = self.repo.TreeBuilder(tree) if tree is not None else self.repo.TreeBuilder()
+        for name, value in changes.items():
+            if isinstance(value, dict):
+                subtree = None
+                if tree is not None and name in tree:
+                    entry = self.repo.get(tree[name].id)
+                    if isinstance(entry, pygit2.Tree):
+                        subtree = entry
+                builder.insert(name, self._build_tree(subtree, value), pygit2.GIT_FILEMODE_TREE)
+            else:
+                builder.insert(name, value, pygit2.GIT_FILEMODE_BLOB)
+        return builder.write()
+
+    def _tree_with_blobs(self, blobs: Dict[str, pygit2.Oid]) -> tuple:
+        """
+        Build a new tree from HEAD with the given blobs in place.
+
+        Returns:
+            Tuple of (new tree id, list of paths whose blob changed)
+        """
+        head = self._head_commit()
+        base_tree = head.tree if head is not None else None
+
+        changes: Dict[str, Any] = {}
+        changed = []
+        for filepath, blob_id in blobs.items():
+            try:
+                unchanged = base_tree is not None and (base_tree / filepath).id == blob_id
+            except KeyError:
+                unchanged = False
+            if unchanged:
+                continue
+            changed.append(filepath)
+            *dirs, name = filepath.split("/")
+            node = changes
+            for part in dirs:
+                node = node.setdefault(part, {})
+            node[name] = blob_id
+
+        if not changed:
+            return (base_tree.id if base_tree is not None else None), []
+        return self._build_tree(base_tree, changes), changed
+
+    def _commit_tree(
+        self,
+        tree_id: pygit2.Oid,
+        commit_msg: str,
+        time: Optional[int] = None,
+        files: Optional[Dict[str, pygit2.Oid]] = None,
+    ):
+        """Create a commit of tree_id on top of HEAD (files: changed blobs, if known)."""
+        author = self._create_signature(time)
+        head = self._head_commit()
+        parents = [head.id] if head is not None else []
+        ref = "HEAD" if parents else "refs/heads/master"
+        commit_id = self.repo.create_commit(ref, author, author, commit_msg, tree_id, parents)
+        self._record_commit(commit_id, files)
+        return commit_id
+
+    def write_files(
+        self, files: Dict[str, str], commit_msg: str, time: Optional[int] = None
+    ) -> Optional[List[str]]:
+        """
+        Commit several files at once without touching a working tree.
+
+        Blobs go straight to the object database and the new tree is built
+        from HEAD's tree with a TreeBuilder, so no checkout, index or status
+        scan is involved. Nothing is committed if no file changed.
+
+        Args:
+            files: Mapping of file path to content
+            commit_msg: Commit message
+            time: Commit timestamp (defaults to now)
+
+        Returns:
+            List of changed paths, or None if the commit failed
+        """
+        if not self.is_initialized():
+            print("Repository not initialized. Run init() first.")
+            return None
+
+        try:
+            blobs = {
+                filepath: self.repo.create_blob(content.encode("utf-8"))
+                for filepath, content in files.items()
+            }
+            tree_id, changed = self._tree_with_blobs(blobs)
+            if changed:
+                changed_blobs = {path: blobs[path] for path in changed}
+                self._commit_tree(tree_id, commit_msg, time, changed_blobs)
+            return changed
+        except pygit2.GitError as e:
+            print(f"Failed to commit: {e}")
+            return None
+
+    def import_commits(self, commits: Iterable[dict]) -> int:
+        """
+        Append commits on top of HEAD, each built in memory by write_files().
+
+        The pygit2 counterpart of StorageGit.import_commits() for bare
+        repositories: no working tree or index is involved. Commits are
+        consumed lazily, so a generator keeps memory flat.
+
+        Args:
+            commits: Commits, oldest first. Each is a dict with 'files'
+                (path -> content), 'message' and optionally 'time' (Unix
+                timestamp, defaults to now)
+
+        Returns:
+            Number of commits imported; an import that fails stops there
+        """
+        count = 0
+        for commit in commits:
+            if not commit["files"]:
+                continue
+            changed = self.write_files(commit["files"], commit["message"], commit.get("time"))
+            if changed is None:
+                break
+            if changed:
+                count += 1
+        return count
+
+    def stage_file(self, filepath: str, content: str) -> bool:
+        """Write a file to the working tree without staging or committing it."""
+        if not self.is_initialized():
+            print("Repository not initialized. Run init() first.")
+            return False
+
+        if self.bare:
+            # No working tree: keep only the blob id until add_files()
+            self._staged_blobs[filepath] = self.repo.create_blob(content.encode("utf-8"))
+            return True
+
+        full_path = self.repo_path / filepath
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(full_path, "w") as f:
+            f.write(content)
+        return True
+
+    def add_files(self, filepaths: List[str]) -> List[str]:
+        """
+        Stage several files and write the index once.
+
+        Returns the staged paths that differ from HEAD.
+        """
+        if not self.is_initialized() or not filepaths:
+            return []
+
+        if self.bare:
+            blobs = {
+                path: self._staged_blobs.pop(path)
+                for path in filepaths
+                if path in self._staged_blobs
+            }
+            tree_id, changed = self._tree_with_blobs(blobs)
+            self._pending_tree = tree_id if changed else None
+            return changed
+
+        index = self.repo.index
+        for filepath in filepaths:
+            index.add(filepath)
+        index.write()
+
+        try:
+            diff = index.diff_to_tree(self.repo.head.peel(pygit2.Tree))
+        except pygit2.GitError:
+            # No HEAD yet (first commit): everything staged is new
+            return list(filepaths)
+        return [delta.new_file.path for delta in diff.deltas]
+
+    def commit(self, commit_msg: str) -> bool:
+        """Commit whatever is staged in the index."""
+        if not self.is_initialized():
+            print("Repository not initialized. Run init() first.")
+            return False
+
+        if self.bare:
+            if self._pending_tree is None:
+                print("No changes to commit")
+                return True
+            try:
+                self._commit_tree(self._pending_tree, commit_msg)
+                return True
+            except pygit2.GitError as e:
+                print(f"Failed to commit: {e}")
+                return False
+            finally:
+                self._pending_tree = None
+
+        tree = self.repo.index.write_tree()
+        author = self._create_signature()
+
+        parents = []
+        try:
+            parents.append(self.repo.head.target)
+        except pygit2.GitError:
+            pass
+
+        try:
+            commit_id = self.repo.create_commit(
+                "HEAD" if parents else "refs/heads/master",
+                author,
+                author,
+                commit_msg,
+                tree,
+                parents,
+            )
+            self._record_commit(commit_id)
+            return True
+        except pygit2.GitError as e:
+            print(f"Failed to commit: {e}")
+            return False
+
     def update_file(
         self, filepath: str, content: str, commit_msg: Optional[str] = None
     ) -> bool:
         """Update a file and commit the changes."""
         return self.write_file(filepath, content, commit_msg or f"Update {filepath}")
 
+    def _history(self) -> HistoryIndex:
+        """Return the per-file history index stored in the git directory."""
+        if self._history_index is None:
+            self._history_index = HistoryIndex(self.git_dir / "router-backup" / "history.jsonl")
+        return self._history_index
+
+    def _history_entry(
+        self, commit: pygit2.Commit, files: Optional[Dict[str, pygit2.Oid]] = None
+    ) -> Dict:
+        """Describe a commit for the history index."""
+        if files is None:
+            if commit.parents:
+                diff = self.repo.diff(commit.parents[0].tree, commit.tree)
+            else:
+                diff = commit.tree.diff_to_tree(swap=True)
+            files = {delta.new_file.path: delta.new_file.id for delta in diff.deltas}
+
+        return {
+            "commit": str(commit.id),
+            "parent": str(commit.parents[0].id) if commit.parents else "",
+            "time": commit.commit_time,
+            "date": datetime.fromtimestamp(commit.commit_time).strftime("%Y-%m-%d %H:%M:%S"),
+            "message": commit.message.strip(),
+            "files": {path: str(blob) for path, blob in files.items()},
+        }
+
+    def _record_commit(
+        self, commit_id: pygit2.Oid, files: Optional[Dict[str, pygit2.Oid]] = None
+    ):
+        """Append a commit just created on HEAD to the history index."""
+        commit = self.repo.get(commit_id)
+        index = self._history()
+        index.refresh()
+        expected_parent = str(commit.parents[0].id) if commit.parents else ""
+        if (index.head or "") == expected_parent:
+            index.append([self._history_entry(commit, files)])
+        else:
+            self._sync_history()
+
+    def _sync_history(self) -> HistoryIndex:
+        """Bring the history index up to HEAD, rebuilding it if history was rewritten."""
+        index = self._history()
+        index.refresh()
+        head = self._head_commit()
+
+        if head is None:
+            if index.head is not None:
+                index.rebuild([])
+            return index
+        if index.head == str(head.id):
+            return index
+
+        walker = self.repo.walk(head.id, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE)
+        walker.simplify_first_parent()
+
+        indexed = None
+        if index.head is not None:
+            try:
+                indexed = pygit2.Oid(hex=index.head)
+                if not self.repo.descendant_of(head.id, indexed):
+                    indexed = None
+            except (ValueError, pygit2.GitError):
+                indexed = None
+
+        if indexed is not None:
+            # Catch up with commits made since the index was last written
+            walker.hide(indexed)
+            index.append(self._history_entry(commit) for commit in walker)
+        else:
+            index.rebuild(self._history_entry(commit) for commit in walker)
+        return index
+
+    def rebuild_history_index(self) -> int:
+        """
+        Rebuild the per-file history index from the full history.
+
+        Returns:
+            Number of commits indexed
+        """
+        if not self.is_initialized():
+            print("Repository not initialized.")
+            return 0
+
+        index = self._history()
+        head = self._head_commit()
+        if head is None:
+            index.rebuild([])
+            return 0
+        walker = self.repo.walk(head.id, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE)
+        walker.simplify_first_parent()
+        entries = [self._history_entry(commit) for commit in walker]
+        index.rebuild(entries)
+        return len(entries)
+
+    def compact_history(
+        self, select: Callable[[List[int]], Set[int]], dry_run: bool = False
+    ) -> Tuple[int, int]:
+        """
+        Rewrite the branch keeping only the commits chosen by select.
+
+        Each kept commit keeps its tree, message and signatures, so it still
+        holds every file as of its time; the changes of dropped commits are
+        folded into the next kept one. HEAD's tree never changes. libgit2
+        cannot garbage collect, so unreachable objects are pruned with the
+        git CLI when it is installed.
+
+        Args:
+            select: Gets the commit times (oldest first) and returns the
+                indices of the commits to keep
+            dry_run: Only count what would be kept and removed
+
+        Returns:
+            (kept, removed) commit counts
+        """
+        if not self.is_initialized():
+            print("Repository not initialized.")
+            return 0, 0
+
+        head = self._head_commit()
+        if head is None:
+            return 0, 0
+
+        walker = self.repo.walk(head.id, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_REVERSE)
+        walker.simplify_first_parent()
+        commits = list(walker)
+        keep = select([commit.commit_time for commit in commits])
+        keep.add(len(commits) - 1)
+        removed = len(commits) - len(keep)
+        if dry_run or removed == 0:
+            return len(keep), removed
+
+        parents = []
+        for i, commit in enumerate(commits):
+            if i in keep:
+                new_id = self.repo.create_commit(
+                    None, commit.author, commit.committer, commit.message, commit.tree_id, parents
+                )
+                parents = [new_id]
+
+        self.repo.head.set_target(parents[0], "compact history")
+
+        if shutil.which("git"):
+            git = ["git", "--git-dir", str(self.git_dir)]
+            subprocess.run(git + ["reflog", "expire", "--expire=now", "--all"], capture_output=True)
+            subprocess.run(git + ["gc", "--prune=now", "--quiet"], capture_output=True)
+        else:
+            print("git not installed: dropped commits stay on disk until 'git gc' runs")
+
+        self._sync_history()
+        return len(keep), removed
+
     def list_versions(self, filepath: str) -> List[Dict]:
-        """List all versions of a file with their commit info."""
+        """
+        List all versions of a file with their commit info.
+
+        Served from the per-file history index, which is updated at commit
+        time and caught up from history when HEAD moved without it.
+        """
         if not self.is_initialized():
             print("Repository not initialized.")
             return []
 
-        versions = []
-
         try:
-            # Walk through commits
-            for commit in self.repo.walk(self.repo.head.target, pygit2.GIT_SORT_TIME):
-                # Check if file was modified in this commit
-                if len(commit.parents) == 0:
-                    # Initial commit - check if file exists in tree
-                    try:
-                        commit.tree / filepath
-                        versions.append(
-                            {
-                                "hash": str(commit.id)[:8],
-                                "full_hash": str(commit.id),
-                                "date": datetime.fromtimestamp(
-                                    commit.commit_time
-                                ).strftime("%Y-%m-%d %H:%M:%S"),
-                                "message": commit.message.strip(),
-                            }
-                        )
-                    except KeyError:
-                        pass
-                else:
-                    # Compare with parent
-                    parent = commit.parents[0]
-                    diff = self.repo.diff(parent, commit)
-
-                    for delta in diff.deltas:
-                        if (
-                            delta.new_file.path == filepath
-                            or delta.old_file.path == filepath
-                        ):
-                            versions.append(
-                                {
-                                    "hash": str(commit.id)[:8],
-                                    "full_hash": str(commit.id),
-                                    "date": datetime.fromtimestamp(
-                                        commit.commit_time
-                                    ).strftime("%Y-%m-%d %H:%M:%S"),
-                                    "message": commit.message.strip(),
-                                }
-                            )
-                            break
+            index = self._sync_history()
         except pygit2.GitError as e:
             print(f"Error: {e}")
+            return []
+
+        return [
+            {
+                "hash": version["commit"][:8],
+                "full_hash": version["commit"],
+                "date": version["date"],
+                "message": version["message"],
+            }
+            for version in index.versions(filepath)
+        ]
 
-        return versions
+    def _resolve_commit(self, revision: str) -> pygit2.Commit:
+        """Resolve a full or abbreviated commit hash (or any revision) to a commit."""
+        return self.repo.revparse_single(revision).peel(pygit2.Commit)
 
     def read_version(self, filepath: str, commit_hash: str) -> Optional[str]:
         """Read a specific version of a file."""
@@ -211,18 +614,83 @@ class StoragePyGit:
             return None
 
         try:
-            commit = self.repo.get(pygit2.Oid(hex=commit_hash))
-            if commit is None:
-                print(f"Commit {commit_hash} not found")
-                return None
+            commit = self._resolve_commit(commit_hash)
+        except (KeyError, ValueError):
+            print(f"Commit {commit_hash} not found")
+            return None
 
-            tree = commit.tree
-            blob = tree / filepath
+        try:
+            blob = self._blob_at(commit, filepath)
+            if blob is None:
+                print(f"Error reading version: {filepath} not in {commit_hash}")
+                return None
             return blob.data.decode("utf-8")
         except pygit2.GitError as e:
             print(f"Error reading version: {e}")
             return None
 
+    def read_versions(self, versions: List[Tuple[str, str]]) -> List[Optional[str]]:
+        """
+        Read many file versions (same API as StorageGit.read_versions).
+
+        Args:
+            versions: List of (filepath, commit hash) pairs
+
+        Returns:
+            File contents in the same order, None for versions that do not exist
+        """
+        return [self.read_version(filepath, commit_hash) for filepath, commit_hash in versions]
+
+    def _blob_at(self, commit: pygit2.Commit, filepath: str) -> Optional[pygit2.Blob]:
+        """Return the blob of filepath in commit, or None if it does not exist there."""
+        try:
+            return commit.tree / filepath
+        except KeyError:
+            return None
+
+    def iter_diff(
+        self, filepath: str, commit1: str, commit2: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Yield a unified diff of one file between two versions, line by line.
+
+        Only the two blobs of filepath are compared, the rest of the tree is
+        never diffed. libgit2 builds the patch in memory; only its lines are
+        yielded one at a time. If commit2 is None, commit1 is compared with
+        the working file (or with HEAD in a bare repository).
+
+        Raises:
+            KeyError: If a commit cannot be resolved
+            ValueError: If a commit hash is malformed or ambiguous
+            pygit2.GitError: On repository errors
+        """
+        old = self._blob_at(self._resolve_commit(commit1), filepath)
+        if commit2:
+            new = self._blob_at(self._resolve_commit(commit2), filepath)
+        elif self.bare:
+            head = self._head_commit()
+            new = self._blob_at(head, filepath) if head is not None else None
+        else:
+            path = self.repo_path / filepath
+            new = path.read_bytes() if path.exists() else None
+
+        if old is None and new is None:
+            return
+        patch = pygit2.Patch.create_from(old, new, old_as_path=filepath, new_as_path=filepath)
+
+        header = False
+        for hunk in patch.hunks:
+            if not header:
+                yield f"diff --git a/{filepath} b/{filepath}"
+                yield f"--- a/{filepath}"
+                yield f"+++ b/{filepath}"
+                header = True
+            yield f"@@ -{hunk.old_start},{hunk.old_lines} +{hunk.new_start},{hunk.new_lines} @@"
+            for line in hunk.lines:
+                if line.origin in "+- ":
+                    content = line.content.rstrip("\n")
+                    yield f"{line.origin}{content}"
+
     def diff_versions(
         self, filepath: str, commit1: str, commit2: Optional[str] = None
     ) -> str:
@@ -234,46 +702,12 @@ class StoragePyGit:
             return "Repository not initialized."
 
         try:
-            c1 = self.repo.get(pygit2.Oid(hex=commit1))
-            if c1 is None:
-                return f"Commit {commit1} not found"
-
-            if commit2:
-                c2 = self.repo.get(pygit2.Oid(hex=commit2))
-                if c2 is None:
-                    return f"Commit {commit2} not found"
-                diff = self.repo.diff(c1, c2)
-            else:
-                # Diff commit1 with current working directory
-                diff = self.repo.diff(c1)
-
-            # Filter for our file
-            output = []
-            for delta in diff.deltas:
-                if delta.new_file.path == filepath or delta.old_file.path == filepath:
-                    output.append(
-                        f"diff --git a/{delta.old_file.path} b/{delta.new_file.path}"
-                    )
-                    output.append(f"--- a/{delta.old_file.path}")
-                    output.append(f"+++ b/{delta.new_file.path}")
-
-                    for hunk in diff.hunks:
-                        output.append(
-                            f"@@ -{hunk.old_start},{hunk.old_lines} +{hunk.new_start},{hunk.new_lines} @@"
-                        )
-                        for line in hunk.lines:
-                            prefix = (
-                                "+"
-                                if line.origin == "+"
-                                else "-"
-                                if line.origin == "-"
-                                else " "
-                            )
-                            output.append(f"{prefix}{line.content}")
-
-            return "\n".join(output) if output else "No differences found."
+            output = "\n".join(self.iter_diff(filepath, commit1, commit2))
+        except (KeyError, ValueError) as e:
+            return f"Commit {e.args[0] if e.args else ''} not found"
         except pygit2.GitError as e:
             return f"Error: {e}"
+        return output or "No differences found."
 
     def diff_with_previous(self, filepath: str, commit_hash: str) -> str:
         """Show diff between a commit and its parent."""
@@ -281,15 +715,16 @@ class StoragePyGit:
             return "Repository not initialized."
 
         try:
-            commit = self.repo.get(pygit2.Oid(hex=commit_hash))
-            if commit is None:
-                return f"Commit {commit_hash} not found"
+            commit = self._resolve_commit(commit_hash)
+        except (KeyError, ValueError):
+            return f"Commit {commit_hash} not found"
 
+        try:
             if len(commit.parents) == 0:
                 return "No parent commit (this is the initial commit)"
 
             parent = commit.parents[0]
-            return self.diff_versions(filepath, str(parent.id), commit_hash)
+            return self.diff_versions(filepath, str(parent.id), str(commit.id))
         except pygit2.GitError as e:
             return f"Error: {e}"
 
@@ -298,6 +733,11 @@ class StoragePyGit:
         if not self.is_initialized():
             return "Repository not initialized."
 
+        if self.bare:
+            head = self._head_commit()
+            head_str = str(head.id)[:8] if head is not None else "none"
+            return f"Bare repository (no working tree), HEAD at {head_str}"
+
         output = []
         status = self.repo.status()
 
@@ -335,6 +775,9 @@ def main():
     # Init command
     init_parser = subparsers.add_parser("init", help="Initialize a new repository")
     init_parser.add_argument("--path", "-p", default=".", help="Repository path")
+    init_parser.add_argument(
+        "--bare", action="store_true", help="Create a bare repository (no working tree)"
+    )
 
     # Write command
     write_parser = subparsers.add_parser("write", help="Write a file and commit it")
@@ -372,7 +815,7 @@ def main():
         parser.print_help()
         return
 
-    storage = StoragePyGit(args.path)
+    storage = StoragePyGit(args.path, bare=getattr(args, "bare", False))
 
     if args.command == "init":
         storage.init()
@@ -22,6 +22,8 @@ logger.remove()
 logger.add(sys.stderr, format="{level}: {message}", level="INFO")
 
 app = typer.Typer(help="Storage CLI for router-backup git storage")
+migrate_app = typer.Typer(help="Migrate backups between storage models")
+app.add_typer(migrate_app, name="migrate")
 
 # Global config and storage
 _config: Optional[Config] = None
@@ -56,6 +58,15 @@ def init_storage(config: Config) -> BackupStorage:
         hostname="storagecli",
         timestamp="",
         dry_run=_dry_run,
+        commit_mode=config.commit_mode,
+        pygit_bare=config.pygit_bare,
+        git_fast_import=config.git_fast_import,
+        skip_unchanged=config.skip_unchanged,
+        txt_compression=config.txt_compression,
+        txt_dedup=config.txt_dedup,
+        retention=config.retention,
+        layout=config.layout,
+        lock_timeout=config.lock_timeout,
     )
 
     set_global_storage(_storage)
@@ -130,7 +141,8 @@ def init_repo(
     # Check if already initialized
     if _config.storage_model in ["git", "pygit"]:
         git_dir = storage_path / ".git"
-        if git_dir.exists() and not force:
+        bare_head = storage_path / "HEAD"
+        if (git_dir.exists() or bare_head.exists()) and not force:
             typer.echo(f"Repository already initialized at {storage_path}")
             typer.echo("Use --force to reinitialize")
             raise typer.Exit(1)
@@ -183,11 +195,15 @@ def write_file(
     commit_msg = message or f"Add {filepath}"
 
     # Write the file
-    _storage.write_backup(
-        filename=filepath.replace(".txt", ""),  # Remove extension if provided
-        content=file_content,
-        device_ip=None,
-    )
+    try:
+        _storage.write_backup(
+            filename=filepath.replace(".txt", ""),  # Remove extension if provided
+            content=file_content,
+            device_ip=None,
+        )
+    except TimeoutError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
 
     # Show dry-run summary if applicable
     show_dry_run_summary()
@@ -238,9 +254,13 @@ def update_file(
     commit_msg = message or f"Update {filepath}"
 
     # Update the file
-    _storage.write_backup(
-        filename=filepath.replace(".txt", ""), content=file_content, device_ip=None
-    )
+    try:
+        _storage.write_backup(
+            filename=filepath.replace(".txt", ""), content=file_content, device_ip=None
+        )
+    except TimeoutError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
 
     # Show dry-run summary if applicable
     show_dry_run_summary()
@@ -253,17 +273,12 @@ def update_file(
 def list_versions(
     filepath: str = typer.Argument(..., help="Path to the file"),
 ):
-    """List all versions of a file (git/pygit only)."""
+    """List all versions of a file (txt snapshots are listed by timestamp)."""
     global _config, _storage
 
     if _config is None:
         _config = load_config()
 
-    if _config.storage_model == "txt":
-        typer.echo("Version control not available with txt storage model")
-        typer.echo("Use --model git or --model pygit for version control")
-        raise typer.Exit(1)
-
     if _storage is None:
         _storage = init_storage(_config)
 
@@ -287,25 +302,20 @@ def diff_versions(
         None, help="Second commit hash (optional - compares with current if omitted)"
     ),
 ):
-    """Show diff between file versions (git/pygit only)."""
+    """Show diff between file versions (commit hashes, or timestamps for txt)."""
     global _config, _storage
 
     if _config is None:
         _config = load_config()
 
-    if _config.storage_model == "txt":
-        typer.echo("Version control not available with txt storage model")
-        typer.echo("Use --model git or --model pygit for version control")
-        raise typer.Exit(1)
-
     if _storage is None:
         _storage = init_storage(_config)
 
-    diff_output = _storage.diff_versions(
+    # Print lines as they come; the git model never holds the whole diff
+    for line in _storage.iter_diff(
         filename=filepath.replace(".txt", ""), commit1=commit1, commit2=commit2
-    )
-
-    typer.echo(diff_output)
+    ):
+        typer.echo(line)
 
 
 @app.command(name="read")
@@ -316,17 +326,12 @@ def read_version(
         None, "--output", "-o", help="Output file (default: stdout)"
     ),
 ):
-    """Read a specific version of a file (git/pygit only)."""
+    """Read a specific version of a file (commit hash, or timestamp for txt)."""
     global _config, _storage
 
     if _config is None:
         _config = load_config()
 
-    if _config.storage_model == "txt":
-        typer.echo("Version control not available with txt storage model")
-        typer.echo("Use --model git or --model pygit for version control")
-        raise typer.Exit(1)
-
     if _storage is None:
         _storage = init_storage(_config)
 
@@ -374,6 +379,150 @@ def show_status():
         typer.echo(status)
 
 
+@app.command(name="reindex")
+def reindex():
+    """Rebuild the history index used by versions (txt snapshot index for txt)."""
+    global _config, _storage
+
+    if _config is None:
+        _config = load_config()
+
+    if _config.storage_model == "txt":
+        if _dry_run:
+            typer.echo(f"[DRY-RUN] Would rebuild the txt snapshot index at {_config.storage}")
+            return
+        if _storage is None:
+            init_storage(_config)
+        count = _storage.rebuild_txt_index()
+        typer.echo(f"Indexed {count} snapshots")
+        return
+
+    if _config.storage_model == "git":
+        from router_backup.storage_git import StorageGit
+
+        storage = StorageGit(_config.storage)
+    elif _config.storage_model == "pygit":
+        from router_backup.storage_pygit import StoragePyGit
+
+        storage = StoragePyGit(_config.storage)
+    else:
+        typer.echo(f"Unknown storage model: {_config.storage_model}")
+        raise typer.Exit(1)
+
+    if _dry_run:
+        typer.echo(f"[DRY-RUN] Would rebuild the history index at {_config.storage}")
+        return
+
+    count = storage.rebuild_history_index()
+    typer.echo(f"Indexed {count} commits")
+
+
+@app.command(name="prune")
+def prune():
+    """Delete backups the retention policy does not keep (compacts git history)."""
+    global _config, _storage
+
+    if _config is None:
+        _config = load_config()
+
+    if not _config.retention:
+        typer.echo("No retention policy configured (set 'retention' in the config file)")
+        raise typer.Exit(1)
+
+    try:
+        if _storage is None:
+            _storage = init_storage(_config)
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    results = _storage.prune()
+    unit = "snapshots" if _config.storage_model == "txt" else "commits"
+    prefix = "[DRY-RUN] Would remove" if _dry_run else "Removed"
+    typer.echo(f"{prefix} {results['removed']} {unit}, kept {results['kept']}")
+    if results.get("objects_removed"):
+        typer.echo(f"Removed {results['objects_removed']} unreferenced objects")
+
+
+@app.command(name="train-dict")
+def train_dict(
+    per_device: int = typer.Option(
+        3, "--per-device", "-k", help="Newest snapshots of each device used as samples"
+    ),
+    size: int = typer.Option(112640, "--size", help="Dictionary size in bytes"),
+):
+    """Train a zstd dictionary on the txt snapshots for txt_compression: zstd."""
+    global _config, _storage
+
+    if _config is None:
+        _config = load_config()
+
+    if _config.storage_model != "txt":
+        typer.echo("Compression dictionaries are only used by the txt storage model")
+        raise typer.Exit(1)
+
+    if _dry_run:
+        typer.echo(f"[DRY-RUN] Would train a zstd dictionary on {_config.storage}")
+        return
+
+    if _storage is None:
+        _storage = init_storage(_config)
+
+    try:
+        dict_id = _storage.train_txt_dictionary(per_device=per_device, size=size)
+    except (ImportError, ValueError) as e:
+        typer.echo(f"Error: {e}")
+        raise typer.Exit(1)
+
+    typer.echo(f"Trained zstd dictionary {dict_id}, used for new zstd snapshots")
+
+
+@migrate_app.command(name="txt-to-git")
+def migrate_txt_to_git(
+    source: str = typer.Argument(..., help="Directory of <hostname>_<MM-DD-YYYY_HH-MM>.txt files"),
+    gap: int = typer.Option(
+        30, "--gap", "-g", help="Minutes between snapshots that start a new run"
+    ),
+):
+    """Import txt snapshots into git history, one dated commit per backup run."""
+    global _config, _storage
+
+    from router_backup.migrate import migrate_txt_to_git as migrate
+
+    if _config is None:
+        _config = load_config()
+
+    if not os.path.isdir(source):
+        typer.echo(f"Error: Directory not found: {source}")
+        raise typer.Exit(1)
+
+    # History is streamed through git fast-import, whatever the configured
+    # model; a bare pygit repository has no working tree and builds it in memory
+    if not (_config.storage_model == "pygit" and _config.pygit_bare):
+        _config.storage_model = "git"
+        _config.git_fast_import = True
+    if _storage is None:
+        _storage = init_storage(_config)
+
+    stats = migrate(source, _storage, gap_minutes=gap)
+
+    if _dry_run:
+        typer.echo(
+            f"[DRY-RUN] Would import {stats['snapshots']} snapshots in {stats['runs']} runs "
+            f"into {_config.storage}"
+        )
+        return
+
+    if stats["runs"] and not stats["commits"]:
+        typer.echo("Error: Import failed")
+        raise typer.Exit(1)
+
+    typer.echo(
+        f"Imported {stats['files']} snapshots as {stats['commits']} commits "
+        f"({stats['unchanged']} unchanged snapshots skipped) into {_config.storage}"
+    )
+
+
 @app.command(name="init-config")
 def init_config(
     path: Optional[str] = typer.Option(
@@ -0,0 +1,240 @@
+"""
+syslog_listener.py - Event-driven backups from config-change syslog messages.
+
+``router-backup listen`` receives syslog over UDP and TCP (newline framing
+or RFC 6587 octet counting) and recognises the messages vendors log when
+their configuration changes. The sender IP is looked up in the inventory;
+after a quiet period (the debounce window, so a burst of changes costs one
+backup) the device is handed to the backup callback. Devices that change
+again while they are being backed up are collected once more afterwards.
+
+The backup callback runs on a single worker thread, so batches never
+overlap and storage keeps a single writer.
+"""
+
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from loguru import logger
+
+# Seconds without a new change event before a device is backed up
+DEFAULT_DEBOUNCE = 30.0
+
+SYSLOG_PORT = 514
+
+# Longest syslog message accepted over TCP
+MAX_MESSAGE_SIZE = 64 * 1024
+
+# Config-change messages, with the vendor (a VENDOR_KEYS name) that logs them
+CONFIG_CHANGE_PATTERNS: List[Tuple[Pattern, str]] = [
+    # %SYS-5-CONFIG_I: Configured from console by admin on vty0
+    (re.compile(r"%SYS-\d-CONFIG_I\b"), "cisco_ios"),
+    # %ASA-5-111008: User 'admin' executed the 'access-list ...' command.
+    # %ASA-5-111010: User 'admin', running 'CLI' from IP ..., executed '...'
+    (re.compile(r"%ASA-\d-1110(?:08|10)\b"), "cisco_asa"),
+    # mgd[1234]: UI_COMMIT: User 'admin' requested 'commit' operation
+    (re.compile(r"\bUI_COMMIT(?:_COMPLETED)?\b"), "juniper"),
+    # logid="0100044547" type="event" subtype="system" ... logdesc="Object attribute configured"
+    (
+        re.compile(r'logid="?01000445(?:46|47)\b|logdesc="(?:Object )?[Aa]ttribute configured"'),
+        "fortinet",
+    ),
+]
+
+
+def match_config_change(message: str) -> Optional[str]:
+    """
+    Check whether a syslog message reports a configuration change.
+
+    Returns:
+        Vendor name of the matching pattern, or None
+    """
+    for pattern, vendor in CONFIG_CHANGE_PATTERNS:
+        if pattern.search(message):
+            return vendor
+    return None
+
+
+def _sender_ip(addr) -> str:
+    """Normalise a peer address to the IP written in the inventory."""
+    host = addr[0]
+    if host.startswith("::ffff:"):
+        host = host[len("::ffff:") :]
+    return host
+
+
+class _SyslogDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: "ConfigChangeListener"):
+        self.listener = listener
+
+    def datagram_received(self, data: bytes, addr):
+        self.listener.handle_message(_sender_ip(addr), data.decode("utf-8", errors="replace"))
+
+
+class ConfigChangeListener:
+    """Receives syslog and triggers debounced backups of changed devices."""
+
+    def __init__(
+        self,
+        devices: Iterable[str],
+        on_change: Callable[[Dict[str, str]], None],
+        debounce: float = DEFAULT_DEBOUNCE,
+    ):
+        """
+        Args:
+            devices: IPs of the inventory; messages from other senders are ignored
+            on_change: Backs up a batch of devices, called with a dict of
+                IP -> vendor name of the change event, on the worker thread
+            debounce: Seconds without a new event before a device is backed up
+        """
+        self.devices = set(devices)
+        self.on_change = on_change
+        self.debounce = debounce
+        self.udp_address: Optional[Tuple[str, int]] = None
+        self.tcp_address: Optional[Tuple[str, int]] = None
+
+        # Devices waiting for their debounce window, and devices due for backup
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._vendors: Dict[str, str] = {}
+        self._due: Dict[str, str] = {}
+        self._busy = False
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="syslog-backup")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+        self._started = threading.Event()
+
+    def handle_message(self, sender: str, message: str) -> Optional[str]:
+        """
+        Process one syslog message; must be called on the event loop.
+
+        Returns:
+            Vendor name if the message is a config change of an inventory device
+        """
+        vendor = match_config_change(message)
+        if vendor is None:
+            return None
+        if sender not in self.devices:
+            logger.debug(f"Ignoring config change of {sender}: not in the inventory")
+            return None
+
+        logger.info(f"Config change on {sender} ({vendor}), backing up in {self.debounce:g}s")
+        timer = self._timers.pop(sender, None)
+        if timer is not None:
+            timer.cancel()
+        self._vendors[sender] = vendor
+        self._timers[sender] = self._loop.call_later(self.debounce, self._make_due, sender)
+        return vendor
+
+    def _make_due(self, sender: str):
+        self._timers.pop(sender, None)
+        self._due[sender] = self._vendors.pop(sender)
+        self._start_batch()
+
+    def _start_batch(self):
+        """Hand the due devices to the worker, unless a batch is running."""
+        if self._busy or not self._due:
+            return
+        batch, self._due = self._due, {}
+        self._busy = True
+        future = self._loop.run_in_executor(self._executor, self._run_batch, batch)
+        future.add_done_callback(self._batch_done)
+
+    def _run_batch(self, batch: Dict[str, str]):
+        logger.info(f"Backing up {len(batch)} changed devices: {', '.join(sorted(batch))}")
+        try:
+            self.on_change(batch)
+        except Exception as e:
+            logger.error(f"Backup of changed devices failed: {e}")
+
+    def _batch_done(self, _future):
+        self._busy = False
+        self._start_batch()
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        sender = _sender_ip(writer.get_extra_info("peername"))
+        try:
+            while True:
+                first = await reader.read(1)
+                if not first:
+                    break
+                if first.isdigit():
+                    # RFC 6587 octet counting: "<length> <message>"
+                    count = first + await reader.readuntil(b" ")
+                    size = int(count.strip())
+                    if size > MAX_MESSAGE_SIZE:
+                        raise ValueError(f"Message of {size} bytes")
+                    data = await reader.readexactly(size)
+                else:
+                    data = first + await reader.readuntil(b"\n")
+                self.handle_message(sender, data.decode("utf-8", errors="replace").strip())
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.debug(f"Closing syslog connection from {sender}: {e!r}")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(
+        self,
+        host: str = "0.0.0.0",
+        udp_port: Optional[int] = SYSLOG_PORT,
+        tcp_port: Optional[int] = SYSLOG_PORT,
+    ):
+        """
+        Listen until stop() is called.
+
+        Args:
+            host: Address to bind
+            udp_port: UDP port (None to disable, 0 for any free port)
+            tcp_port: TCP port (None to disable, 0 for any free port)
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        transport, server = None, None
+        try:
+            if udp_port is not None:
+                transport, _ = await self._loop.create_datagram_endpoint(
+                    lambda: _SyslogDatagramProtocol(self), local_addr=(host, udp_port)
+                )
+                self.udp_address = transport.get_extra_info("sockname")[:2]
+                logger.info(f"Listening for syslog on udp/{self.udp_address[1]}")
+            if tcp_port is not None:
+                server = await asyncio.start_server(
+                    self._handle_tcp, host, tcp_port, limit=MAX_MESSAGE_SIZE
+                )
+                self.tcp_address = server.sockets[0].getsockname()[:2]
+                logger.info(f"Listening for syslog on tcp/{self.tcp_address[1]}")
+            self._started.set()
+            await self._stopped.wait()
+        finally:
+            self._started.set()
+            if transport is not None:
+                transport.close()
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            # Let a running batch finish; pending devices are dropped
+            await self._loop.run_in_executor(None, self._executor.shutdown)
+
+    def run(self, host: str = "0.0.0.0", udp_port=SYSLOG_PORT, tcp_port=SYSLOG_PORT):
+        """Run serve() on a new event loop, blocking until stop() or Ctrl-C."""
+        try:
+            asyncio.run(self.serve(host, udp_port, tcp_port))
+        except KeyboardInterrupt:
+            logger.info("Syslog listener stopped")
+
+    def wait_started(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the listening sockets are bound (or binding failed)."""
+        return self._started.wait(timeout)
+
+    def stop(self):
+        """Stop serve(); safe to call from any thread."""
+        if self._loop is not None and self._stopped is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
@@ -0,0 +1,132 @@
+"""
+Compression of txt model snapshots.
+
+Snapshots are stored as ``<filename>_<stamp>.txt``, ``.txt.gz`` or
+``.txt.zst``, and every read path picks the codec from the file name, so
+plain, gzip and zstd snapshots can sit side by side in one directory.
+
+zstd can use a dictionary trained on the fleet's own configurations, which
+is what makes many small, nearly identical files compress well. Dictionaries
+are kept by id in the storage's state directory; every zstd frame records
+the id of its dictionary, so snapshots stay readable after retraining.
+"""
+
+import gzip
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Compression method -> snapshot file suffix
+COMPRESSIONS = {"none": ".txt", "gzip": ".txt.gz", "zstd": ".txt.zst"}
+
+# Directory (under the storage state directory) holding zstd dictionaries
+DICT_DIR_NAME = "zstd-dicts"
+CURRENT_DICT = "current"
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 9
+DEFAULT_DICT_SIZE = 112640
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("zstd compression requires zstandard: pip install zstandard")
+    return zstandard
+
+
+class SnapshotCodec:
+    """Encodes snapshots with the configured compression and decodes any of them."""
+
+    def __init__(self, compression: str = "none", dict_dir: Optional[Path] = None):
+        """
+        Args:
+            compression: 'none', 'gzip' or 'zstd'
+            dict_dir: Directory of trained zstd dictionaries (optional)
+
+        Raises:
+            ValueError: If compression is not supported
+            ImportError: If zstd is requested and zstandard is not installed
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown txt compression: {compression}")
+        self.compression = compression
+        self.suffix = COMPRESSIONS[compression]
+        self.dict_dir = Path(dict_dir) if dict_dir else None
+        self._dicts: Dict[int, object] = {}
+        self._compressor = None
+        if compression == "zstd":
+            zstandard = _zstd()
+            dictionary = self._current_dictionary()
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+
+    def _current_dictionary(self):
+        """Return the dictionary new snapshots are compressed with, if one was trained."""
+        if self.dict_dir is None:
+            return None
+        try:
+            dict_id = int((self.dict_dir / CURRENT_DICT).read_text().strip())
+        except (OSError, ValueError):
+            return None
+        return self._dictionary(dict_id)
+
+    def _dictionary(self, dict_id: int):
+        """Load a trained dictionary by id."""
+        if dict_id not in self._dicts:
+            if self.dict_dir is None:
+                raise ValueError(f"zstd dictionary {dict_id} needed but no dictionary directory")
+            path = self.dict_dir / f"{dict_id}.dict"
+            try:
+                data = path.read_bytes()
+            except OSError:
+                raise ValueError(f"zstd dictionary {dict_id} not found in {self.dict_dir}")
+            self._dicts[dict_id] = _zstd().ZstdCompressionDict(data)
+        return self._dicts[dict_id]
+
+    def encode(self, content: str) -> bytes:
+        """Compress content with the configured method."""
+        data = content.encode("utf-8")
+        if self.compression == "gzip":
+            return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        if self.compression == "zstd":
+            return self._compressor.compress(data)
+        return data
+
+    def decode(self, data: bytes, name: str) -> str:
+        """Decompress data of the snapshot file called name."""
+        if name.endswith(".gz"):
+            data = gzip.decompress(data)
+        elif name.endswith(".zst"):
+            zstandard = _zstd()
+            dict_id = zstandard.get_frame_parameters(data).dict_id
+            dictionary = self._dictionary(dict_id) if dict_id else None
+            data = zstandard.ZstdDecompressor(dict_data=dictionary).decompress(data)
+        return data.decode("utf-8")
+
+    def read(self, path: Path) -> str:
+        """Read and decompress a snapshot file."""
+        path = Path(path)
+        return self.decode(path.read_bytes(), path.name)
+
+
+def train_dictionary(samples: List[str], dict_dir: Path, size: int = DEFAULT_DICT_SIZE) -> int:
+    """
+    Train a zstd dictionary on sample configurations and make it current.
+
+    Args:
+        samples: Configurations to train on (e.g. the newest of every device)
+        dict_dir: Directory the dictionary is stored in
+        size: Dictionary size in bytes
+
+    Returns:
+        Id of the new dictionary
+    """
+    zstandard = _zstd()
+    dictionary = zstandard.train_dictionary(size, [sample.encode("utf-8") for sample in samples])
+    dict_id = dictionary.dict_id()
+
+    dict_dir = Path(dict_dir)
+    dict_dir.mkdir(parents=True, exist_ok=True)
+    (dict_dir / f"{dict_id}.dict").write_bytes(dictionary.as_bytes())
+    (dict_dir / CURRENT_DICT).write_text(f"{dict_id}\n")
+    return dict_id
@@ -0,0 +1,131 @@
+"""
+txt_index.py - Sorted per-device index of txt model snapshots.
+
+Serves versions, read and diff for the txt model without scanning the
+storage directory. The index is an append-only JSON-lines file in the
+storage state directory; each line records one snapshot file:
+
+    {"name": "router1", "time": "2025-02-15T02:00:00",
+     "path": "cisco_ios/dc1/router1_02-15-2025_02-00.txt"}
+
+Paths are relative to the storage directory. Writers append a line per
+snapshot; the index is rebuilt from a directory walk when it does not exist
+yet, after pruning, and by ``storagecli reindex``. In memory every device
+has a time-sorted list, so a lookup by timestamp is a binary search.
+"""
+
+import json
+import os
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class TxtSnapshotIndex:
+    """Sidecar index mapping backup name to its snapshot files, oldest first."""
+
+    def __init__(self, path: Path):
+        """Open the index stored at path; it is read by the first refresh()."""
+        self.path = Path(path)
+        self._times: Dict[str, List[datetime]] = {}
+        self._paths: Dict[str, List[str]] = {}
+        self._offset = 0
+        self._file_id: Optional[Tuple[int, int]] = None
+
+    def _reset(self):
+        """Forget everything read so far."""
+        self._times = {}
+        self._paths = {}
+        self._offset = 0
+        self._file_id = None
+
+    def exists(self) -> bool:
+        """Whether the index file has been built."""
+        return self.path.exists()
+
+    def _apply(self, entry: dict):
+        """Add one snapshot entry to the in-memory index."""
+        taken = datetime.fromisoformat(entry["time"])
+        times = self._times.setdefault(entry["name"], [])
+        paths = self._paths.setdefault(entry["name"], [])
+        i = bisect_left(times, taken)
+        if i < len(times) and times[i] == taken:
+            # Same minute written again (possibly with another suffix)
+            paths[i] = entry["path"]
+        else:
+            times.insert(i, taken)
+            paths.insert(i, entry["path"])
+
+    def refresh(self):
+        """
+        Read lines appended to the index file since the last read.
+
+        Starts over from the beginning when the file was replaced (rebuilt or
+        pruned, possibly by another process) or truncated since the last read.
+        """
+        try:
+            with open(self.path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if file_id != self._file_id or stat.st_size < self._offset:
+                    self._reset()
+                    self._file_id = file_id
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            if self._file_id is not None:
+                self._reset()
+            return
+
+        # Only consume complete lines; a writer may be mid-append
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += end
+
+    @staticmethod
+    def _line(name: str, taken: datetime, path: str) -> str:
+        entry = {"name": name, "time": taken.isoformat(), "path": path}
+        return json.dumps(entry, separators=(",", ":")) + "\n"
+
+    def append(self, name: str, taken: datetime, path: str):
+        """Record a new snapshot file (path relative to the storage directory)."""
+        with open(self.path, "a") as f:
+            f.write(self._line(name, taken, path))
+
+    def rebuild(self, entries: Iterable[Tuple[str, datetime, str]]):
+        """Replace the whole index with (name, time, relative path) entries."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            for name, taken, path in entries:
+                f.write(self._line(name, taken, path))
+        os.replace(tmp_path, self.path)
+
+        self._reset()
+        self.refresh()
+
+    def names(self) -> List[str]:
+        """Return the names of all indexed backups."""
+        return [name for name, times in self._times.items() if times]
+
+    def snapshots(self, name: str) -> List[Tuple[datetime, str]]:
+        """Return the snapshots of name as (time, relative path), newest first."""
+        return list(zip(reversed(self._times.get(name, [])), reversed(self._paths.get(name, []))))
+
+    def find(self, name: str, taken: datetime) -> Optional[str]:
+        """Return the relative path of the snapshot of name taken at taken."""
+        times = self._times.get(name, [])
+        i = bisect_left(times, taken)
+        if i < len(times) and times[i] == taken:
+            return self._paths[name][i]
+        return None
+
+    def newest(self, name: str) -> Optional[Tuple[datetime, str]]:
+        """Return the newest snapshot of name as (time, relative path)."""
+        times = self._times.get(name)
+        if not times:
+            return None
+        return times[-1], self._paths[name][-1]
@@ -0,0 +1,80 @@
+"""
+Content-addressed object store for deduplicated txt snapshots.
+
+Every unique configuration body is stored once, under its SHA-256, in
+``<storage>/.router-backup/objects/<aa>/<digest><suffix>``. Each snapshot
+entry (``<hostname>_<stamp>.txt``) is a hardlink to its object, or, where
+hardlinks are not possible, a small ``.ref`` pointer file holding the
+object's path relative to the entry. Disk use then grows with the amount of
+change instead of with fleet size times runs.
+"""
+
+import os
+from pathlib import Path
+
+from router_backup.txt_compression import SnapshotCodec
+
+OBJECTS_DIR = "objects"
+POINTER_SUFFIX = ".ref"
+
+
+def read_snapshot(path: Path, codec: SnapshotCodec) -> str:
+    """Read a snapshot entry, following a pointer record if it is one."""
+    path = Path(path)
+    if path.name.endswith(POINTER_SUFFIX):
+        path = path.parent / path.read_text().strip()
+    return codec.read(path)
+
+
+class ObjectStore:
+    """Stores snapshot bodies once and links snapshot entries to them."""
+
+    def __init__(self, root: Path, codec: SnapshotCodec):
+        """
+        Args:
+            root: Directory holding the objects
+            codec: Codec the objects are compressed with
+        """
+        self.root = Path(root)
+        self.codec = codec
+
+    def object_path(self, digest: str) -> Path:
+        """Return the path of the object with the given SHA-256."""
+        return self.root / digest[:2] / f"{digest[2:]}{self.codec.suffix}"
+
+    def put(self, content: str, digest: str) -> Path:
+        """
+        Store content unless an object with its digest already exists.
+
+        Returns:
+            Path of the object
+        """
+        path = self.object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(self.codec.encode(content))
+            os.replace(tmp_path, path)
+        return path
+
+    def link(self, object_path: Path, entry: Path) -> Path:
+        """
+        Create a snapshot entry for an object: a hardlink, else a pointer record.
+
+        Returns:
+            Path of the entry that was created
+        """
+        try:
+            os.link(object_path, entry)
+            return entry
+        except FileExistsError:
+            # Same device and minute written twice: replace the entry
+            entry.unlink()
+            return self.link(object_path, entry)
+        except OSError:
+            pointer = entry.with_name(entry.name + POINTER_SUFFIX)
+            target = os.path.relpath(object_path, pointer.parent)
+            with open(pointer, "w") as f:
+                f.write(target + "\n")
+            return pointer
@@ -1,10 +1,27 @@
+import re
+
 from netmiko import ConnectHandler
-from .lib import write_backup
+from .lib import probe_change, record_unchanged, write_backup
+
+# netmiko device type and the command that pulls the running configuration.
+DEVICE_TYPE = "cisco_asa"
+CONFIG_COMMAND = "show run"
+
+# Cheap change probe: "show version" reports who last modified the running configuration, and when.
+PROBE_COMMAND = "show version | include Configuration last modified"
+PROBE_PATTERN = re.compile(r"Configuration last modified by (.+)")
+
+
+# Turns the probe output into the change stamp compared between runs.
+def parse_probe(output):
+    match = PROBE_PATTERN.search(output)
+    return match.group(1).strip() if match else None
+
 
 # Gives us the information we need to connect to Cisco devices.
 def backup(host, username, password, enable_secret):
     cisco_asa = {
-        "device_type": "cisco_asa",
+        "device_type": DEVICE_TYPE,
         "host": host,
         "username": username,
         "password": password,
@@ -20,12 +37,17 @@ def backup(host, username, password, enable_secret):
         hostname = net_connect.send_command("show conf | i hostname")
         hostname = hostname.split()
         hostname = hostname[1]
-    # Gets the running configuration.
-    output = net_connect.send_command("show run")
     # Creates the file name, which is the hostname, and the date and time.
     fileName = f"{hostname}"
-    # Creates the text file in the backup-config folder with the special name, and writes to it.
-    write_backup(fileName, output, host)
+    # Skips the full pull when the change probe matches the last backup.
+    unchanged, stamp = probe_change(net_connect, fileName, host, PROBE_COMMAND, parse_probe)
+    if unchanged:
+        record_unchanged(fileName, host)
+    else:
+        # Gets the running configuration.
+        output = net_connect.send_command(CONFIG_COMMAND)
+        # Creates the text file in the backup-config folder with the special name, and writes to it.
+        write_backup(fileName, output, host, stamp=stamp)
     # For the GUI
     global gui_filename_output
     gui_filename_output = fileName
@@ -0,0 +1,32 @@
+from netmiko import ConnectHandler
+from .lib import write_backup
+
+# netmiko device type and the command that pulls the running configuration.
+DEVICE_TYPE = "dell_os6"
+CONFIG_COMMAND = "show running-config"
+
+
+# Gives us the information we need to connect to Dell OS6 devices.
+def backup(host, username, password, enable_secret):
+    dell_os6 = {
+        "device_type": DEVICE_TYPE,
+        "host": host,
+        "username": username,
+        "password": password,
+        "secret": enable_secret,
+    }
+    # Creates the connection to the device.
+    net_connect = ConnectHandler(**dell_os6)
+    net_connect.enable()
+    hostname = net_connect.find_prompt().replace("#", "").replace(">", "")
+    if not hostname:
+        hostname = host
+    # Creates the file name, which is the hostname, and the date and time.
+    fileName = hostname
+    # Gets the running configuration.
+    output = net_connect.send_command(CONFIG_COMMAND)
+    # Creates the text file in the backup-config folder with the special name, and writes to it.
+    write_backup(fileName, output, host)
+    # For the GUI
+    global gui_filename_output
+    gui_filename_output = fileName
@@ -1,14 +1,32 @@
+import re
+
 from netmiko import ConnectHandler
-from .lib import write_backup
+from .lib import probe_change, record_unchanged, write_backup
+
+# netmiko device type and the command that pulls the running configuration.
+DEVICE_TYPE = "fortinet"
+CONFIG_COMMAND = "show"
+
+# Cheap change probe: FortiOS keeps a checksum of the whole configuration ("all:"),
+# which changes with every configuration revision, HA or not.
+PROBE_COMMAND = "diagnose sys ha checksum show"
+PROBE_PATTERN = re.compile(
+    r"^[ \t]*all:[ \t]*([0-9a-f]{2}(?: [0-9a-f]{2})*)[ \t\r]*$", re.MULTILINE
+)
+
+
+# Turns the probe output into the change stamp compared between runs.
+def parse_probe(output):
+    match = PROBE_PATTERN.search(output)
+    return match.group(1).replace(" ", "") if match else None
+
 
 # Gives us the information we need to connect to Fortinet devices.
 def backup(host, username, password):
-    fortinet = {"device_type": "fortinet", "host": host, "username": username, "password": password}
+    fortinet = {"device_type": DEVICE_TYPE, "host": host, "username": username, "password": password}
     # Creates the connection to the device.
     net_connect = ConnectHandler(**fortinet)
     net_connect.enable()
-    # Gets the running configuration.
-    output = net_connect.send_command("show")
 
     # Creates the file name, which is the hostname, and the date and time.
     hostname = net_connect.find_prompt().replace("#", "").replace(">", "")
@@ -17,8 +35,15 @@ def backup(host, username, password):
         fileName = host
     else:
         fileName = hostname
-    # Creates the text file in the backup-config folder with the special name, and writes to it.
-    write_backup(fileName, output, host)
+    # Skips the full pull when the change probe matches the last backup.
+    unchanged, stamp = probe_change(net_connect, fileName, host, PROBE_COMMAND, parse_probe)
+    if unchanged:
+        record_unchanged(fileName, host)
+    else:
+        # Gets the running configuration.
+        output = net_connect.send_command(CONFIG_COMMAND)
+        # Creates the text file in the backup-config folder with the special name, and writes to it.
+        write_backup(fileName, output, host, stamp=stamp)
     # For the GUI
     global gui_filename_output
     gui_filename_output = fileName
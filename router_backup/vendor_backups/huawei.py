@@ -1,10 +1,14 @@
 from netmiko import ConnectHandler
 from .lib import write_backup
 
+# netmiko device type and the command that pulls the running configuration.
+DEVICE_TYPE = "huawei"
+CONFIG_COMMAND = "dis current-configuration"
+
 # Gives us the information we need to connect to Huawei devices.
 def backup(host, username, password):
     huawei = {
-        "device_type": "huawei",
+        "device_type": DEVICE_TYPE,
         "host": host,
         "username": username,
         "password": password,
@@ -13,7 +17,7 @@ def backup(host, username, password):
     net_connect = ConnectHandler(**huawei)
     net_connect.enable()
     # Gets the running configuration.
-    output = net_connect.send_command("dis current-configuration")
+    output = net_connect.send_command(CONFIG_COMMAND)
     # Gets and splits the hostname for the output file name.
     hostname = net_connect.find_prompt().replace("#", "").replace(">", "")
     if not hostname:
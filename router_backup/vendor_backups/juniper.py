@@ -1,6 +1,20 @@
 from netmiko import ConnectHandler
 from datetime import datetime
-from .lib import write_backup
+from .lib import parse_commit_history, probe_change, record_unchanged, write_backup
+
+# netmiko device type and the command that pulls the running configuration.
+DEVICE_TYPE = "juniper"
+CONFIG_COMMAND = "show conf | display set"
+
+# Cheap change probe: the newest entry (0) of the commit history.
+PROBE_COMMAND = "show system commit"
+
+# SNMP pre-pass: jnxCmCfgChgLatestTime, sysUpTime of the last commit.
+SNMP_CHANGE_OID = "1.3.6.1.4.1.2636.3.18.1.2.0"
+
+# Turns the probe output into the change stamp compared between runs.
+parse_probe = parse_commit_history
+
 
 # Gives us the information we need to connect to Juniper devices.
 def backup(
@@ -9,7 +23,7 @@ def backup(
     password,
 ):
     juniper = {
-        "device_type": "juniper",
+        "device_type": DEVICE_TYPE,
         "host": host,
         "username": username,
         "password": password,
@@ -17,8 +31,6 @@ def backup(
     # Creates the connection to the device.
     net_connect = ConnectHandler(**juniper)
     net_connect.enable()
-    # Gets the running configuration.
-    output = net_connect.send_command("show conf | display set")
     # Gets and splits the hostname for the output file name.
     hostname = net_connect.find_prompt().replace("#", "").replace(">", "")
     if not hostname:
@@ -27,8 +39,15 @@ def backup(
         hostname = hostname[2]
     # Creates the file name, which is the hostname, and the date and time.
     fileName = hostname
-    # Creates the text file in the backup-config folder with the special name, and writes to it.
-    write_backup(fileName, output, host)
+    # Skips the full pull when the change probe matches the last backup.
+    unchanged, stamp = probe_change(net_connect, fileName, host, PROBE_COMMAND, parse_probe)
+    if unchanged:
+        record_unchanged(fileName, host)
+    else:
+        # Gets the running configuration.
+        output = net_connect.send_command(CONFIG_COMMAND)
+        # Creates the text file in the backup-config folder with the special name, and writes to it.
+        write_backup(fileName, output, host, stamp=stamp)
     # For the GUI
     global gui_filename_output
     gui_filename_output = fileName
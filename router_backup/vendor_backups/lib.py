@@ -1,8 +1,69 @@
 """Library functions for vendor backup modules."""
 
-from typing import Optional
-from router_backup.storage import get_global_storage, write_backup
+import re
+from typing import Callable, Optional, Tuple
+
+from loguru import logger
+
+from router_backup.storage import (
+    change_probes_enabled,
+    get_change_stamp,
+    get_global_storage,
+    record_unchanged,
+    write_backup,
+)
 
 
 # Re-export write_backup for backward compatibility
-__all__ = ["write_backup"]
+__all__ = ["write_backup", "probe_change", "record_unchanged", "parse_commit_history"]
+
+# Newest entry (0) of a "show system commit" listing
+COMMIT_HISTORY_PATTERN = re.compile(r"^\s*0\s+(.+?)\s*$", re.MULTILINE)
+
+
+def parse_commit_history(output: str) -> Optional[str]:
+    """
+    Return the newest commit of a "show system commit" listing (Junos, VyOS).
+
+    Used as the change probe parser of both vendor modules.
+    """
+    match = COMMIT_HISTORY_PATTERN.search(output)
+    return match.group(1) if match else None
+
+
+def probe_change(
+    net_connect,
+    filename: str,
+    host: str,
+    command: str,
+    parse: Callable[[str], Optional[str]],
+) -> Tuple[bool, Optional[str]]:
+    """
+    Run a vendor's change probe and compare it with the stored change stamp.
+
+    Nothing is sent to the device when change probes are off. A probe that
+    fails or that the parser cannot read falls back to a full fetch.
+
+    Args:
+        net_connect: Open netmiko connection
+        filename: Backup filename of the device
+        host: Device IP address (for logging)
+        command: Probe command of the vendor module (PROBE_COMMAND)
+        parse: Turns the probe output into a stamp (parse_probe), None if unknown
+
+    Returns:
+        (unchanged, stamp): unchanged is True when the stamp matches the one
+        stored with the last backup, so the full fetch can be skipped; stamp
+        is passed to write_backup() otherwise
+    """
+    if not change_probes_enabled():
+        return False, None
+    try:
+        stamp = parse(net_connect.send_command(command))
+    except Exception as e:
+        logger.warning(f"Change probe of {host} failed, pulling the full config: {e}")
+        return False, None
+    if stamp is None:
+        logger.debug(f"No change stamp in the probe output of {host}")
+        return False, None
+    return stamp == get_change_stamp(filename), stamp
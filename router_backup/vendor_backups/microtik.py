@@ -1,10 +1,14 @@
 from netmiko import ConnectHandler
 from .lib import write_backup
 
+# netmiko device type and the command that pulls the running configuration.
+DEVICE_TYPE = "mikrotik_routeros"
+CONFIG_COMMAND = "export"
+
 # Gives us the information we need to connect to MicroTik devices.
 def backup(host, username, password):
     microtik = {
-        "device_type": "mikrotik_routeros",
+        "device_type": DEVICE_TYPE,
         "host": host,
         "username": username,
         "password": password,
@@ -12,7 +16,7 @@ def backup(host, username, password):
     # Creates the connection to the device.
     net_connect = ConnectHandler(**microtik)
     # Gets the running configuration.
-    output = net_connect.send_command_timing("export", delay_factor=40)
+    output = net_connect.send_command_timing(CONFIG_COMMAND, delay_factor=40)
     # Gets and splits the hostname for the output file name.
     hostname = net_connect.find_prompt().replace("#", "").replace(">", "")
     if not hostname:
@@ -1,10 +1,21 @@
 from netmiko import ConnectHandler
-from .lib import write_backup
+from .lib import parse_commit_history, probe_change, record_unchanged, write_backup
+
+# netmiko device type and the command that pulls the running configuration.
+DEVICE_TYPE = "vyos"
+CONFIG_COMMAND = "show conf comm"
+
+# Cheap change probe: the newest entry (0) of the commit history.
+PROBE_COMMAND = "show system commit"
+
+# Turns the probe output into the change stamp compared between runs.
+parse_probe = parse_commit_history
+
 
 # Gives us the information we need to connect to VyOS devices.
 def backup(host, username, password):
     vyos = {
-        "device_type": "vyos",
+        "device_type": DEVICE_TYPE,
         "host": host,
         "username": username,
         "password": password,
@@ -12,8 +23,6 @@ def backup(host, username, password):
     # Creates the connection to the device.
     net_connect = ConnectHandler(**vyos)
     net_connect.enable()
-    # Gets the running configuration.
-    output = net_connect.send_command("show conf comm")
     # Gets and splits the hostname for the output file name.
     hostname = net_connect.find_prompt().replace("#", "").replace(">", "")
     if not hostname:
@@ -22,7 +31,14 @@ def backup(host, username, password):
         hostname = hostname[0]
     # Creates the file name, which is the hostname, and the date and time.
     fileName = hostname
-    write_backup(fileName, output, host)
+    # Skips the full pull when the change probe matches the last backup.
+    unchanged, stamp = probe_change(net_connect, fileName, host, PROBE_COMMAND, parse_probe)
+    if unchanged:
+        record_unchanged(fileName, host)
+    else:
+        # Gets the running configuration.
+        output = net_connect.send_command(CONFIG_COMMAND)
+        write_backup(fileName, output, host, stamp=stamp)
     # For the GUI
     global gui_filename_output
     gui_filename_output = fileName
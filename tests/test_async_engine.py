@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio collection engine, against a scripted shell.
+"""
+
+import asyncio
+import unittest
+
+from router_backup.async_engine import AsyncSession
+
+
+class FakeShell:
+    """Interactive FortiOS-like shell: echoes commands and answers with a prompt."""
+
+    def __init__(self, hostname: str, vdoms: bool = False):
+        self.hostname = hostname
+        self.vdoms = vdoms
+        self.sent = []
+        self.scopes = []
+        self.stdin = self
+        self.stdout = self
+        self._buffer = ""
+
+    @property
+    def prompt(self) -> str:
+        scope = f" ({self.scopes[-1]})" if self.scopes else ""
+        return f"{self.hostname}{scope} # "
+
+    def write(self, data: str):
+        command = data.rstrip("\n")
+        self.sent.append(command)
+        output = ""
+        if command.startswith("get system status"):
+            mode = "multiple" if self.vdoms else "disable"
+            output = f"Virtual domain configuration: {mode}\n"
+        elif command.startswith("config "):
+            self.scopes.append(command.split()[-1])
+        elif command == "end":
+            self.scopes.pop()
+        self._buffer += f"{command}\r\n{output}{self.prompt}"
+
+    async def read(self, size: int) -> str:
+        data, self._buffer = self._buffer, ""
+        return data
+
+
+class TestAsyncSession(unittest.TestCase):
+    """Test the per-platform session preparation"""
+
+    def prepare(self, device_type: str, shell: FakeShell) -> list:
+        session = AsyncSession("10.0.0.1", "admin", "secret", device_type)
+        session._process = shell
+        session.prompt = shell.prompt.strip()
+        asyncio.run(session.prepare())
+        self.assertEqual(shell.scopes, [])
+        return shell.sent
+
+    def test_fortinet_output_standard(self):
+        """Test that FortiOS paging is turned off through the console settings"""
+        self.assertEqual(
+            self.prepare("fortinet", FakeShell("FGT1")),
+            [
+                "get system status | grep Virtual",
+                "config system console",
+                "set output standard",
+                "end",
+            ],
+        )
+
+    def test_fortinet_vdoms_use_global_scope(self):
+        """Test that with VDOMs the console settings are changed in the global scope"""
+        self.assertEqual(
+            self.prepare("fortinet", FakeShell("FGT1", vdoms=True)),
+            [
+                "get system status | grep Virtual",
+                "config global",
+                "config system console",
+                "set output standard",
+                "end",
+                "end",
+            ],
+        )
+
+    def test_paging_command(self):
+        """Test that platforms with a paging command only send that"""
+        self.assertEqual(self.prepare("cisco_ios", FakeShell("rtr1")), ["terminal length 0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for loading the router-backup configuration.
+"""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from router_backup.config import Config
+
+
+class TestBooleanSettings(unittest.TestCase):
+    """Test that boolean settings are parsed explicitly"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="rb_config_")
+        self.config_file = Path(self.test_dir) / "config.yaml"
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def load(self, text: str) -> Config:
+        self.config_file.write_text(text)
+        return Config.from_file(str(self.config_file))
+
+    def test_quoted_false(self):
+        """Test that quoted false values turn the toggles off"""
+        config = self.load('change_probes: "false"\nsnmp_prepass: "no"\nskip_unchanged: "off"\n')
+        self.assertFalse(config.change_probes)
+        self.assertFalse(config.snmp_prepass)
+        self.assertFalse(config.skip_unchanged)
+
+    def test_true_spellings(self):
+        """Test YAML booleans and the accepted true spellings"""
+        config = self.load('change_probes: true\nsnmp_prepass: "Yes"\ntxt_dedup: "1"\n')
+        self.assertTrue(config.change_probes)
+        self.assertTrue(config.snmp_prepass)
+        self.assertTrue(config.txt_dedup)
+
+        config = Config.from_dict({"change_probes": "TRUE", "prune_on_run": 0})
+        self.assertTrue(config.change_probes)
+        self.assertFalse(config.prune_on_run)
+
+    def test_defaults(self):
+        """Test that unset toggles keep their defaults"""
+        config = self.load("storage_model: git\n")
+        self.assertFalse(config.change_probes)
+        self.assertTrue(config.skip_unchanged)
+
+    def test_invalid_value_rejected(self):
+        """Test that values that are not booleans are rejected"""
+        with self.assertRaises(ValueError) as context:
+            self.load('snmp_prepass: "sometimes"\n')
+        self.assertIn("snmp_prepass", str(context.exception))
+        with self.assertRaises(ValueError):
+            Config.from_dict({"change_probes": 2})
+
+
+if __name__ == "__main__":
+    unittest.main()
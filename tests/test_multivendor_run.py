@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Tests for the backup runs of multivendor_run.py, with stub vendor drivers.
+"""
+
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from router_backup import multivendor_run
+from router_backup.config import Config
+from router_backup.run_journal import RunJournal
+from router_backup.storage import STATE_DIR, write_backup
+
+
+def stub_driver(calls: list, fail: set = frozenset()):
+    """Vendor module stand-in that stores '<ip> config' as host-<ip>."""
+
+    def backup(ip, username, password, secret=None):
+        calls.append(ip)
+        if ip in fail:
+            raise ConnectionError(f"{ip} refused the login")
+        write_backup(f"host-{ip}", f"{ip} config\n", ip)
+
+    return types.SimpleNamespace(backup=backup)
+
+
+class TestRuns(unittest.TestCase):
+    """Test journaled runs, resume and retry"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="rb_run_")
+        self.config = Config(
+            device_file=str(Path(self.test_dir) / "devices.csv"),
+            storage=str(Path(self.test_dir) / "storage"),
+            reachability="none",
+        )
+        self.state_dir = Path(self.config.storage) / STATE_DIR
+        self.calls = []
+        self.fail = set()
+        driver = stub_driver(self.calls, self.fail)
+        # Two drivers are enough to exercise the per-driver loop of 'all'
+        patcher = mock.patch.dict(
+            multivendor_run.VENDOR_MAP, {"1": (driver, False), "3": (driver, False)}, clear=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        multivendor_run._config = self.config
+
+    def tearDown(self):
+        multivendor_run._config = None
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def device(self, ip, vendor=None):
+        return {
+            "ip": ip,
+            "username": "admin",
+            "password": "secret",
+            "secret": None,
+            "vendor": vendor,
+            "site": None,
+        }
+
+    def test_resume_skips_stored_devices(self):
+        """Test that a resumed run only collects its devices not yet stored"""
+        journal = RunJournal(self.state_dir, "1")
+        journal.start(["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        journal.record_stored("10.0.0.1", "host-10.0.0.1", "written")
+        previous = journal.load()
+
+        multivendor_run.init_storage(self.config)
+        jobs = [(self.device(f"10.0.0.{i}"), "1") for i in range(1, 5)]
+        results = multivendor_run._run_jobs(jobs, self.config, journal=journal, previous=previous)
+
+        self.assertEqual(sorted(self.calls), ["10.0.0.2", "10.0.0.3"])
+        self.assertEqual(results["resumed"], 1)
+        self.assertEqual(results["success"], 3)
+        self.assertEqual(set(journal.load().stored), {"10.0.0.1", "10.0.0.2", "10.0.0.3"})
+
+    def test_all_journals_one_run_and_retry_appends(self):
+        """Test that 'all' is one journaled run across drivers, continued by retry"""
+        Path(self.config.device_file).write_text(
+            "ip,username,password,vendor\n"
+            "10.0.0.1,admin,secret,cisco_ios\n"
+            "10.0.0.2,admin,secret,\n"
+            "10.0.0.3,admin,secret,juniper\n"
+        )
+        self.fail.update({"10.0.0.2", "10.0.0.3"})
+        results = multivendor_run.run_inventory(self.config)
+        self.assertEqual(results["tagged"]["success"], 1)
+        self.assertEqual(sorted(self.calls), ["10.0.0.1", "10.0.0.2", "10.0.0.2", "10.0.0.3"])
+
+        journals = list((self.state_dir / "journal").glob("*.jsonl"))
+        self.assertEqual([path.name for path in journals], ["all.jsonl"])
+        run = RunJournal(self.state_dir, "all").load()
+        self.assertTrue(run.finished)
+        self.assertEqual(set(run.retry_targets()), {"10.0.0.2", "10.0.0.3"})
+
+        self.fail.discard("10.0.0.2")
+        self.calls.clear()
+        multivendor_run.retry(failed=True)
+        # The untagged device is tried with every driver again
+        self.assertEqual(sorted(self.calls), ["10.0.0.2", "10.0.0.2", "10.0.0.3"])
+
+        run = RunJournal(self.state_dir, "all").load()
+        self.assertTrue(run.finished)
+        self.assertEqual(run.retries, 1)
+        self.assertEqual(run.outcomes["10.0.0.1"]["outcome"], "success")
+        self.assertEqual(run.outcomes["10.0.0.2"]["outcome"], "success")
+        self.assertEqual(run.retry_targets(), {"10.0.0.3": "3"})
+
+    def test_all_sweeps_and_resumes_once(self):
+        """Test that 'all' sweeps once, opens one storage and counts resumed devices once"""
+        Path(self.config.device_file).write_text(
+            "ip,username,password,vendor\n"
+            "10.0.0.1,admin,secret,cisco_ios\n"
+            "10.0.0.2,admin,secret,\n"
+            "10.0.0.3,admin,secret,\n"
+            "10.0.0.4,admin,secret,\n"
+        )
+        interrupted = RunJournal(self.state_dir, "all")
+        interrupted.start(["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"])
+        interrupted.record_stored("10.0.0.2", "host-10.0.0.2", "written")
+
+        def sweep(hosts, method, port):
+            return {host: None if host == "10.0.0.4" else 0.0 for host in hosts}
+
+        init_storage = multivendor_run.init_storage
+        with mock.patch.object(multivendor_run, "sweep", side_effect=sweep) as swept:
+            with mock.patch.object(multivendor_run, "init_storage", wraps=init_storage) as opened:
+                results = multivendor_run.run_inventory(self.config, resume=True)
+
+        self.assertEqual((swept.call_count, opened.call_count), (1, 1))
+        # Only 10.0.0.3 is tried with both drivers
+        self.assertEqual(sorted(self.calls), ["10.0.0.1", "10.0.0.3", "10.0.0.3"])
+        self.assertEqual((results["resumed"], results["down"]), (1, 1))
+        run = RunJournal(self.state_dir, "all").load()
+        self.assertEqual(run.outcomes["10.0.0.4"]["outcome"], "down")
+        self.assertEqual(set(run.stored), {"10.0.0.1", "10.0.0.2", "10.0.0.3"})
+
+    def test_async_engine_concurrency(self):
+        """Test that the async engine is not bound by the thread pool's concurrency"""
+        multivendor_run.init_storage(self.config)
+        jobs = [(self.device("10.0.0.1"), "1")]
+        self.config.engine = "async"
+        with mock.patch(
+            "router_backup.async_engine.run_backups", return_value={"10.0.0.1": "success"}
+        ) as run_backups:
+            multivendor_run._run_jobs(jobs, self.config)
+            self.assertEqual(run_backups.call_args.kwargs["concurrency"], 100)
+
+            self.config.async_concurrency = 20
+            multivendor_run._run_jobs(jobs, self.config)
+            self.assertEqual(run_backups.call_args.kwargs["concurrency"], 20)
+
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text("engine: async\nasync_concurrency: 300\n")
+        config = multivendor_run.load_config(str(config_file))
+        self.assertEqual(multivendor_run._workers(config), 300)
+        config = multivendor_run.load_config(str(config_file), workers=50)
+        self.assertEqual((config.concurrency, multivendor_run._workers(config)), (50, 50))
+
+    @unittest.skipUnless(
+        multiprocessing.get_context().get_start_method() == "fork",
+        "the stub drivers only reach forked worker processes",
+    )
+    def test_sharded_run_stores_in_parent(self):
+        """Test that shards collected in worker processes are stored and journaled"""
+        self.config.processes = 2
+        self.fail.add("10.0.0.3")
+        journal = RunJournal(self.state_dir, "1")
+        jobs = [(self.device(f"10.0.0.{i}"), "1") for i in range(1, 6)]
+        journal.start([device["ip"] for device, _ in jobs])
+
+        multivendor_run.init_storage(self.config)
+        results = multivendor_run._run_jobs(jobs, self.config, journal=journal)
+
+        self.assertEqual((results["success"], results["failed"]), (4, 1))
+        snapshots = Path(self.config.storage).glob("host-*")
+        stored = sorted(path.name.split("_")[0] for path in snapshots)
+        self.assertEqual(stored, [f"host-10.0.0.{i}" for i in (1, 2, 4, 5)])
+        run = journal.load()
+        self.assertEqual(set(run.stored), {"10.0.0.1", "10.0.0.2", "10.0.0.4", "10.0.0.5"})
+        self.assertEqual(run.outcomes["10.0.0.3"]["outcome"], "failed")
+
+
+class TestCollect(unittest.TestCase):
+    """Test the bounded thread pool collecting reachable devices"""
+
+    def setUp(self):
+        self.calls = []
+        self.first_done = threading.Event()
+
+        def backup(ip, username, password, secret=None):
+            self.calls.append(ip)
+            if ip == "10.0.0.1":
+                # Only finishes once another device's outcome was reported
+                if not self.first_done.wait(5):
+                    raise TimeoutError(f"{ip} was collected alone")
+            elif ip == "10.0.0.3":
+                raise ConnectionError(f"{ip} refused the login")
+
+        patcher = mock.patch.dict(
+            multivendor_run.VENDOR_MAP,
+            {"1": (types.SimpleNamespace(backup=backup), False)},
+            clear=True,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.jobs = [
+            ({"ip": f"10.0.0.{i}", "username": "admin", "password": "secret", "secret": None}, "1")
+            for i in range(1, 5)
+        ]
+
+    def test_outcomes_in_completion_order(self):
+        """Test that outcomes are reported as devices finish, failures isolated"""
+        reported = []
+
+        def on_result(ip, outcome):
+            reported.append((ip, outcome))
+            self.first_done.set()
+
+        outcomes = multivendor_run._collect(self.jobs, "netmiko", 4, on_result=on_result)
+
+        self.assertEqual(outcomes, reported)
+        self.assertEqual(
+            dict(outcomes),
+            {
+                "10.0.0.1": "success",
+                "10.0.0.2": "success",
+                "10.0.0.3": "failed",
+                "10.0.0.4": "success",
+            },
+        )
+        # 10.0.0.1 started first but finished after devices collected alongside it
+        self.assertNotEqual(outcomes[0][0], "10.0.0.1")
+
+    def test_single_worker_is_serial(self):
+        """Test that a concurrency of 1 collects devices one at a time, in order"""
+        self.first_done.set()
+        outcomes = multivendor_run._collect(self.jobs, "netmiko", 1)
+
+        self.assertEqual(self.calls, ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"])
+        self.assertEqual(
+            outcomes,
+            [
+                ("10.0.0.1", "success"),
+                ("10.0.0.2", "success"),
+                ("10.0.0.3", "failed"),
+                ("10.0.0.4", "success"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
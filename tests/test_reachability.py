@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the concurrent reachability sweep.
+"""
+
+import socket
+import threading
+import unittest
+from unittest import mock
+
+from router_backup import reachability
+
+
+class TestReachability(unittest.TestCase):
+    """Test the ICMP and TCP sweeps against the loopback interface"""
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(16)
+        self.port = self.listener.getsockname()[1]
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_tcp_sweep(self):
+        """Test that only hosts accepting the connection are reported up"""
+        # The listener is bound to 127.0.0.1 only, so 127.0.0.2 refuses
+        rtts = reachability.sweep(
+            ["127.0.0.1", "127.0.0.2", "127.0.0.1"], method="tcp", port=self.port, timeout=2
+        )
+
+        self.assertEqual(list(rtts), ["127.0.0.1", "127.0.0.2"])
+        self.assertIsNotNone(rtts["127.0.0.1"])
+        self.assertIsNone(rtts["127.0.0.2"])
+
+    def test_icmp_probes_run_concurrently(self):
+        """Test that every ping is in flight at once instead of one after another"""
+        hosts = [f"127.0.0.{i}" for i in range(1, 9)]
+        barrier = threading.Barrier(len(hosts), timeout=5)
+
+        def ping(host, timeout):
+            barrier.wait()
+            return None if host == "127.0.0.8" else 0.001
+
+        with mock.patch.object(reachability, "ping", ping):
+            rtts = reachability.sweep(hosts, method="icmp")
+
+        self.assertEqual([host for host, rtt in rtts.items() if rtt is None], ["127.0.0.8"])
+
+    def test_none_and_unknown_methods(self):
+        """Test that 'none' reports every host up and unknown methods are rejected"""
+        self.assertEqual(
+            reachability.sweep(["10.0.0.1", "10.0.0.2"], method="none"),
+            {"10.0.0.1": 0.0, "10.0.0.2": 0.0},
+        )
+        with self.assertRaises(ValueError):
+            reachability.sweep(["10.0.0.1"], method="arp")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for the run journal.
+"""
+
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from router_backup.run_journal import RunJournal, latest_run
+
+
+class TestRunJournal(unittest.TestCase):
+    """Test journaling, reading back and retrying runs"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="rb_journal_")
+        self.state_dir = Path(self.test_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_load(self):
+        """Test that a run reads back with its stored devices and outcomes"""
+        journal = RunJournal(self.state_dir, "all")
+        self.assertIsNone(journal.load())
+
+        run = journal.start(["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        journal.record_stored("10.0.0.1", "core-rtr1", "written")
+        journal.record_outcome("10.0.0.1", "success", "1")
+        journal.record_outcome("10.0.0.2", "down", "3")
+        # A kill in the middle of a write leaves a partial line
+        with open(journal.path, "a") as f:
+            f.write('{"event": "outcome", "ip": "10.0.0.3"')
+
+        state = journal.load()
+        self.assertEqual(state.run, run)
+        self.assertEqual(state.command, "all")
+        self.assertEqual(state.devices, ["10.0.0.1", "10.0.0.2", "10.0.0.3"])
+        self.assertFalse(state.finished)
+        self.assertEqual(state.stored["10.0.0.1"]["file"], "core-rtr1")
+        self.assertEqual(set(state.outcomes), {"10.0.0.1", "10.0.0.2"})
+
+        journal.start(["10.0.0.4"])
+        journal.finish({"success": 0, "files": []})
+        state = journal.load()
+        self.assertEqual(state.devices, ["10.0.0.4"])
+        self.assertEqual(state.outcomes, {})
+        self.assertTrue(state.finished)
+
+    def test_retry_targets(self):
+        """Test that failed and down devices are retried, and a success is final"""
+        journal = RunJournal(self.state_dir, "all")
+        journal.start(["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"])
+        journal.record_outcome("10.0.0.1", "success", "1")
+        journal.record_outcome("10.0.0.2", "failed", "2")
+        journal.record_outcome("10.0.0.3", "down", "3")
+        # Tried with every driver: one success among failures
+        journal.record_outcome("10.0.0.4", "failed", "1")
+        journal.record_outcome("10.0.0.4", "success", "2")
+        journal.record_outcome("10.0.0.4", "failed", "3")
+        journal.finish({"success": 2})
+
+        state = journal.load()
+        self.assertEqual(state.retry_targets(), {"10.0.0.2": "2", "10.0.0.3": "3"})
+
+        # A retry appends to the run, keeping what the run recorded
+        journal.retry(["10.0.0.2", "10.0.0.3"])
+        journal.record_outcome("10.0.0.2", "success", "2")
+        state = journal.load()
+        self.assertFalse(state.finished)
+        self.assertEqual(state.retries, 1)
+        self.assertEqual(state.devices, ["10.0.0.2", "10.0.0.3"])
+        self.assertEqual(state.outcomes["10.0.0.1"]["outcome"], "success")
+        self.assertEqual(state.retry_targets(), {"10.0.0.3": "3"})
+
+        journal.finish({"success": 1})
+        self.assertTrue(journal.load().finished)
+
+    def test_latest_run(self):
+        """Test that the most recently started run of any command is found"""
+        self.assertIsNone(latest_run(self.state_dir))
+        RunJournal(self.state_dir, "all").start(["10.0.0.1"])
+        time.sleep(0.01)
+        RunJournal(self.state_dir, "3").start(["10.0.0.2"])
+        self.assertEqual(latest_run(self.state_dir).command, "3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the cron schedules and the backup daemon.
+"""
+
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from router_backup.scheduler import BackupDaemon, CronSchedule, Schedule, read_status
+
+
+class TestCronSchedule(unittest.TestCase):
+    """Test cron expression parsing and next run computation"""
+
+    def test_next_after(self):
+        """Test next runs of common expressions"""
+        saturday = datetime(2025, 2, 15, 10, 7, 30)
+        cases = {
+            "*/15 * * * *": datetime(2025, 2, 15, 10, 15),
+            "0 2 * * 1-5": datetime(2025, 2, 17, 2, 0),
+            "30 4 1 * 0": datetime(2025, 2, 16, 4, 30),  # day of month OR Sunday
+            "0 0 29 2 *": datetime(2028, 2, 29, 0, 0),
+        }
+        for expression, expected in cases.items():
+            self.assertEqual(CronSchedule(expression).next_after(saturday), expected, expression)
+
+    def test_invalid_expressions(self):
+        """Test that malformed expressions are rejected"""
+        for expression in ("* * * *", "60 * * * *", "*/0 * * * *", "a * * * *"):
+            with self.assertRaises(ValueError, msg=expression):
+                CronSchedule(expression)
+
+
+class TestBackupDaemon(unittest.TestCase):
+    """Test trigger coalescing and the status socket"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="rb_daemon_")
+        self.release = threading.Event()
+        self.batches = []
+        devices = [
+            ({"ip": "10.0.0.1", "site": "dc1"}, "1"),
+            ({"ip": "10.0.0.2", "site": "dc2"}, "1"),
+            ({"ip": "10.0.0.3", "site": "dc1"}, "3"),
+        ]
+
+        def run_batch(jobs, name):
+            self.batches.append((name, sorted(device["ip"] for device, _ in jobs)))
+            self.release.wait(5)
+            return {"success": len(jobs), "failed": 0, "down": 0}
+
+        self.dc1 = Schedule.from_config(
+            {"name": "dc1", "cron": "0 0 1 1 *", "site": "dc1"}, lambda name: name
+        )
+        self.ios = Schedule.from_config(
+            {"name": "ios", "cron": "0 0 1 1 *", "vendor": "1"}, lambda name: name
+        )
+        self.socket_path = Path(self.test_dir) / "daemon.sock"
+        self.daemon = BackupDaemon(
+            [self.dc1, self.ios], lambda: devices, run_batch, self.socket_path
+        )
+        self.thread = threading.Thread(target=self.daemon.run)
+        self.thread.start()
+        for _ in range(100):
+            if self.socket_path.exists():
+                break
+            time.sleep(0.05)
+
+    def tearDown(self):
+        self.release.set()
+        self.daemon.stop()
+        self.thread.join(5)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def wait_until(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def test_overlapping_triggers_coalesce(self):
+        """Test that devices already running or queued are not queued again"""
+        self.assertEqual(self.daemon.trigger(self.dc1), 2)
+        self.wait_until(lambda: self.batches)
+
+        # 10.0.0.1 is running; only 10.0.0.2 is new
+        self.assertEqual(self.daemon.trigger(self.ios), 1)
+        self.assertEqual(self.daemon.trigger(self.ios), 0)
+
+        status = read_status(self.socket_path)
+        self.assertEqual(status["running"], ["10.0.0.1", "10.0.0.3"])
+        self.assertEqual(status["queued"], ["10.0.0.2"])
+        self.assertEqual(status["coalesced"], 3)
+
+        self.release.set()
+        self.wait_until(lambda: len(self.batches) == 2)
+        self.assertEqual(
+            self.batches, [("dc1", ["10.0.0.1", "10.0.0.3"]), ("ios", ["10.0.0.2"])]
+        )
+        self.wait_until(lambda: read_status(self.socket_path)["last_batch"]["name"] == "ios")
+        self.assertEqual(read_status(self.socket_path)["last_batch"]["results"]["success"], 1)
+
+    def test_stop_request_while_locked(self):
+        """Test that a stop requested while the lock is held (a signal handler) ends run()"""
+        with self.daemon._lock:
+            # stop() would wait for the lock forever here
+            self.daemon.request_stop()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+        self.assertFalse(self.socket_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the SNMP pre-pass against a local SNMP agent stand-in.
+"""
+
+import socket
+import threading
+import unittest
+
+from router_backup.snmp_poll import (
+    TAG_GET_REQUEST,
+    TAG_GET_RESPONSE,
+    TAG_TIMETICKS,
+    encode_message,
+    parse_message,
+    snmp_sweep,
+)
+
+CCM_RUNNING_LAST_CHANGED = "1.3.6.1.4.1.9.9.43.1.1.1.0"
+
+
+class FakeAgent:
+    """SNMPv2c agent answering GETs from a dict of OID -> (tag, value)."""
+
+    def __init__(self, values: dict, community: str = "public"):
+        self.values = values
+        self.community = community
+        self.requests = 0
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            community, pdu_type, request_id, varbinds = parse_message(data)
+            if pdu_type != TAG_GET_REQUEST or community != self.community:
+                continue
+            self.requests += 1
+            answer = [(oid, self.values.get(oid, (0x80, 0))) for oid, _ in varbinds]
+            self.sock.sendto(encode_message(community, TAG_GET_RESPONSE, request_id, answer), addr)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+class TestSnmpSweep(unittest.TestCase):
+    """Test the SNMP pre-pass sweep"""
+
+    def test_message_round_trip(self):
+        """Test that a GetResponse decodes to what was encoded"""
+        varbinds = [(CCM_RUNNING_LAST_CHANGED, (TAG_TIMETICKS, 2**31))]
+        data = encode_message("private", TAG_GET_RESPONSE, 1234567, varbinds)
+        self.assertEqual(
+            parse_message(data),
+            ("private", TAG_GET_RESPONSE, 1234567, [(CCM_RUNNING_LAST_CHANGED, 2**31)]),
+        )
+
+    def test_sweep_reads_change_stamp(self):
+        """Test that the sweep reads the stamp and reports unanswered polls as None"""
+        values = {CCM_RUNNING_LAST_CHANGED: (TAG_TIMETICKS, 8675309)}
+        with FakeAgent(values) as agent:
+            stamps = snmp_sweep({"127.0.0.1": CCM_RUNNING_LAST_CHANGED}, port=agent.port)
+            self.assertEqual(stamps, {"127.0.0.1": "8675309"})
+
+            # OID the agent does not have
+            stamps = snmp_sweep({"127.0.0.1": "1.3.6.1.2.1.1.3.0"}, port=agent.port)
+            self.assertEqual(stamps, {"127.0.0.1": None})
+
+            # Wrong community: the agent stays silent, every attempt times out
+            stamps = snmp_sweep(
+                {"127.0.0.1": CCM_RUNNING_LAST_CHANGED},
+                community="wrong",
+                port=agent.port,
+                timeout=0.2,
+                retries=1,
+            )
+            self.assertEqual(stamps, {"127.0.0.1": None})
+            self.assertEqual(agent.requests, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,12 +11,15 @@ This script tests both storage implementations with:
 - File content verification
 """
 
+import json
 import os
 import re
 import shutil
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
 
@@ -235,6 +238,106 @@ class TestStorageGit(unittest.TestCase):
         with open(file_path) as f:
             self.assertEqual(f.read(), "Nested content")
 
+    def test_versions_after_external_commit(self):
+        """Test that the history index catches up with commits made outside storage_git"""
+        self.run_command(["init", "-p", str(self.repo_path)])
+        self.run_command(["write", "-p", str(self.repo_path), "test.txt", "-c", "Version 1"])
+
+        (self.repo_path / "test.txt").write_text("Version 2")
+        subprocess.run(
+            ["git", "-C", str(self.repo_path), "commit", "-qam", "External commit"],
+            check=True,
+        )
+
+        result = self.run_command(["versions", "-p", str(self.repo_path), "test.txt"])
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(len(extract_commit_hashes(result.stdout)), 2)
+        self.assertIn("External commit", result.stdout)
+
+    def test_reindex(self):
+        """Test rebuilding the per-file history index"""
+        self.run_command(["init", "-p", str(self.repo_path)])
+        for i in range(3):
+            self.run_command(
+                ["update", "-p", str(self.repo_path), "test.txt", "-c", f"Version {i}"]
+            )
+
+        index_file = self.repo_path / ".git" / "router-backup" / "history.jsonl"
+        index_file.unlink()
+
+        result = self.run_command(["reindex", "-p", str(self.repo_path)])
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("Indexed 3 commits", result.stdout)
+        self.assertTrue(index_file.exists())
+
+        result = self.run_command(["versions", "-p", str(self.repo_path), "test.txt"])
+        self.assertEqual(len(extract_commit_hashes(result.stdout)), 3)
+
+    def test_iter_diff_streams(self):
+        """Test that diff lines are read while git diff is still writing"""
+        from router_backup.storage_git import StorageGit
+
+        storage = StorageGit(str(self.repo_path))
+        storage.init()
+        storage.write_file("big.txt", "".join(f"line {i}\n" for i in range(50000)), "v1")
+        storage.write_file("big.txt", "".join(f"line {i} changed\n" for i in range(50000)), "v2")
+        first, second = [v["full_hash"] for v in storage.list_versions("big.txt")][::-1]
+
+        lines = storage.iter_diff("big.txt", first, second)
+        self.assertEqual(next(lines), "diff --git a/big.txt b/big.txt")
+        # The rest of the diff does not fit in the pipe, so git is still running
+        process = lines.gi_frame.f_locals["process"]
+        self.assertIsNone(process.poll())
+        lines.close()
+        self.assertIsNotNone(process.poll())
+
+        diff = list(storage.iter_diff("big.txt", first, second))
+        self.assertEqual("\n".join(diff) + "\n", storage.diff_versions("big.txt", first, second))
+        with self.assertRaises(RuntimeError):
+            list(storage.iter_diff("big.txt", "0" * 40))
+
+    def test_cat_file_reads_versions(self):
+        """Test that versions are read through one persistent cat-file process"""
+        from router_backup.storage_git import StorageGit
+
+        storage = StorageGit(str(self.repo_path))
+        storage.init()
+        for i in range(3):
+            storage.write_file("sub/test.txt", f"Version {i}\n\x00binary-ish\n", f"v{i}")
+        storage.write_file("other.txt", "Other\n", "other")
+        versions = [v["full_hash"] for v in storage.list_versions("sub/test.txt")]
+        self.assertEqual(len(versions), 3)
+
+        requests = [("sub/test.txt", commit) for commit in versions]
+        requests += [
+            ("missing.txt", versions[0]),
+            ("other.txt", "HEAD"),
+            ("sub/test.txt", "0" * 40),
+        ]
+        contents = storage.read_versions(requests)
+        process = storage._cat_file._process
+        self.assertIsNotNone(process)
+
+        for (path, commit), content in zip(requests, contents):
+            shown = subprocess.run(
+                ["git", "-C", str(self.repo_path), "show", f"{commit}:{path}"],
+                capture_output=True,
+            )
+            if shown.returncode == 0:
+                self.assertEqual(content.encode("utf-8"), shown.stdout)
+            else:
+                self.assertIsNone(content)
+        self.assertEqual(contents[0], "Version 2\n\x00binary-ish\n")
+        self.assertIsNone(contents[3])
+        self.assertIsNone(contents[5])
+
+        # Later reads reuse the process, and see commits made since it started
+        storage.write_file("sub/test.txt", "Version 3\n", "v3")
+        self.assertEqual(storage.read_version("sub/test.txt", "HEAD"), "Version 3\n")
+        self.assertIs(storage._cat_file._process, process)
+        storage.close()
+        self.assertIsNone(storage._cat_file._process)
+
     def test_multiple_files(self):
         """Test handling multiple files"""
         self.run_command(["init", "-p", str(self.repo_path)])
@@ -397,6 +500,80 @@ class TestStoragePyGit(unittest.TestCase):
             )
             self.assertEqual(result.returncode, 0)
 
+    def test_diff_limited_to_file(self):
+        """Test that the pygit2 diff only shows hunks of the requested file"""
+        self.run_command(["init", "-p", str(self.repo_path)])
+        self.run_command(["write", "-p", str(self.repo_path), "a.txt", "-c", "alpha 1"])
+        self.run_command(["write", "-p", str(self.repo_path), "b.txt", "-c", "bravo 1"])
+        self.run_command(["update", "-p", str(self.repo_path), "a.txt", "-c", "alpha 2"])
+        self.run_command(["update", "-p", str(self.repo_path), "b.txt", "-c", "bravo 2"])
+
+        result = self.run_command(["versions", "-p", str(self.repo_path), "a.txt"])
+        hashes = extract_commit_hashes(result.stdout)
+        self.assertEqual(len(hashes), 2)
+
+        # The range also changes b.txt, none of it may leak into the a.txt diff
+        result = self.run_command(
+            ["diff", "-p", str(self.repo_path), "a.txt", hashes[1], "HEAD"]
+        )
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("-alpha 1", result.stdout)
+        self.assertIn("+alpha 2", result.stdout)
+        self.assertNotIn("bravo", result.stdout)
+        self.assertNotIn("b.txt", result.stdout)
+
+    def test_bare_repository(self):
+        """Test writing nested paths into a bare repository and reading them back"""
+        from router_backup.storage_pygit import StoragePyGit
+
+        storage = StoragePyGit(str(self.repo_path), bare=True)
+        self.assertTrue(storage.init())
+        self.assertTrue((self.repo_path / "HEAD").exists())
+        self.assertFalse((self.repo_path / ".git").exists())
+
+        files = {
+            "cisco_ios/dc1/core-rtr1.txt": "hostname core-rtr1\n",
+            "cisco_ios/dc2/core-rtr2.txt": "hostname core-rtr2\n",
+            "juniper/dc1/edge1.txt": "host-name edge1;\n",
+        }
+        self.assertEqual(sorted(storage.write_files(files, "Run 1")), sorted(files))
+        changed = storage.write_files(
+            {
+                "cisco_ios/dc1/core-rtr1.txt": "hostname core-rtr1\nntp server 10.0.0.9\n",
+                "cisco_ios/dc2/core-rtr2.txt": "hostname core-rtr2\n",
+            },
+            "Run 2",
+        )
+        self.assertEqual(changed, ["cisco_ios/dc1/core-rtr1.txt"])
+        unchanged = {"juniper/dc1/edge1.txt": files["juniper/dc1/edge1.txt"]}
+        self.assertEqual(storage.write_files(unchanged, "Run 3"), [])
+
+        # A fresh instance detects the bare repository
+        storage = StoragePyGit(str(self.repo_path))
+        self.assertTrue(storage.bare)
+        versions = storage.list_versions("cisco_ios/dc1/core-rtr1.txt")
+        self.assertEqual([v["message"].strip() for v in versions], ["Run 2", "Run 1"])
+        self.assertEqual(len(storage.list_versions("cisco_ios/dc2/core-rtr2.txt")), 1)
+        self.assertEqual(
+            storage.read_version("cisco_ios/dc1/core-rtr1.txt", versions[1]["hash"]),
+            "hostname core-rtr1\n",
+        )
+        self.assertEqual(
+            storage.read_version("juniper/dc1/edge1.txt", "HEAD"), "host-name edge1;\n"
+        )
+
+        # Staged run writes build their tree in memory as well
+        storage.stage_file("juniper/dc2/edge2.txt", "host-name edge2;\n")
+        self.assertEqual(storage.add_files(["juniper/dc2/edge2.txt"]), ["juniper/dc2/edge2.txt"])
+        self.assertTrue(storage.commit("Run 4"))
+        self.assertEqual(
+            storage.read_version("juniper/dc2/edge2.txt", "HEAD"), "host-name edge2;\n"
+        )
+        self.assertEqual(
+            storage.read_version("cisco_ios/dc2/core-rtr2.txt", "HEAD"), "hostname core-rtr2\n"
+        )
+
+
 
 class TestBothImplementations(unittest.TestCase):
     """Tests that compare both implementations for consistency"""
@@ -689,6 +866,557 @@ class TestDiffVerification(unittest.TestCase):
         # Should indicate no differences or empty diff
 
 
+class TestHistoryIndex(unittest.TestCase):
+    """Test cases for the per-file history index"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="test_history_index_")
+        self.index_path = Path(self.test_dir) / "history.jsonl"
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def entry(commit, files, message="Backup"):
+        return {
+            "commit": commit,
+            "parent": "",
+            "time": 1700000000,
+            "date": "2023-11-14 22:13:20 +0000",
+            "message": message,
+            "files": files,
+        }
+
+    def test_rebuild_by_other_instance(self):
+        """Test that an index rebuilt by another instance is re-read from the start"""
+        from router_backup.history_index import HistoryIndex
+
+        first = HistoryIndex(self.index_path)
+        first.append([self.entry(f"c{i}", {"r1.txt": f"b{i}"}) for i in range(3)])
+        self.assertEqual(len(first.versions("r1.txt")), 3)
+
+        # Longer lines, so the first instance's offset falls inside a line
+        second = HistoryIndex(self.index_path)
+        second.rebuild(
+            [
+                self.entry("d0", {"r1.txt": "e0", "r2.txt": "f0"}, "Rewritten " * 5),
+                self.entry("d1", {"r2.txt": "f1"}, "Rewritten " * 5),
+            ]
+        )
+        self.assertEqual([v["commit"] for v in first.versions("r1.txt")], ["d0"])
+        self.assertEqual([v["commit"] for v in first.versions("r2.txt")], ["d1", "d0"])
+        self.assertEqual(first.head, "d1")
+
+        # A shorter replacement is detected as well
+        second.rebuild([])
+        self.assertEqual(first.versions("r2.txt"), [])
+        self.assertIsNone(first.head)
+
+
+class TestBackupStorage(unittest.TestCase):
+    """Test cases for BackupStorage writes and runs"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="test_backup_storage_")
+        self.storage_path = Path(self.test_dir) / "storage"
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def storage(self, model="git", **kwargs):
+        from router_backup.storage import BackupStorage
+
+        return BackupStorage(
+            str(self.storage_path), model, hostname="test", timestamp="t1", **kwargs
+        )
+
+    def git(self, *args):
+        result = subprocess.run(
+            ["git", "-C", str(self.storage_path)] + list(args),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout
+
+    def commit_count(self):
+        return int(self.git("rev-list", "--count", "HEAD"))
+
+    def test_skip_unchanged(self):
+        """Test that identical content is skipped and changed content stored"""
+        storage = self.storage(commit_mode="device")
+        self.assertEqual(storage.write_backup("core-rtr1", "v1", "10.0.0.1"), "written")
+        self.assertEqual(storage.write_backup("core-rtr1", "v1", "10.0.0.1"), "unchanged")
+        self.assertEqual(self.commit_count(), 1)
+        self.assertEqual(self.git("status", "--porcelain"), "")
+
+        self.assertEqual(storage.write_backup("core-rtr1", "v2", "10.0.0.1"), "written")
+        self.assertEqual(self.commit_count(), 2)
+        self.assertEqual(self.git("show", "HEAD:core-rtr1.txt"), "v2")
+
+    def test_skip_needs_stored_copy(self):
+        """Test that content whose stored copy is gone is written again"""
+        storage = self.storage("txt")
+        self.assertEqual(storage.write_backup("core-rtr1", "v1", "10.0.0.1"), "written")
+        self.assertEqual(storage.write_backup("core-rtr1", "v1", "10.0.0.1"), "unchanged")
+        snapshots = list(self.storage_path.glob("core-rtr1_*.txt"))
+        self.assertEqual(len(snapshots), 1)
+
+        snapshots[0].unlink()
+        self.assertEqual(storage.write_backup("core-rtr1", "v1", "10.0.0.1"), "written")
+        self.assertEqual(len(list(self.storage_path.glob("core-rtr1_*.txt"))), 1)
+
+    def test_txt_index_rebuilt_by_other_process(self):
+        """Test that a txt index rebuilt by another instance is re-read from the start"""
+        self.storage_path.mkdir(parents=True)
+        for day in (1, 2, 3):
+            (self.storage_path / f"core-rtr1_01-0{day}-2024_02-00.txt").write_text(f"v{day}")
+        first = self.storage("txt")
+        self.assertEqual(first.rebuild_txt_index(), 3)
+        self.assertEqual(len(first.get_versions("core-rtr1")), 3)
+
+        # Pruned and rebuilt elsewhere, with longer lines than before
+        for day in (1, 2):
+            (self.storage_path / f"core-rtr1_01-0{day}-2024_02-00.txt").unlink()
+        long_name = "distribution-switch-building-a-floor-1"
+        (self.storage_path / f"{long_name}_01-03-2024_02-00.txt").write_text("v1")
+        self.assertEqual(self.storage("txt").rebuild_txt_index(), 2)
+
+        self.assertEqual(
+            [version["hash"] for version in first.get_versions("core-rtr1")],
+            ["01-03-2024_02-00"],
+        )
+        self.assertEqual(len(first.get_versions(long_name)), 1)
+        self.assertEqual(first.write_backup(long_name, "v2", "10.0.0.9"), "written")
+        self.assertEqual(len(first.get_versions(long_name)), 2)
+
+    def test_skip_follows_layout(self):
+        """Test that a layout change stores unchanged content at its new path"""
+        self.assertEqual(
+            self.storage(commit_mode="device").write_backup("edge-fw1", "v1", "10.0.0.2"),
+            "written",
+        )
+        storage = self.storage(commit_mode="device", layout="{site}")
+        storage.set_device_info({"10.0.0.2": {"site": "dc1"}})
+        self.assertEqual(storage.write_backup("edge-fw1", "v1", "10.0.0.2"), "written")
+        self.assertEqual(self.git("show", "HEAD:dc1/edge-fw1.txt"), "v1")
+        self.assertEqual(storage.write_backup("edge-fw1", "v1", "10.0.0.2"), "unchanged")
+
+    def test_run_commits_once(self):
+        """Test that a run is one commit counting every device, and an empty run none"""
+        storage = self.storage()
+        storage.begin_run()
+        for i in range(3):
+            storage.write_backup(f"rtr{i}", "v1", f"10.0.0.{i}")
+        self.assertEqual(len(storage.commit_run()), 3)
+        self.assertEqual(self.commit_count(), 1)
+        storage.take_write_statuses()
+
+        storage.begin_run()
+        storage.write_backup("rtr0", "v1", "10.0.0.0")
+        storage.write_backup("rtr1", "v2", "10.0.0.1")
+        storage.write_backup("rtr2", "v2", "10.0.0.2")
+        self.assertEqual(storage.commit_run(), ["rtr1.txt", "rtr2.txt"])
+        self.assertEqual(self.commit_count(), 2)
+        self.assertEqual(
+            self.git("log", "-1", "--format=%B"),
+            "Backup test at t1: 2 of 3 devices changed\n\n"
+            "- rtr1 (10.0.0.1)\n- rtr2 (10.0.0.2)\n\n",
+        )
+        storage.take_write_statuses()
+
+        storage.begin_run()
+        self.assertEqual(storage.commit_run(), [])
+        storage.begin_run()
+        storage.write_backup("rtr0", "v1", "10.0.0.0")
+        self.assertEqual(storage.commit_run(), [])
+        self.assertEqual(self.commit_count(), 2)
+        self.assertEqual(self.git("status", "--porcelain"), "")
+
+    def test_fast_import_writes(self):
+        """Test run and per-device commits through git fast-import"""
+        storage = self.storage(git_fast_import=True, layout="{site}")
+        storage.set_device_info({f"10.0.0.{i}": {"site": f"dc{i % 2}"} for i in range(3)})
+        storage.begin_run()
+        for i in range(3):
+            storage.write_backup(f"rtr{i}", f"v1 of rtr{i}\n", f"10.0.0.{i}")
+        storage.commit_run()
+        self.assertEqual(self.commit_count(), 1)
+        for i in range(3):
+            self.assertEqual(self.git("show", f"HEAD:dc{i % 2}/rtr{i}.txt"), f"v1 of rtr{i}\n")
+        self.assertEqual(self.git("status", "--porcelain"), "")
+        self.assertEqual((self.storage_path / "dc1" / "rtr1.txt").read_text(), "v1 of rtr1\n")
+
+        storage.begin_run()
+        storage.write_backup("rtr0", "v1 of rtr0\n", "10.0.0.0")
+        storage.write_backup("rtr1", "v2 of rtr1\n", "10.0.0.1")
+        storage.commit_run()
+        self.assertEqual(self.commit_count(), 2)
+        self.assertEqual(self.git("show", "--name-only", "--format=", "HEAD"), "dc1/rtr1.txt\n")
+
+        storage.commit_mode = "device"
+        storage.write_backup("rtr2", "v2 of rtr2\n", "10.0.0.2")
+        self.assertEqual(self.commit_count(), 3)
+        self.assertEqual(self.git("show", "HEAD:dc0/rtr2.txt"), "v2 of rtr2\n")
+        self.assertEqual(self.git("status", "--porcelain"), "")
+        self.assertEqual((self.storage_path / "dc0" / "rtr2.txt").read_text(), "v2 of rtr2\n")
+
+    def test_drain_spool(self):
+        """Test that spooled txt runs keep their time and a bad spool file is left alone"""
+        spool_dir = self.storage_path / ".router-backup" / "spool"
+        spool_dir.mkdir(parents=True)
+        (spool_dir / "1-bad.jsonl").write_text("not json\n")
+        header = {"hostname": "all", "timestamp": "01-05-2024_02-00", "pid": 4242}
+        entry = {"filename": "core-rtr1", "content": "v1", "device_ip": "10.0.0.1"}
+        (spool_dir / "2-good.jsonl").write_text(json.dumps(header) + "\n" + json.dumps(entry))
+
+        storage = self.storage("txt")
+        storage.begin_run()
+        storage.commit_run()
+
+        self.assertTrue((self.storage_path / "core-rtr1_01-05-2024_02-00.txt").exists())
+        self.assertEqual(sorted(p.name for p in spool_dir.iterdir()), ["1-bad.jsonl"])
+
+
+class StubStorage:
+    """BackupStorage stand-in recording what the writer thread stores"""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.run_active = False
+        self.calls = []
+
+    def begin_run(self):
+        self.calls.append("begin")
+
+    def commit_run(self):
+        self.calls.append("commit")
+
+    def write_backup(self, filename, content, device_ip=None, stamp=None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if content == "boom":
+            raise OSError("disk full")
+        self.calls.append(filename)
+        return "changed"
+
+    def record_unchanged(self, filename, device_ip=None):
+        self.calls.append(filename)
+        return "unchanged"
+
+
+class TestQueuedWriter(unittest.TestCase):
+    """Test the single storage writer thread"""
+
+    def test_bounded_queue_blocks_producers(self):
+        """Test that write_backup() blocks while the queue is full"""
+        from router_backup.storage import QueuedWriter
+
+        gate = threading.Event()
+        writer = QueuedWriter(StubStorage(gate), maxsize=1)
+        writer.write_backup("rtr1", "a")  # taken by the writer thread, blocked on the gate
+        for _ in range(100):
+            if writer._queue.empty():
+                break
+            time.sleep(0.01)
+        writer.write_backup("rtr2", "b")  # fills the queue
+
+        producer = threading.Thread(target=writer.write_backup, args=("rtr3", "c"))
+        producer.start()
+        producer.join(0.2)
+        self.assertTrue(producer.is_alive())
+
+        gate.set()
+        producer.join(5)
+        self.assertFalse(producer.is_alive())
+        writer.close()
+        self.assertEqual(
+            [call for call in writer.storage.calls if call.startswith("rtr")],
+            ["rtr1", "rtr2", "rtr3"],
+        )
+
+    def test_flush_and_on_stored(self):
+        """Test that flush() waits for every write and on_stored sees each outcome"""
+        from router_backup.storage import QueuedWriter
+
+        gate = threading.Event()
+        stored = []
+        writer = QueuedWriter(
+            StubStorage(gate), on_stored=lambda *outcome: stored.append(outcome)
+        )
+        writer.write_backup("rtr1", "a", "10.0.0.1")
+        writer.record_unchanged("rtr2", "10.0.0.2")
+        writer.write_backup("rtr3", "c", "10.0.0.3")
+        threading.Timer(0.1, gate.set).start()
+
+        writer.flush()
+        self.assertEqual(
+            stored,
+            [
+                ("rtr1", "10.0.0.1", "changed"),
+                ("rtr2", "10.0.0.2", "unchanged"),
+                ("rtr3", "10.0.0.3", "changed"),
+            ],
+        )
+        writer.close()
+        with self.assertRaises(RuntimeError):
+            writer.write_backup("rtr4", "d")
+
+    def test_errors_reach_caller(self):
+        """Test that failed writes and callbacks surface through take_errors()"""
+        from router_backup.storage import QueuedWriter
+
+        def on_stored(filename, device_ip, status):
+            if device_ip == "10.0.0.3":
+                raise ValueError("journal closed")
+
+        writer = QueuedWriter(StubStorage(), on_stored=on_stored)
+        writer.write_backup("rtr1", "boom", "10.0.0.1")
+        writer.write_backup("rtr2", "b", "10.0.0.2")
+        writer.write_backup("rtr3", "c", "10.0.0.3")
+        writer.flush()
+
+        self.assertEqual(
+            writer.take_errors(), {"10.0.0.1": "disk full", "10.0.0.3": "journal closed"}
+        )
+        self.assertEqual(writer.take_errors(), {})
+        # The writer thread survives both failures
+        writer.write_backup("rtr4", "d", "10.0.0.4")
+        writer.close()
+        self.assertIn("rtr4", writer.storage.calls)
+
+
+class TestStorageCli(unittest.TestCase):
+    """Test cases for storagecli commands"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="test_storagecli_")
+        self.storage_path = Path(self.test_dir) / "storage"
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def run_cli(self, args):
+        """Run storagecli against the test storage and return result"""
+        cmd = [sys.executable, "-m", "router_backup.storagecli", "-s", str(self.storage_path)]
+        return subprocess.run(
+            cmd + args,
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent.parent,
+        )
+
+    def test_migrate_txt_to_git(self):
+        """Test importing txt snapshots as one dated commit per run"""
+        source = Path(self.test_dir) / "txt"
+        source.mkdir()
+        snapshots = {
+            "core-rtr1_01-05-2024_02-00.txt": "hostname core-rtr1\nv1\n",
+            "edge_fw2_01-05-2024_02-03.txt": "hostname edge_fw2\nv1\n",
+            "core-rtr1_01-06-2024_02-00.txt": "hostname core-rtr1\nv2\n",
+            "edge_fw2_01-06-2024_02-02.txt": "hostname edge_fw2\nv1\n",
+            "notes.txt": "not a snapshot",
+        }
+        for name, content in snapshots.items():
+            (source / name).write_text(content)
+
+        result = self.run_cli(["migrate", "txt-to-git", str(source)])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("as 2 commits", result.stdout)
+
+        log = subprocess.run(
+            ["git", "-C", str(self.storage_path), "log", "--format=%ad|%s", "--date=short"],
+            capture_output=True,
+            text=True,
+        )
+        commits = log.stdout.splitlines()
+        self.assertEqual(len(commits), 2)
+        self.assertTrue(commits[0].startswith("2024-01-06|"))
+        self.assertIn("1 of 2 devices changed", commits[0])
+        self.assertTrue(commits[1].startswith("2024-01-05|"))
+
+        # The working tree holds the newest snapshot of every device
+        newest = (self.storage_path / "core-rtr1.txt").read_text()
+        self.assertEqual(newest, "hostname core-rtr1\nv2\n")
+        self.assertTrue((self.storage_path / "edge_fw2.txt").exists())
+        self.assertFalse((self.storage_path / "notes.txt").exists())
+
+        result = self.run_cli(["-m", "git", "versions", "edge_fw2"])
+        self.assertEqual(len(extract_commit_hashes(result.stdout)), 1)
+
+    def test_init_bare_pygit_guard(self):
+        """Test that init refuses to reinitialize an existing bare repository"""
+        try:
+            import pygit2  # noqa: F401
+        except ImportError:
+            self.skipTest("pygit2 not installed")
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text("storage_model: pygit\npygit_bare: true\n")
+
+        result = self.run_cli(["-c", str(config_file), "init"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertTrue((self.storage_path / "HEAD").exists())
+
+        result = self.run_cli(["-c", str(config_file), "init"])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("already initialized", result.stdout)
+
+        # Migrated history is committed into the bare repository as is
+        source = Path(self.test_dir) / "txt"
+        (source / "dc1").mkdir(parents=True)
+        (source / "dc1" / "core-rtr1_01-05-2024_02-00.txt").write_text("v1\n")
+        (source / "dc1" / "core-rtr1_01-06-2024_02-00.txt").write_text("v2\n")
+        (source / "edge-fw1_01-06-2024_02-01.txt").write_text("v1\n")
+        result = self.run_cli(["-c", str(config_file), "migrate", "txt-to-git", str(source)])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("as 2 commits", result.stdout)
+        self.assertFalse((self.storage_path / ".git").exists())
+        self.assertFalse((self.storage_path / "core-rtr1.txt").exists())
+
+        result = self.run_cli(["-c", str(config_file), "versions", "core-rtr1"])
+        hashes = extract_commit_hashes(result.stdout)
+        self.assertEqual(len(hashes), 2)
+        result = self.run_cli(["-c", str(config_file), "read", "core-rtr1", hashes[1]])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("v1", result.stdout)
+        log = subprocess.run(
+            ["git", "--git-dir", str(self.storage_path), "log", "--format=%ad", "--date=short"],
+            capture_output=True,
+            text=True,
+        )
+        self.assertEqual(log.stdout.splitlines(), ["2024-01-06", "2024-01-05"])
+
+    def test_txt_compressed_read_back(self):
+        """Test that gzip txt snapshots are listed and read back as plain text"""
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text("storage_model: txt\ntxt_compression: gzip\n")
+
+        result = self.run_cli(["-c", str(config_file), "write", "core-rtr1", "-c", "hostname core"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        snapshots = list(self.storage_path.glob("core-rtr1_*.txt.gz"))
+        self.assertEqual(len(snapshots), 1)
+
+        result = self.run_cli(["-c", str(config_file), "versions", "core-rtr1"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        stamp = re.search(r"\d{2}-\d{2}-\d{4}_\d{2}-\d{2}", result.stdout).group(0)
+
+        result = self.run_cli(["-c", str(config_file), "read", "core-rtr1", stamp])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "hostname core")
+
+    def test_txt_dedup_stores_body_once(self):
+        """Test that identical txt snapshots share one stored object"""
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text("storage_model: txt\ntxt_dedup: true\n")
+
+        for name in ("access-sw1", "access-sw2"):
+            result = self.run_cli(["-c", str(config_file), "write", name, "-c", "vlan 10"])
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+        objects = [p for p in (self.storage_path / ".router-backup" / "objects").rglob("*")]
+        objects = [p for p in objects if p.is_file()]
+        self.assertEqual(len(objects), 1)
+        self.assertEqual(objects[0].stat().st_nlink, 3)
+
+        entry = next(self.storage_path.glob("access-sw2_*.txt"))
+        self.assertEqual(entry.read_text(), "vlan 10")
+
+    def test_prune_txt(self):
+        """Test that prune keeps the snapshots selected by the retention policy"""
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text("storage_model: txt\nretention:\n  monthly: forever\n")
+        self.storage_path.mkdir()
+        for stamp in ("01-05-2024_02-00", "01-05-2024_14-00", "01-20-2024_02-00", "02-03-2024_02-00"):
+            (self.storage_path / f"core-rtr1_{stamp}.txt").write_text(stamp)
+
+        result = self.run_cli(["-c", str(config_file), "--dryrun", "prune"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Would remove 2 snapshots", result.stdout)
+        self.assertEqual(len(list(self.storage_path.glob("*.txt"))), 4)
+
+        result = self.run_cli(["-c", str(config_file), "prune"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        remaining = sorted(path.name for path in self.storage_path.glob("*.txt"))
+        self.assertEqual(
+            remaining, ["core-rtr1_01-20-2024_02-00.txt", "core-rtr1_02-03-2024_02-00.txt"]
+        )
+
+    def test_txt_versions_from_index(self):
+        """Test that txt versions come from the snapshot index, refreshed by reindex"""
+        self.storage_path.mkdir()
+        (self.storage_path / "core-rtr1_01-05-2024_02-00.txt").write_text("v1")
+
+        # The first listing builds the index; later writes are appended to it
+        result = self.run_cli(["-m", "txt", "versions", "core-rtr1"])
+        self.assertIn("01-05-2024_02-00", result.stdout)
+        result = self.run_cli(["-m", "txt", "write", "core-rtr1", "-c", "v2"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        index = self.storage_path / ".router-backup" / "txt-index.jsonl"
+        self.assertEqual(len(index.read_text().splitlines()), 2)
+
+        # Snapshots added behind the index's back appear after reindex
+        (self.storage_path / "core-rtr1_01-04-2024_02-00.txt").write_text("v0")
+        result = self.run_cli(["-m", "txt", "versions", "core-rtr1"])
+        self.assertNotIn("01-04-2024_02-00", result.stdout)
+        result = self.run_cli(["-m", "txt", "reindex"])
+        self.assertIn("Indexed 3 snapshots", result.stdout)
+        result = self.run_cli(["-m", "txt", "diff", "core-rtr1", "01-04-2024_02-00", "01-05-2024_02-00"])
+        self.assertIn("+v1", result.stdout)
+
+    @unittest.skipIf(sys.platform == "win32", "flock not available")
+    def test_write_waits_for_locked_storage(self):
+        """Test that a write fails cleanly while another process holds the storage lock"""
+        import fcntl
+
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text("storage_model: git\nlock_timeout: 0.5\n")
+        lock_file = self.storage_path / ".router-backup" / "lock"
+        lock_file.parent.mkdir(parents=True)
+
+        with open(lock_file, "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write("4242\n")
+            f.flush()
+            result = self.run_cli(["-c", str(config_file), "write", "core-rtr1", "-c", "v1"])
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("locked by process 4242", result.stdout)
+
+        result = self.run_cli(["-c", str(config_file), "write", "core-rtr1", "-c", "v1"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual((self.storage_path / "core-rtr1.txt").read_text(), "v1")
+
+    def test_txt_date_layout(self):
+        """Test that a date-partitioned layout is used by write, read and prune"""
+        config_file = Path(self.test_dir) / "config.yaml"
+        config_file.write_text(
+            "storage_model: txt\nlayout: '{year}/{month}/{day}'\nretention:\n  monthly: forever\n"
+        )
+        old = self.storage_path / "2024" / "01" / "05"
+        old.mkdir(parents=True)
+        (old / "core-rtr1_01-05-2024_02-00.txt").write_text("old")
+
+        result = self.run_cli(["-c", str(config_file), "write", "core-rtr1", "-c", "new"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        written = list(self.storage_path.glob("*/*/*/core-rtr1_*.txt"))
+        self.assertEqual(len(written), 2)
+
+        result = self.run_cli(["-c", str(config_file), "read", "core-rtr1", "01-05-2024_02-00"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "old")
+
+        # Directories emptied by pruning are removed
+        older = self.storage_path / "2024" / "01" / "04"
+        older.mkdir()
+        (older / "core-rtr1_01-04-2024_02-00.txt").write_text("older")
+        result = self.run_cli(["-c", str(config_file), "prune"])
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertFalse(older.exists())
+        self.assertEqual(len(list(self.storage_path.glob("*/*/*/core-rtr1_*.txt"))), 2)
+
+
 def run_comprehensive_test():
     """Run all tests with detailed output"""
     print("=" * 70)
@@ -705,6 +1433,9 @@ def run_comprehensive_test():
     suite.addTests(loader.loadTestsFromTestCase(TestStoragePyGit))
     suite.addTests(loader.loadTestsFromTestCase(TestBothImplementations))
     suite.addTests(loader.loadTestsFromTestCase(TestDiffVerification))
+    suite.addTests(loader.loadTestsFromTestCase(TestHistoryIndex))
+    suite.addTests(loader.loadTestsFromTestCase(TestBackupStorage))
+    suite.addTests(loader.loadTestsFromTestCase(TestStorageCli))
 
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
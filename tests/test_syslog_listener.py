@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the syslog config-change listener.
+"""
+
+import socket
+import threading
+import time
+import unittest
+
+from router_backup.syslog_listener import ConfigChangeListener, match_config_change
+
+
+class TestSyslogListener(unittest.TestCase):
+    """Test config-change detection and debounced backups"""
+
+    def setUp(self):
+        self.batches = []
+        self.listener = ConfigChangeListener(["127.0.0.1"], self.batches.append, debounce=0.3)
+        self.thread = threading.Thread(target=self.listener.run, args=("127.0.0.1", 0, 0))
+        self.thread.start()
+        self.assertTrue(self.listener.wait_started(5))
+
+    def tearDown(self):
+        self.listener.stop()
+        self.thread.join(5)
+
+    def wait_for_batches(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.batches) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def test_match_config_change(self):
+        """Test that vendor config-change messages are recognised"""
+        cases = {
+            "<189>12: *Mar 1 00:10:02: %SYS-5-CONFIG_I: Configured from console": "cisco_ios",
+            "<28>Feb 3 mgd[4242]: UI_COMMIT: User 'admin' requested 'commit' operation": "juniper",
+            "<30>Feb 3 mgd[4242]: UI_COMMIT_PROGRESS: Commit operation in progress": None,
+            '<189>date=2025-02-03 logid="0100044547" type="event" subtype="system"': "fortinet",
+            "<189>%LINK-3-UPDOWN: Interface Gi0/1, changed state to up": None,
+        }
+        for message, vendor in cases.items():
+            self.assertEqual(match_config_change(message), vendor, message)
+
+    def test_udp_burst_is_debounced(self):
+        """Test that a burst of changes over UDP triggers one backup"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        message = b"<189>%SYS-5-CONFIG_I: Configured from console by admin on vty0"
+        for _ in range(3):
+            sock.sendto(message, self.listener.udp_address)
+            time.sleep(0.05)
+        sock.sendto(b"<189>%LINK-3-UPDOWN: Interface Gi0/1", self.listener.udp_address)
+        sock.close()
+
+        self.wait_for_batches(1)
+        time.sleep(0.5)
+        self.assertEqual(self.batches, [{"127.0.0.1": "cisco_ios"}])
+
+    def test_tcp_octet_counted(self):
+        """Test that octet-counted TCP syslog is framed and recognised"""
+        message = b"<29>mgd[1]: UI_COMMIT: User 'admin' requested 'commit' operation"
+        with socket.create_connection(self.listener.tcp_address) as sock:
+            sock.sendall(str(len(message)).encode() + b" " + message)
+        self.wait_for_batches(1)
+        self.assertEqual(self.batches, [{"127.0.0.1": "juniper"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
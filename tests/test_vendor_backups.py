@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Tests for the change probes of the vendor backup modules.
+"""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from router_backup.storage import BackupStorage, set_global_storage
+from router_backup.vendor_backups import cisco_asa, cisco_ios, fortinet, juniper, vyos
+
+FORTIOS_CHECKSUMS = """\
+is_manage_primary()=1, is_root_primary()=1
+debugzone
+global: 5e 21 3b 76 d5 4f 7a 3c 0f 8e 3d 19 5b b4 0a 5e
+root: 25 aa 5a 8a 62 34 43 0a 2f 6d 2c 82 11 38 72 6e
+all: 90 10 7c 15 77 86 0e 5b 2b 30 59 27 12 5f 4a 1e
+
+checksum
+global: 5e 21 3b 76 d5 4f 7a 3c 0f 8e 3d 19 5b b4 0a 5e
+root: 25 aa 5a 8a 62 34 43 0a 2f 6d 2c 82 11 38 72 6e
+all: 90 10 7c 15 77 86 0e 5b 2b 30 59 27 12 5f 4a 1e
+"""
+
+JUNOS_COMMITS = """\
+0   2025-02-14 09:12:44 UTC by admin via cli
+1   2025-02-13 17:01:02 UTC by netops via netconf
+2   2025-02-10 08:30:11 UTC by admin via cli commit confirmed, rollback in 10mins
+"""
+
+VYOS_COMMITS = """\
+0   2025-02-14 09:12:44 by vyos via cli
+1   2025-02-13 17:01:02 by vyos via init
+"""
+
+
+class TestProbeParsers(unittest.TestCase):
+    """Test the change stamps read from real probe output"""
+
+    def test_cisco_ios(self):
+        """Test the running-config header's last change"""
+        output = "! Last configuration change at 14:23:17 UTC Tue Feb 11 2025 by admin\n"
+        self.assertEqual(cisco_ios.parse_probe(output), "14:23:17 UTC Tue Feb 11 2025 by admin")
+        self.assertIsNone(cisco_ios.parse_probe("! No configuration change since last restart\n"))
+
+    def test_cisco_asa(self):
+        """Test the last modification reported by show version"""
+        output = "Configuration last modified by enable_15 at 10:44:16.409 UTC Wed Feb 12 2025\n"
+        self.assertEqual(
+            cisco_asa.parse_probe(output), "enable_15 at 10:44:16.409 UTC Wed Feb 12 2025"
+        )
+        unmodified = "Configuration has not been modified since last system restart.\n"
+        self.assertIsNone(cisco_asa.parse_probe(unmodified))
+
+    def test_commit_history(self):
+        """Test the newest commit of Junos and VyOS, parsed by the shared helper"""
+        self.assertEqual(
+            juniper.parse_probe(JUNOS_COMMITS), "2025-02-14 09:12:44 UTC by admin via cli"
+        )
+        self.assertEqual(vyos.parse_probe(VYOS_COMMITS), "2025-02-14 09:12:44 by vyos via cli")
+        self.assertIsNone(juniper.parse_probe("error: command is not valid on the mx480\n"))
+
+    def test_fortinet_checksum(self):
+        """Test the whole-configuration checksum of FortiOS"""
+        expected = "90107c1577860e5b2b305927125f4a1e"
+        self.assertEqual(fortinet.parse_probe(FORTIOS_CHECKSUMS), expected)
+        self.assertEqual(fortinet.parse_probe(FORTIOS_CHECKSUMS.replace("\n", "\r\n")), expected)
+        # The per-VDOM and global checksums are not the whole configuration
+        self.assertIsNone(fortinet.parse_probe(FORTIOS_CHECKSUMS.replace("all:", "vdom1:")))
+        self.assertIsNone(fortinet.parse_probe("Command fail. Return code -61\n"))
+
+
+class FakeConnection:
+    """netmiko connection stand-in answering a fixed set of commands"""
+
+    def __init__(self, responses: dict):
+        self.responses = responses
+        self.sent = []
+
+    def enable(self):
+        pass
+
+    def find_prompt(self):
+        return "core-rtr1#"
+
+    def send_command(self, command):
+        self.sent.append(command)
+        return self.responses[command]
+
+
+class TestChangeProbeSkip(unittest.TestCase):
+    """Test that a matching change stamp skips the pull and a changed one does not"""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp(prefix="rb_probe_")
+        self.storage = BackupStorage(
+            str(Path(self.test_dir) / "storage"),
+            "txt",
+            hostname="test",
+            timestamp="t1",
+            change_probes=True,
+        )
+        set_global_storage(self.storage)
+
+    def tearDown(self):
+        set_global_storage(None)
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def backup(self, stamp: str, config: str) -> list:
+        connection = FakeConnection(
+            {
+                cisco_ios.PROBE_COMMAND: f"! Last configuration change at {stamp}\n",
+                cisco_ios.CONFIG_COMMAND: config,
+            }
+        )
+        with mock.patch.object(cisco_ios, "ConnectHandler", return_value=connection):
+            cisco_ios.backup("10.0.0.1", "admin", "secret", "enable")
+        return connection.sent
+
+    def test_stamp_skips_pull(self):
+        """Test that the config is only pulled when the probe's stamp moved"""
+        probe, pull = cisco_ios.PROBE_COMMAND, cisco_ios.CONFIG_COMMAND
+        first, changed = "10:00:00 UTC Mon Feb 10 2025", "11:30:00 UTC Mon Feb 10 2025"
+
+        self.assertEqual(self.backup(first, "hostname core-rtr1\n"), [probe, pull])
+        self.assertEqual(self.storage.take_write_statuses(), {"10.0.0.1": "written"})
+        self.assertEqual(self.storage.get_change_stamp("core-rtr1"), first)
+
+        self.assertEqual(self.backup(first, "not pulled\n"), [probe])
+        self.assertEqual(self.storage.take_write_statuses(), {"10.0.0.1": "unchanged"})
+
+        sent = self.backup(changed, "hostname core-rtr1\nntp server 10.0.0.9\n")
+        self.assertEqual(sent, [probe, pull])
+        self.assertEqual(self.storage.take_write_statuses(), {"10.0.0.1": "written"})
+        self.assertEqual(self.storage.get_change_stamp("core-rtr1"), changed)
+
+    def test_probes_off(self):
+        """Test that no probe is sent when change probes are off"""
+        self.storage.change_probes = False
+        sent = self.backup("10:00:00 UTC Mon Feb 10 2025", "hostname core-rtr1\n")
+        self.assertEqual(sent, [cisco_ios.CONFIG_COMMAND])
+
+
+if __name__ == "__main__":
+    unittest.main()